@@ -1 +1,9 @@
-from .main import app
+def __getattr__(name):
+	# the CLI and the coders are loaded on first use, so importing the library stays cheap
+	if name == 'app':
+		from .main import app
+		return app
+	if name in ('compress', 'decompress', 'open', 'ZipperFile'):
+		from . import api
+		return getattr(api, name)
+	raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
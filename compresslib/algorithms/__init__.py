@@ -0,0 +1,33 @@
+from typing import TYPE_CHECKING, Type
+
+from ..base.enums import CodingType
+
+if TYPE_CHECKING:
+	from ..base.abstract import AbstractAlgorithm
+
+
+def get_algorithm(coding_type: CodingType) -> Type['AbstractAlgorithm']:
+	match coding_type:
+		case CodingType.HUFFMAN:
+			from .huffman import HuffmanCoding
+			return HuffmanCoding
+		case CodingType.LZW:
+			from .lzw import LZWCoding
+			return LZWCoding
+		case CodingType.ADAPTIVE_HUFFMAN:
+			from .adaptive_huffman import AdaptiveHuffmanCoding
+			return AdaptiveHuffmanCoding
+		case CodingType.RANGE:
+			from .range_coder import RangeCoding
+			return RangeCoding
+		case CodingType.LZ77:
+			from .lz77 import LZ77Coding
+			return LZ77Coding
+		case CodingType.STORE:
+			from .store import StoreCoding
+			return StoreCoding
+		case CodingType.AUTO:
+			from .auto import AutoCoding
+			return AutoCoding
+		case _:
+			raise ValueError(f'Unknown algorithm: {coding_type}')
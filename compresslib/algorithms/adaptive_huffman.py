@@ -0,0 +1,160 @@
+from ..base.abstract import AbstractAlgorithm
+from ..base.enums import CodingType
+
+# 256 byte leaves plus the NYT (not yet transmitted) leaf
+MAX_NODES = 2 * 257 - 1
+SYMBOL_BITS = 8
+
+
+class FGKTree:
+	"""
+	Adaptive Huffman tree of the FGK algorithm.
+
+	Nodes live in flat lists indexed by node id. ``number`` is the implicit
+	numbering of the sibling property: weights never decrease with the
+	number, and the root always holds the highest one. Encoder and decoder
+	start from the same tree holding only NYT and apply the same updates, so
+	no table is ever stored.
+	"""
+
+	def __init__(self):
+		self.weight = [0] * MAX_NODES
+		self.parent = [-1] * MAX_NODES
+		self.left = [-1] * MAX_NODES
+		self.right = [-1] * MAX_NODES
+		self.symbol = [-1] * MAX_NODES
+		self.number = [0] * MAX_NODES
+		self.node_at = [0] * MAX_NODES
+		self.leaf = [-1] * 256
+		self.root = 0
+		self.nyt = 0
+		self.size = 1
+		self.number[0] = MAX_NODES - 1
+		self.node_at[MAX_NODES - 1] = 0
+
+	def code(self, symbol: int) -> tuple[int, int]:
+		"""Return the code of a known symbol, or of NYT followed by the raw byte."""
+		node = self.leaf[symbol]
+		if node < 0:
+			code, length = self.path(self.nyt)
+			return code << SYMBOL_BITS | symbol, length + SYMBOL_BITS
+		return self.path(node)
+
+	def path(self, node: int) -> tuple[int, int]:
+		parent = self.parent
+		right = self.right
+		code = 0
+		length = 0
+		while node != self.root:
+			up = parent[node]
+			if right[up] == node:
+				code |= 1 << length
+			length += 1
+			node = up
+		return code, length
+
+	def add(self, symbol: int) -> int:
+		# NYT becomes an internal node with the new NYT on the left and the symbol on the right
+		old = self.nyt
+		nyt, node = self.size, self.size + 1
+		self.size += 2
+		number = self.number[old]
+		for child, child_number in ((nyt, number - 2), (node, number - 1)):
+			self.parent[child] = old
+			self.number[child] = child_number
+			self.node_at[child_number] = child
+		self.left[old] = nyt
+		self.right[old] = node
+		self.symbol[node] = symbol
+		self.leaf[symbol] = node
+		self.nyt = nyt
+		return node
+
+	def swap(self, a: int, b: int):
+		parent, left, right = self.parent, self.left, self.right
+		parent_a, parent_b = parent[a], parent[b]
+		if parent_a == parent_b:
+			left[parent_a], right[parent_a] = right[parent_a], left[parent_a]
+		else:
+			if left[parent_a] == a:
+				left[parent_a] = b
+			else:
+				right[parent_a] = b
+			if left[parent_b] == b:
+				left[parent_b] = a
+			else:
+				right[parent_b] = a
+			parent[a], parent[b] = parent_b, parent_a
+		number_a, number_b = self.number[a], self.number[b]
+		self.number[a], self.number[b] = number_b, number_a
+		self.node_at[number_a], self.node_at[number_b] = b, a
+
+	def update(self, symbol: int):
+		node = self.leaf[symbol]
+		if node < 0:
+			node = self.add(symbol)
+		weight, number, node_at, parent = self.weight, self.number, self.node_at, self.parent
+		top = MAX_NODES - 1
+		while node >= 0:
+			# move the node to the highest number of its weight block before incrementing it
+			current = number[node]
+			leader = current
+			node_weight = weight[node]
+			while leader < top and weight[node_at[leader + 1]] == node_weight:
+				leader += 1
+			if leader != current:
+				other = node_at[leader]
+				if other != parent[node]:
+					self.swap(node, other)
+			weight[node] += 1
+			node = parent[node]
+
+
+class AdaptiveHuffmanCoding(AbstractAlgorithm):
+	coding_type = CodingType.ADAPTIVE_HUFFMAN
+
+	def __init__(self, directory, path=None, **kwargs):
+		super().__init__(suffix='.ahuff', directory=directory, path=path, **kwargs)
+
+	def encode_block(self, data) -> bytes:
+		tree = FGKTree()
+		code_of = tree.code
+		update = tree.update
+		out = bytearray()
+		acc = 0
+		nbits = 0
+		for symbol in memoryview(data):
+			code, length = code_of(symbol)
+			update(symbol)
+			acc = acc << length | code
+			nbits += length
+			if nbits >= 64:
+				nbits -= 64
+				out += (acc >> nbits).to_bytes(8, 'big')
+				acc &= (1 << nbits) - 1
+		padding = -nbits % 8
+		out += (acc << padding).to_bytes((nbits + padding) // 8, 'big')
+		return bytes(out)
+
+	def decode_block(self, payload, size: int):
+		tree = FGKTree()
+		left, right, symbol_of = tree.left, tree.right, tree.symbol
+		update = tree.update
+		bits = iter(bit for byte in bytes(payload) for bit in ((byte >> shift) & 1 for shift in range(7, -1, -1)))
+		decoded = bytearray()
+		try:
+			for _ in range(size):
+				node = tree.root
+				while left[node] >= 0:
+					node = right[node] if next(bits) else left[node]
+				if node == tree.nyt:
+					symbol = 0
+					for _ in range(SYMBOL_BITS):
+						symbol = symbol << 1 | next(bits)
+				else:
+					symbol = symbol_of[node]
+				decoded.append(symbol)
+				update(symbol)
+		except StopIteration:
+			raise ValueError('Truncated adaptive huffman stream') from None
+		return decoded
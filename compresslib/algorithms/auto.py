@@ -0,0 +1,106 @@
+import math
+
+from . import get_algorithm
+from ..base.abstract import AbstractAlgorithm
+from ..base.container import ALGORITHM_IDS, ALGORITHMS
+from ..base.enums import CodingType
+from ..utils.buffers import byte_histogram
+from ..utils.profiling import phase
+
+CANDIDATES = (CodingType.HUFFMAN, CodingType.LZW, CodingType.STORE)
+SAMPLES = 4
+SAMPLE_SIZE = 4096
+GRAM = 4
+# below this share of repeated 4-byte strings lzw cannot beat huffman, skip its trial
+MIN_REPEATS = 0.1
+# store unless the best estimate saves at least 3%
+MAX_RATIO = 0.97
+
+
+def sample(data) -> bytes:
+	"""Take SAMPLES evenly spaced slices of SAMPLE_SIZE bytes from the block."""
+	if len(data) <= SAMPLES * SAMPLE_SIZE:
+		return bytes(data)
+	step = (len(data) - SAMPLE_SIZE) // (SAMPLES - 1)
+	return b''.join(bytes(data[start:start + SAMPLE_SIZE]) for start in range(0, step * SAMPLES, step))
+
+
+def entropy(data: bytes) -> float:
+	"""Order-0 entropy in bits per byte."""
+	if not data:
+		return 0.0
+	total = len(data)
+	return -sum(count / total * math.log2(count / total) for count in byte_histogram(data) if count)
+
+
+def repetitiveness(data: bytes) -> float:
+	"""Share of the 4-byte strings of ``data`` that already occurred earlier in it."""
+	positions = len(data) - GRAM + 1
+	if positions <= 0:
+		return 0.0
+	seen = set()
+	repeats = 0
+	for position in range(positions):
+		gram = data[position:position + GRAM]
+		if gram in seen:
+			repeats += 1
+		else:
+			seen.add(gram)
+	return repeats / positions
+
+
+def estimate(data, lzw: AbstractAlgorithm) -> dict[CodingType, float]:
+	"""Estimate the output to input ratio of every candidate from a sample of the block."""
+	probe = sample(data)
+	estimates = {CodingType.STORE: 1.0}
+	if not probe:
+		return estimates
+	# order-0 entropy is what huffman reaches, plus its 256 byte table
+	estimates[CodingType.HUFFMAN] = entropy(probe) / 8 + 256 / len(data)
+	if repetitiveness(probe) >= MIN_REPEATS:
+		# lzw gains depend on the phrases it learns, so code the sample to find out
+		estimates[CodingType.LZW] = len(lzw.encode_block(probe)) / len(probe)
+	return estimates
+
+
+def choose(data, lzw: AbstractAlgorithm) -> CodingType:
+	estimates = estimate(data, lzw)
+	best = min(estimates, key=estimates.get)
+	return best if estimates[best] <= MAX_RATIO else CodingType.STORE
+
+
+class AutoCoding(AbstractAlgorithm):
+	"""
+	Picks huffman, lzw or store for every block from a sample of it.
+
+	The sample is a few slices spread over the block. Its order-0 entropy
+	predicts huffman, and when enough of it repeats, lzw codes the sample to
+	predict itself.
+
+	Each block payload starts with the algorithm id of the coder that was
+	picked, followed by that coder's own payload. A block that would come
+	out larger than its input is stored instead.
+	"""
+	coding_type = CodingType.AUTO
+
+	def __init__(self, path: str, directory: str, **kwargs):
+		super().__init__(directory=directory, path=path, suffix='.auto', **kwargs)
+		self.coders = {coding_type: get_algorithm(coding_type)(directory=directory, path=path)
+		               for coding_type in CANDIDATES}
+
+	def encode_block(self, data) -> bytes:
+		with phase('sampling'):
+			coding_type = choose(data, self.coders[CodingType.LZW])
+		payload = self.coders[coding_type].encode_block(data)
+		if coding_type != CodingType.STORE and len(payload) >= len(data):
+			coding_type = CodingType.STORE
+			payload = self.coders[coding_type].encode_block(data)
+		return bytes([ALGORITHM_IDS[coding_type]]) + payload
+
+	def decode_block(self, payload, size: int):
+		if not payload:
+			raise ValueError('Truncated auto block')
+		coding_type = ALGORITHMS.get(payload[0])
+		if coding_type not in self.coders:
+			raise ValueError(f'Unexpected algorithm id in auto block: {payload[0]}')
+		return self.coders[coding_type].decode_block(memoryview(payload)[1:], size)
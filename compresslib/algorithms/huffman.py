@@ -1,20 +1,38 @@
 import heapq
-import os
-import pickle
-from collections import Counter
-from typing import Optional
+import sys
+from typing import Iterable, Optional
 
 from ..base.abstract import AbstractAlgorithm
+from ..base.enums import CodingType
+from ..utils.buffers import byte_histogram
+from ..utils.profiling import phase, profiled
+
+PAIR_TABLE_THRESHOLD = 1 << 16
+LOOKUP_BITS = 12
+# smaller blocks use the code lengths of a trained dictionary instead of their own
+DICTIONARY_BLOCK_LIMIT = 64 << 10
+OWN_TABLE, DICTIONARY_TABLE = range(2)
+
+
+def train_code_lengths(samples: Iterable[bytes]) -> bytes:
+	frequency = [1] * 256
+	# every byte gets a code, the samples never show them all
+	for sample in samples:
+		frequency = [total + count for total, count in zip(frequency, byte_histogram(sample))]
+	return HuffmanCoding(directory='.', path='-').build_code_lengths(dict(enumerate(frequency)))
 
 
 class HuffmanCoding(AbstractAlgorithm):
+	coding_type = CodingType.HUFFMAN
+	supports_dictionary = True
 
-	def __init__(self, directory, path: Optional[str] = None):
+	def __init__(self, directory, path: Optional[str] = None, **kwargs):
 		self.heap = []
 		self.codes = {}
 		self.reverse_mapping = {}
-		self.tree = None
-		super().__init__(suffix='.huff', directory=directory, path=path)
+		self.code_lengths = bytes(256)
+		self.dictionary_tables = None
+		super().__init__(suffix='.huff', directory=directory, path=path, **kwargs)
 
 	class HeapNode:
 		def __init__(self, char, freq):
@@ -26,11 +44,9 @@ class HuffmanCoding(AbstractAlgorithm):
 		def __lt__(self, other):
 			return self.freq < other.freq
 
-	def __calculate_frequency(self):
-		with open(self.path, 'rb') as f:
-			data = f.read()
-		frequency = Counter(data)
-		return frequency
+	@staticmethod
+	def __calculate_frequency(data):
+		return {byte: count for byte, count in enumerate(byte_histogram(data)) if count}
 
 	def __build_heap(self, frequency):
 		for key in frequency:
@@ -48,138 +64,226 @@ class HuffmanCoding(AbstractAlgorithm):
 
 			heapq.heappush(self.heap, merged)
 
-	def __build_codes_helper(self, root, current_code):
-		if not root:
+	def __build_codes_helper(self, root, length, code_lengths):
+		if root is None:
 			return
 
-		if root.char:
-			self.codes[root.char] = current_code
-			self.reverse_mapping[current_code] = root.char
+		if root.char is not None:
+			# a single-symbol input still needs one bit per symbol
+			code_lengths[root.char] = length or 1
 			return
 
-		self.__build_codes_helper(root.left, current_code + "0")
-		self.__build_codes_helper(root.right, current_code + "1")
+		self.__build_codes_helper(root.left, length + 1, code_lengths)
+		self.__build_codes_helper(root.right, length + 1, code_lengths)
 
 	def __build_codes(self):
-		root = heapq.heappop(self.heap)
-		self.tree = root
-		current_code = ""
-		self.__build_codes_helper(root, current_code)
+		code_lengths = bytearray(256)
+		if self.heap:
+			root = heapq.heappop(self.heap)
+			self.__build_codes_helper(root, 0, code_lengths)
+		self.__assign_canonical_codes(bytes(code_lengths))
+
+	def __assign_canonical_codes(self, code_lengths: bytes):
+		self.code_lengths = code_lengths
+		self.codes = {}
+		self.reverse_mapping = {}
+		code = 0
+		previous_length = 0
+		for length, symbol in sorted((length, symbol) for symbol, length in enumerate(code_lengths) if length):
+			code <<= length - previous_length
+			self.codes[symbol] = (code, length)
+			self.reverse_mapping[(code, length)] = symbol
+			code += 1
+			previous_length = length
+
+	@profiled('pair table')
+	def __build_pair_table(self):
+		table = [self.codes.get(byte, (0, 0)) for byte in range(256)]
+		pairs = [(0, 0)] * 65536
+		little = sys.byteorder == 'little'
+		for first, (first_code, first_length) in enumerate(table):
+			if not first_length:
+				continue
+			for second, (second_code, second_length) in enumerate(table):
+				if not second_length:
+					continue
+				word = first | second << 8 if little else first << 8 | second
+				pairs[word] = (first_code << second_length | second_code, first_length + second_length)
+		return pairs
 
 	def __get_encoded_text(self, data):
-		encoded_text = ''.join(self.codes[byte] for byte in data)
-		return encoded_text
-
-	@staticmethod
-	def __pad_encoded_text(encoded_text):
-		extra_padding = 8 - len(encoded_text) % 8
-		encoded_text += "0" * extra_padding
-
-		padded_info = "{0:08b}".format(extra_padding)
-		encoded_text = padded_info + encoded_text
-		return encoded_text
-
-	@staticmethod
-	def __get_byte_array(padded_encoded_text):
-		return bytes([int(padded_encoded_text[i:i + 8], 2) for i in range(0, len(padded_encoded_text), 8)])
-
-	@staticmethod
-	def __remove_padding(padded_encoded_text):
-		padded_info = padded_encoded_text[:8]
-		extra_padding = int(padded_info, 2)
-
-		padded_encoded_text = padded_encoded_text[8:]
-		encoded_text = padded_encoded_text[:-1 * extra_padding]
-
-		return encoded_text
-
-	@staticmethod
-	def __get_byte_string(b):
-		return ''.join([bin(byte)[2:].rjust(8, '0') for byte in b])
-
-	def __decode_text(self, encoded_text):
-		current_node = self.tree
+		data = memoryview(data)
+		out = bytearray(1)
+		acc = 0
+		nbits = 0
+
+		if len(data) >= PAIR_TABLE_THRESHOLD:
+			symbols = data[:len(data) & ~1].cast('H')
+			table = self.__build_pair_table()
+			tail = data[len(data) & ~1:]
+		else:
+			symbols = data
+			table = [self.codes.get(byte, (0, 0)) for byte in range(256)]
+			tail = b''
+
+		for symbol in symbols:
+			code, length = table[symbol]
+			acc = acc << length | code
+			nbits += length
+			if nbits >= 64:
+				nbits -= 64
+				out += (acc >> nbits).to_bytes(8, 'big')
+				acc &= (1 << nbits) - 1
+
+		for symbol in tail:
+			code, length = self.codes[symbol]
+			acc = acc << length | code
+			nbits += length
+
+		extra_padding = 8 - nbits % 8
+		nbits += extra_padding
+		out += (acc << extra_padding).to_bytes(nbits // 8, 'big')
+		out[0] = extra_padding
+		return bytes(out)
+
+	@profiled('decode tables')
+	def __build_decode_tables(self):
+		mask = (1 << LOOKUP_BITS) - 1
+		single = [(0, 0)] * (1 << LOOKUP_BITS)
+		for symbol, (code, length) in self.codes.items():
+			if length <= LOOKUP_BITS:
+				start = code << (LOOKUP_BITS - length)
+				single[start:start + (1 << (LOOKUP_BITS - length))] = [(symbol, length)] * (1 << (LOOKUP_BITS - length))
+
+		multi = []
+		for index in range(1 << LOOKUP_BITS):
+			symbols = bytearray()
+			used = 0
+			while True:
+				symbol, length = single[(index << used) & mask]
+				if not length or used + length > LOOKUP_BITS:
+					break
+				symbols.append(symbol)
+				used += length
+			multi.append((bytes(symbols), used))
+
+		# canonical ranges for codes that do not fit into a single lookup
+		max_length = max(self.code_lengths, default=0)
+		counts = [0] * (max_length + 2)
+		for length in self.code_lengths:
+			counts[length] += 1
+		counts[0] = 0
+		first = [0] * (max_length + 2)
+		offset = [0] * (max_length + 2)
+		code = 0
+		index = 0
+		for length in range(1, max_length + 1):
+			first[length] = code
+			offset[length] = index
+			code = (code + counts[length]) << 1
+			index += counts[length]
+		ordered = [symbol for length, symbol in sorted(
+			(length, symbol) for symbol, length in enumerate(self.code_lengths) if length)]
+
+		return single, multi, (first, offset, counts, ordered, max_length)
+
+	def __decode_text(self, b, tables=None):
+		single, multi, (first, offset, counts, ordered, max_length) = tables or self.__build_decode_tables()
+		data = memoryview(b)[1:]
+		remaining = len(data) * 8 - b[0]
 		decoded_text = bytearray()
-		tree_root = self.tree
-
-		for bit in encoded_text:
-			current_node = current_node.left if bit == "0" else current_node.right
-
-			if current_node.char is not None:
-				decoded_text.append(current_node.char)
-				current_node = tree_root
-
-		return bytes(decoded_text)
-
-	def _compress(self):
-		frequency = self.__calculate_frequency()
+		lookup = LOOKUP_BITS
+		mask = (1 << lookup) - 1
+		acc = 0
+		nbits = 0
+		pos = 0
+
+		while remaining > 0:
+			if nbits < lookup:
+				chunk = data[pos:pos + 6]
+				pos += 6
+				acc = (acc & ((1 << nbits) - 1)) << 48 | int.from_bytes(chunk, 'big') << (48 - 8 * len(chunk))
+				nbits += 48
+			index = acc >> (nbits - lookup) & mask
+
+			if remaining >= lookup:
+				symbols, used = multi[index]
+				if used:
+					decoded_text += symbols
+					nbits -= used
+					remaining -= used
+					continue
+			else:
+				symbol, used = single[index]
+				if used:
+					if used > remaining:
+						raise ValueError('Truncated huffman stream')
+					decoded_text.append(symbol)
+					nbits -= used
+					remaining -= used
+					continue
+
+			# slow path: extend the code bit by bit past the lookup width
+			code = index
+			length = lookup
+			while True:
+				length += 1
+				if length > max_length or length > remaining:
+					raise ValueError('Corrupted huffman stream')
+				if nbits < length:
+					chunk = data[pos:pos + 6]
+					pos += 6
+					acc = acc << 48 | int.from_bytes(chunk, 'big') << (48 - 8 * len(chunk))
+					nbits += 48
+				code = code << 1 | (acc >> (nbits - length)) & 1
+				if code - first[length] < counts[length]:
+					decoded_text.append(ordered[offset[length] + code - first[length]])
+					break
+			nbits -= length
+			remaining -= length
+
+		return decoded_text
+
+	def build_code_lengths(self, frequency) -> bytes:
 		self.__build_heap(frequency)
 		self.__merge_nodes()
 		self.__build_codes()
-
-		with open(self.path, 'rb') as f:
-			data = f.read()
-
-		encoded_text = self.__get_encoded_text(data)
-		padded_encoded_text = self.__pad_encoded_text(encoded_text)
-
-		b = self.__get_byte_array(padded_encoded_text)
-		file_extension = os.path.splitext(self.path)[1]
-
-		return file_extension, self.tree, b
-
-	def compress(self):
-		file_extension, tree, b = self._compress()
-		with open(self.directory + '/' + self.base_name + self.suffix, 'wb') as f:
-			pickle.dump((file_extension, tree, b), f)
-
-	def _decompress(self):
-		with open(self.path, 'rb') as f:
-			extension, self.tree, b = pickle.load(f)
-
-		bit_string = self.__get_byte_string(b)
-
-		encoded_text = self.__remove_padding(bit_string)
-		decompressed_text = self.__decode_text(encoded_text)
-
-		return extension, decompressed_text
-
-	def decompress(self):
-		extension, decompressed_text = self._decompress()
-		path_to_save = os.path.join(self.directory, self.base_name + extension)
-		os.makedirs(os.path.dirname(path_to_save), exist_ok=True)
-		with open(path_to_save, 'wb') as f:
-			f.write(decompressed_text)
-
-	def __encode_directory(self, files_dict: dict):
-		for root, _, files in os.walk(self.dir_for_archive):
-			for file in files:
-				file_path = str(os.path.join(root, file))
-				self.path = file_path
-				file_extension, tree, b = self._compress()
-				relative_path = os.path.relpath(self.path, self.dir_for_archive)
-				files_dict[relative_path] = (file_extension, tree, b)
-
-	def __decode_directory(self, files_dict: dict):
-		for relative_path, (file_extension, tree, b) in files_dict.items():
-			self.tree = tree
-			full_path = os.path.join(self.directory, relative_path)
-			os.makedirs(os.path.dirname(full_path), exist_ok=True)
-			decompressed_text = self.__decode_text(
-				self.__remove_padding(self.__get_byte_string(b)))
-			yield full_path, decompressed_text
-
-	def compress_archive(self):
-		files_dict = {}
-		self.__encode_directory(files_dict)
-		archive_name = os.path.basename(self.dir_for_archive) + self.suffix
-		with open(archive_name, 'wb') as f:
-			pickle.dump(files_dict, f)
-
-	def decompress_archive(self):
-		with open(self.dir_for_archive, 'rb') as f:
-			files_dict = pickle.load(f)
-
-		for full_path, decompressed_text in self.__decode_directory(files_dict):
-			with open(full_path, 'wb') as f:
-				f.write(decompressed_text)
+		return self.code_lengths
+
+	def __use_dictionary(self):
+		if self.code_lengths != self.dictionary.code_lengths:
+			self.__assign_canonical_codes(self.dictionary.code_lengths)
+
+	def encode_block(self, data) -> bytes:
+		if self.dictionary is not None and len(data) < DICTIONARY_BLOCK_LIMIT:
+			# no counting and no tree, the codes come from the dictionary
+			self.__use_dictionary()
+			with phase('bit packing', len(data)):
+				return bytes([DICTIONARY_TABLE]) + self.__get_encoded_text(data)
+
+		with phase('frequency', len(data)):
+			frequency = self.__calculate_frequency(data)
+		with phase('tree'):
+			self.build_code_lengths(frequency)
+
+		table = b'' if self.dictionary is None else bytes([OWN_TABLE])
+		with phase('bit packing', len(data)):
+			return table + self.code_lengths + self.__get_encoded_text(data)
+
+	def decode_block(self, payload, size: int):
+		view = memoryview(payload)
+		if self.dictionary is not None:
+			if not view:
+				raise ValueError('Truncated huffman block')
+			table, view = view[0], view[1:]
+			if table == DICTIONARY_TABLE:
+				self.__use_dictionary()
+				if self.dictionary_tables is None or self.dictionary_tables[0] != self.dictionary.id:
+					self.dictionary_tables = self.dictionary.id, self.__build_decode_tables()
+				with phase('bit unpacking', size):
+					return self.__decode_text(view, self.dictionary_tables[1])
+			if table != OWN_TABLE:
+				raise ValueError(f'Unknown huffman table: {table}')
+		self.__assign_canonical_codes(bytes(view[:256]))
+		with phase('bit unpacking', size):
+			return self.__decode_text(view[256:])
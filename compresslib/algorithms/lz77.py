@@ -0,0 +1,224 @@
+import struct
+
+from . import get_algorithm
+from ..base.abstract import AbstractAlgorithm
+from ..base.defaults import DEFAULT_LEVEL, DEFAULT_WINDOW_BITS, MAX_LEVEL, MAX_WINDOW_BITS, MIN_LEVEL, \
+	MIN_WINDOW_BITS
+from ..base.enums import CodingType
+from ..utils.profiling import phase
+
+PARAMETERS = struct.Struct('<BBB')
+STREAM = struct.Struct('<BII')
+
+MIN_MATCH = 3
+MAX_MATCH = 258
+
+# level -> (candidates checked per position, longest match still worth a lazy
+# look at the next position, match length that stops the search). Shaped like
+# zlib's table with shorter chains, every candidate costs a Python loop step.
+LEVELS = {
+	1: (4, 0, 16),
+	2: (8, 0, 32),
+	3: (16, 0, 64),
+	4: (16, 16, 64),
+	5: (16, 32, 128),
+	6: (32, 64, MAX_MATCH),
+	7: (64, 128, MAX_MATCH),
+	8: (256, MAX_MATCH, MAX_MATCH),
+	9: (1024, MAX_MATCH, MAX_MATCH),
+}
+
+FLAG_HUFFMAN = 1
+RAW, HUFFMAN = range(2)
+
+
+def write_varint(out: bytearray, value: int):
+	while value >= 0x80:
+		out.append(value & 0x7F | 0x80)
+		value >>= 7
+	out.append(value)
+
+
+def read_varint(data: bytes, position: int) -> tuple[int, int]:
+	value = 0
+	shift = 0
+	while True:
+		if position >= len(data):
+			raise ValueError('Truncated lz77 command stream')
+		byte = data[position]
+		position += 1
+		value |= (byte & 0x7F) << shift
+		if byte < 0x80:
+			return value, position
+		shift += 7
+
+
+class LZ77Coding(AbstractAlgorithm):
+	"""
+	LZ77 over a sliding window with a hash-chain match finder and lazy matching.
+
+	A block is parsed into sequences of literals followed by a match. The
+	parse is written as three streams: commands (literal run and match length
+	varints), literal bytes and distance varints. With the huffman back end,
+	each stream is passed through the huffman block coder and kept only if
+	that makes it smaller.
+	"""
+	coding_type = CodingType.LZ77
+	__slots__ = ('level', 'window_bits', 'huffman', 'entropy')
+
+	def __init__(self, path: str, directory: str, level: int = DEFAULT_LEVEL,
+	             window_bits: int = DEFAULT_WINDOW_BITS, huffman: bool = True, **kwargs):
+		super().__init__(directory=directory, path=path, suffix='.lz77', **kwargs)
+		self.set_parameters(level, window_bits, huffman)
+		self.entropy = get_algorithm(CodingType.HUFFMAN)(directory=directory, path=path)
+
+	def set_parameters(self, level: int, window_bits: int, huffman: bool):
+		if level not in LEVELS:
+			raise ValueError(f'LZ77 level must be between {MIN_LEVEL} and {MAX_LEVEL}, got {level}')
+		if not MIN_WINDOW_BITS <= window_bits <= MAX_WINDOW_BITS:
+			raise ValueError(f'LZ77 window must be between {MIN_WINDOW_BITS} and {MAX_WINDOW_BITS} bits, '
+			                 f'got {window_bits}')
+		self.level = level
+		self.window_bits = window_bits
+		self.huffman = huffman
+
+	def _parse(self, data: bytes) -> tuple[bytearray, bytearray, bytearray]:
+		max_chain, max_lazy, nice_length = LEVELS[self.level]
+		window = (1 << self.window_bits) - 1
+		size = len(data)
+		head = {}
+		previous = [-1] * size
+		commands = bytearray()
+		literals = bytearray()
+		distances = bytearray()
+
+		def insert(position: int) -> int:
+			key = data[position:position + MIN_MATCH]
+			candidate = head.get(key, -1)
+			previous[position] = candidate
+			head[key] = position
+			return candidate
+
+		def find(position: int) -> tuple[int, int]:
+			if position + MIN_MATCH > size:
+				return 0, 0
+			candidate = insert(position)
+			limit = min(MAX_MATCH, size - position)
+			best = 0
+			distance = 0
+			chain = max_chain
+			while candidate >= 0 and position - candidate <= window and chain:
+				if best < MIN_MATCH or data[candidate + best] == data[position + best]:
+					length = MIN_MATCH
+					while length + 16 <= limit and \
+							data[candidate + length:candidate + length + 16] == data[position + length:position + length + 16]:
+						length += 16
+					while length < limit and data[candidate + length] == data[position + length]:
+						length += 1
+					if length > best:
+						best = length
+						distance = position - candidate
+						if length >= nice_length or length == limit:
+							break
+				candidate = previous[candidate]
+				chain -= 1
+			return best, distance
+
+		literal_start = 0
+		position = 0
+		found = None
+		while position < size:
+			length, distance = found if found is not None else find(position)
+			found = None
+			if length < MIN_MATCH:
+				position += 1
+				continue
+			if length < max_lazy and position + 1 < size:
+				following = find(position + 1)
+				if following[0] > length:
+					# a longer match starts at the next byte, emit this one as a literal
+					position += 1
+					found = following
+					continue
+				skip_from = position + 2
+			else:
+				skip_from = position + 1
+
+			for inside in range(skip_from, min(position + length, size - MIN_MATCH + 1)):
+				insert(inside)
+			write_varint(commands, position - literal_start)
+			write_varint(commands, length - MIN_MATCH + 1)
+			write_varint(distances, distance - 1)
+			literals += data[literal_start:position]
+			position += length
+			literal_start = position
+
+		write_varint(commands, size - literal_start)
+		write_varint(commands, 0)
+		literals += data[literal_start:]
+		return commands, literals, distances
+
+	def _pack_stream(self, stream: bytearray) -> bytes:
+		if self.huffman and stream:
+			with phase('huffman', len(stream)):
+				coded = self.entropy.encode_block(bytes(stream))
+			if len(coded) < len(stream):
+				return STREAM.pack(HUFFMAN, len(stream), len(coded)) + coded
+		return STREAM.pack(RAW, len(stream), len(stream)) + stream
+
+	def _unpack_stream(self, payload: memoryview, offset: int) -> tuple[bytes, int]:
+		if len(payload) - offset < STREAM.size:
+			raise ValueError('Truncated lz77 block')
+		method, raw_length, length = STREAM.unpack_from(payload, offset)
+		offset += STREAM.size
+		body = payload[offset:offset + length]
+		if len(body) != length:
+			raise ValueError('Truncated lz77 block')
+		if method == HUFFMAN:
+			stream = bytes(self.entropy.decode_block(body, raw_length))
+		elif method == RAW:
+			stream = bytes(body)
+		else:
+			raise ValueError(f'Unknown lz77 stream method: {method}')
+		if len(stream) != raw_length:
+			raise ValueError('Corrupted lz77 stream')
+		return stream, offset + length
+
+	def encode_block(self, data) -> bytes:
+		with phase('match finding', len(data)):
+			streams = self._parse(bytes(data))
+		flags = FLAG_HUFFMAN if self.huffman else 0
+		return PARAMETERS.pack(self.level, self.window_bits, flags) + b''.join(map(self._pack_stream, streams))
+
+	def decode_block(self, payload, size: int):
+		view = memoryview(payload)
+		offset = PARAMETERS.size
+		commands, offset = self._unpack_stream(view, offset)
+		literals, offset = self._unpack_stream(view, offset)
+		distances, offset = self._unpack_stream(view, offset)
+
+		out = bytearray()
+		command_position = 0
+		literal_position = 0
+		distance_position = 0
+		while True:
+			literal_length, command_position = read_varint(commands, command_position)
+			out += literals[literal_position:literal_position + literal_length]
+			literal_position += literal_length
+			length, command_position = read_varint(commands, command_position)
+			if not length:
+				break
+			length += MIN_MATCH - 1
+			distance, distance_position = read_varint(distances, distance_position)
+			start = len(out) - distance - 1
+			if start < 0:
+				raise ValueError('Corrupted lz77 stream')
+			if distance + 1 >= length:
+				out += out[start:start + length]
+			else:
+				# the match overlaps its own output, repeat the period
+				period = out[start:]
+				out += (period * (length // len(period) + 1))[:length]
+		if len(out) != size:
+			raise ValueError('Corrupted lz77 stream')
+		return out
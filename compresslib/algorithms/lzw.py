@@ -1,122 +1,275 @@
-import os
-import pickle
-from collections import defaultdict
-from pathlib import Path
+import struct
+from typing import Iterable, Optional
 
 from ..base.abstract import AbstractAlgorithm
+from ..base.defaults import DEFAULT_BITS, MAX_BITS, MIN_BITS
+from ..base.enums import CodingType
+
+CODE_WIDTH = struct.Struct('<B')
+
+CLEAR_CODE = 256
+FIRST_CODE = 257
+# input symbols between ratio checks once the table is full, as in compress(1)
+CHECK_GAP = 10000
+# phrases an lzw table may grow to while training a dictionary
+TRAINING_PHRASES = 1 << 20
+
+
+def train_phrases(samples: Iterable[bytes], max_phrases: int) -> list[int]:
+	"""
+	Pick the phrases an LZW table built over all samples emitted most.
+
+	A phrase is credited with the uses of the phrases extending it, so it
+	always ranks before them and every prefix of a kept phrase is kept. The
+	result is renumbered in rank order, see ``base/dictionary.py``.
+	"""
+	table = {}
+	keys = []
+	uses = []
+	for sample in samples:
+		data = memoryview(sample)
+		if not data:
+			continue
+		code = data[0]
+		for byte in data[1:]:
+			key = code << 8 | byte
+			next_code = table.get(key)
+			if next_code is not None:
+				code = next_code
+				continue
+			if code >= FIRST_CODE:
+				uses[code - FIRST_CODE] += 1
+			if len(keys) < TRAINING_PHRASES:
+				table[key] = FIRST_CODE + len(keys)
+				keys.append(key)
+				uses.append(0)
+			code = byte
+		if code >= FIRST_CODE:
+			uses[code - FIRST_CODE] += 1
+
+	for index in range(len(keys) - 1, -1, -1):
+		prefix = keys[index] >> 8
+		if prefix >= FIRST_CODE:
+			uses[prefix - FIRST_CODE] += uses[index]
+	# sorted() is stable, so a prefix with as many uses as its extension still comes first
+	ranked = sorted((index for index in range(len(keys)) if uses[index] > 1), key=lambda index: -uses[index])
+	ranked = ranked[:max_phrases]
+	codes = {FIRST_CODE + index: FIRST_CODE + rank for rank, index in enumerate(ranked)}
+	return [codes.get(keys[index] >> 8, keys[index] >> 8) << 8 | keys[index] & 0xFF for index in ranked]
+
+
+def check_max_bits(max_bits: int):
+	if not MIN_BITS <= max_bits <= MAX_BITS:
+		raise ValueError(f'LZW code width must be between {MIN_BITS} and {MAX_BITS} bits, got {max_bits}')
 
 
 class LZWCoding(AbstractAlgorithm):
-	__slots__ = ('max_table_size', 'compress_dict', 'decompress_dict', 'dict_size', )
+	coding_type = CodingType.LZW
+	supports_dictionary = True
+	__slots__ = ('max_bits', 'max_table_size', 'compress_dict', 'dict_size', 'primed')
 
-	def __init__(self, path: str, directory: str):
-		super().__init__(directory=directory, path=path, suffix='.lzw')
-		self.max_table_size = 256 ** 2
+	def __init__(self, path: str, directory: str, max_bits: int = DEFAULT_BITS, **kwargs):
+		super().__init__(directory=directory, path=path, suffix='.lzw', **kwargs)
+		# primed encoder and decoder tables by number of dictionary phrases
+		self.primed = {}
+		self.set_max_bits(max_bits)
 		self.reset_dictionaries()
 
+	def set_max_bits(self, max_bits: int):
+		check_max_bits(max_bits)
+		self.max_bits = max_bits
+		self.max_table_size = 1 << max_bits
+
+	def dictionary_phrases(self, max_bits: Optional[int] = None) -> int:
+		"""Dictionary phrases that prime the table, half of the table is left for the data."""
+		if self.dictionary is None:
+			return 0
+		max_table_size = self.max_table_size if max_bits is None else 1 << max_bits
+		return min(len(self.dictionary.phrases), (max_table_size - FIRST_CODE) // 2)
+
 	def reset_dictionaries(self):
-		self.dict_size = 256
-		if Path(self.path).suffix != self.suffix:
-			self.compress_dict = defaultdict(lambda: -1, {chr(i): i for i in range(self.dict_size)})
-		self.decompress_dict = {i: chr(i) for i in range(self.dict_size)}
+		count = self.dictionary_phrases()
+		self.dict_size = FIRST_CODE + count
+		# (prefix code << 8 | next byte) -> code, single bytes are their own codes
+		self.compress_dict = dict(self.primed_tables(count)[0]) if count else {}
 
-	def _compress(self, uncompressed):
+	def primed_tables(self, count: int) -> tuple[dict, bytes, list, list]:
+		"""
+		Return the encoder table of the first ``count`` dictionary phrases,
+		and for the decoder the phrases written one after another with the
+		start and length of each.
+		"""
+		tables = self.primed.get(count)
+		if tables is not None:
+			return tables
+		compress_dict = {}
+		strings = bytearray()
+		starts = []
+		lengths = []
+		for index, phrase in enumerate(self.dictionary.phrases[:count]):
+			prefix = phrase >> 8
+			start = len(strings)
+			if prefix < CLEAR_CODE:
+				strings.append(prefix)
+			elif FIRST_CODE <= prefix < FIRST_CODE + index:
+				strings += strings[starts[prefix - FIRST_CODE]:starts[prefix - FIRST_CODE] + lengths[prefix - FIRST_CODE]]
+			else:
+				raise ValueError('Corrupted dictionary phrase table')
+			strings.append(phrase & 0xFF)
+			starts.append(start)
+			lengths.append(len(strings) - start)
+			compress_dict[phrase] = FIRST_CODE + index
+		tables = self.primed[count] = compress_dict, bytes(strings), starts, lengths
+		return tables
+
+	def _compress(self, uncompressed) -> bytes:
+		data = memoryview(uncompressed)
+		if not data:
+			return b''
 		compress_dict = self.compress_dict
 		max_table_size = self.max_table_size
+		max_bits = self.max_bits
 		dict_size = self.dict_size
+		width = max(MIN_BITS, (dict_size - 1).bit_length())
 
-		string = ""
-		compressed_data = []
-		for symbol in uncompressed:
-			string_plus_symbol = string + symbol
-			if string_plus_symbol in compress_dict:
-				string = string_plus_symbol
-			else:
-				compressed_data.append(compress_dict.get(string, -1))
-				if len(compress_dict) < max_table_size:
-					compress_dict[string_plus_symbol] = dict_size
-					dict_size += 1
-				string = symbol
+		out = bytearray()
+		acc = 0
+		nbits = 0
+		checkpoint = CHECK_GAP
+		ratio = 0
 
-		if string:
-			compressed_data.append(compress_dict.get(string, -1))
+		code = data[0]
+		for position, byte in enumerate(data[1:], 1):
+			key = code << 8 | byte
+			next_code = compress_dict.get(key)
+			if next_code is not None:
+				code = next_code
+				continue
 
+			acc = acc << width | code
+			nbits += width
+			if nbits >= 64:
+				nbits -= 64
+				out += (acc >> nbits).to_bytes(8, 'big')
+				acc &= (1 << nbits) - 1
+
+			if dict_size < max_table_size:
+				compress_dict[key] = dict_size
+				dict_size += 1
+				if dict_size > 1 << width and width < max_bits:
+					width += 1
+			elif position >= checkpoint:
+				# the table is full, keep it only while the ratio still improves
+				checkpoint = position + CHECK_GAP
+				current = (position << 8) // (len(out) * 8 + nbits)
+				if current > ratio:
+					ratio = current
+				else:
+					ratio = 0
+					acc = acc << width | CLEAR_CODE
+					nbits += width
+					compress_dict.clear()
+					dict_size = FIRST_CODE
+					width = MIN_BITS
+			code = byte
+
+		acc = acc << width | code
+		nbits += width
+
+		extra_padding = -nbits % 8
+		out += (acc << extra_padding).to_bytes((nbits + extra_padding) // 8, 'big')
 		self.dict_size = dict_size
 
-		return compressed_data
+		return bytes(out)
 
-	def _decompress(self, compressed):
-		compressed = (int(x) for x in compressed)
-		string = chr(next(compressed))
-		decompressed_data = [string]
+	def _decompress(self, compressed, size: int, max_bits: Optional[int] = None) -> bytearray:
+		data = memoryview(compressed)
+		max_bits = self.max_bits if max_bits is None else max_bits
+		max_table_size = 1 << max_bits
+		count = self.dictionary_phrases(max_bits)
+		dict_size = FIRST_CODE + count
+		width = max(MIN_BITS, (dict_size - 1).bit_length())
 
-		for k in compressed:
-			try:
-				entry = self.decompress_dict[k]
-			except KeyError:
-				if k == self.dict_size:
-					entry = string + string[0]
+		# every entry is a slice of the output written so far, which starts with the dictionary phrases
+		if count:
+			_, primer, primed_starts, primed_lengths = self.primed_tables(count)
+			starts = list(primed_starts)
+			lengths = list(primed_lengths)
+		else:
+			primer = b''
+			starts = []
+			lengths = []
+		decompressed_data = bytearray(len(primer) + size)
+		decompressed_data[:len(primer)] = primer
+		view = memoryview(decompressed_data)
+		pos = len(primer)
+		prev_start = -1
+		prev_length = 0
+		acc = 0
+		nbits = 0
+		offset = 0
+		end = len(data)
+
+		try:
+			while True:
+				while nbits < width and offset < end:
+					acc = acc << 8 | data[offset]
+					offset += 1
+					nbits += 8
+				if nbits < width:
+					break
+				nbits -= width
+				k = acc >> nbits
+				acc &= (1 << nbits) - 1
+
+				if k < CLEAR_CODE:
+					view[pos] = k
+					length = 1
+				elif k == CLEAR_CODE:
+					starts.clear()
+					lengths.clear()
+					dict_size = FIRST_CODE
+					width = MIN_BITS
+					prev_start = -1
+					continue
+				elif k < dict_size:
+					start = starts[k - FIRST_CODE]
+					length = lengths[k - FIRST_CODE]
+					view[pos:pos + length] = view[start:start + length]
+				elif k == dict_size and prev_start >= 0:
+					length = prev_length + 1
+					view[pos:pos + prev_length] = view[prev_start:prev_start + prev_length]
+					view[pos + prev_length] = view[prev_start]
 				else:
 					raise ValueError(f'Bad compressed k: {k}')
 
-			decompressed_data.append(entry)
-
-			if len(self.decompress_dict) < self.max_table_size:
-				self.decompress_dict[self.dict_size] = string + entry[0]
-				self.dict_size += 1
-
-			string = entry
-
-		return ''.join(decompressed_data)
-
-	def compress(self):
-		with open(self.path, 'r') as input_file:
-			uncompressed_data = input_file.read()
-
-		compressed_data = self._compress(uncompressed_data)
-
-		with open(self.directory + '/' + self.base_name + self.suffix, 'wb') as output_file:
-			pickle.dump((str(Path(self.path).suffix), compressed_data), output_file)
-
-	def decompress(self):
-		with open(self.path, 'rb') as input_file:
-			file_extension, compressed_data = pickle.load(input_file)
-
-		decompressed_data = self._decompress(compressed_data)
-		path_to_save = os.path.join(self.directory, self.base_name + file_extension)
-		os.makedirs(os.path.dirname(path_to_save), exist_ok=True)
-		with open(path_to_save, 'w') as output_file:
-			output_file.write(decompressed_data)
-
-	def _compress_folder(self, folder_path: str) -> dict:
-		files_dict = {}
-		for root, _, files in os.walk(folder_path):
-			for file in files:
-				file_path = os.path.join(root, file)
-				with open(file_path, 'r') as input_file:
-					uncompressed_data = input_file.read()
-				compressed_data = self._compress(uncompressed_data)
-				relative_path = os.path.relpath(file_path, folder_path)
-				files_dict[relative_path] = compressed_data
-		return files_dict
-
-	def _decompress_folder(self, files_dict: dict):
-		for relative_path, compressed_data in files_dict.items():
-			decompressed_data = self._decompress(compressed_data)
-			file_path = os.path.join(self.directory, relative_path)
-			os.makedirs(os.path.dirname(file_path), exist_ok=True)
-			yield file_path, decompressed_data
-
-	def compress_archive(self):
-		files_dict = self._compress_folder(self.dir_for_archive)
-		archive_name = os.path.basename(self.dir_for_archive) + self.suffix
-		with open(archive_name, 'wb') as f:
-			pickle.dump(files_dict, f)
-
-	def decompress_archive(self):
-		with open(self.dir_for_archive, 'rb') as f:
-			files_dict = pickle.load(f)
-
-		for file_path, decompressed_data in self._decompress_folder(files_dict):
-			with open(file_path, 'w', encoding='utf-8') as output_file:
-				output_file.write(decompressed_data)
+				if prev_start >= 0 and dict_size < max_table_size:
+					starts.append(prev_start)
+					lengths.append(prev_length + 1)
+					dict_size += 1
+				# checked after every code, a primed table may start right at a power of two
+				if dict_size >= 1 << width and width < max_bits:
+					width += 1
+
+				prev_start = pos
+				prev_length = length
+				pos += length
+		except IndexError:
+			raise ValueError('Decompressed data is longer than expected')
+		finally:
+			view.release()
+
+		if pos != len(primer) + size:
+			raise ValueError('Decompressed data is shorter than expected')
+		del decompressed_data[:len(primer)]
+
+		return decompressed_data
+
+	def encode_block(self, data) -> bytes:
+		self.reset_dictionaries()
+		return CODE_WIDTH.pack(self.max_bits) + self._compress(data)
+
+	def decode_block(self, payload, size: int):
+		code_width, = CODE_WIDTH.unpack_from(payload)
+		check_max_bits(code_width)
+		return self._decompress(memoryview(payload)[CODE_WIDTH.size:], size, code_width)
@@ -0,0 +1,177 @@
+import struct
+import threading
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+
+from ..base.abstract import AbstractAlgorithm
+from ..base.defaults import DEFAULT_MEMORY_BITS, DEFAULT_ORDER, MAX_MEMORY_BITS, MAX_ORDER, MIN_MEMORY_BITS, \
+	MIN_ORDER
+from ..base.enums import CodingType
+
+MODEL = struct.Struct('<BB')
+
+TOP = 1 << 24
+BOTTOM = 1 << 16
+MASK = (1 << 32) - 1
+INCREMENT = 24
+# every table also keeps the sums of its 16 groups of 16 counts, so finding a
+# cumulative frequency never walks all 256 counts
+GROUP_BITS = 4
+GROUPS = 256 >> GROUP_BITS
+# totals stay below BOTTOM, so a range of at least BOTTOM always splits into non-empty parts
+LIMIT = BOTTOM - INCREMENT
+
+# the tables of the last model used on this thread, with pristine copies to reset them from
+_local = threading.local()
+
+
+def check_model(order: int, memory_bits: int):
+	if not MIN_ORDER <= order <= MAX_ORDER:
+		raise ValueError(f'Context order must be between {MIN_ORDER} and {MAX_ORDER}, got {order}')
+	if not MIN_MEMORY_BITS <= memory_bits <= MAX_MEMORY_BITS:
+		raise ValueError(f'Context memory must be between {MIN_MEMORY_BITS} and {MAX_MEMORY_BITS} bits, '
+		                 f'got {memory_bits}')
+
+
+class RangeCoding(AbstractAlgorithm):
+	"""
+	Carry-less range coder driven by an adaptive order-k context model.
+
+	The model keeps a frequency table of all 256 byte values for every
+	context, the preceding ``order`` bytes. The tables live in one flat
+	``array('H')`` indexed by ``context * 256 + byte``, next to an
+	``array('I')`` of group sums. Orders whose contexts do not fit in
+	``1 << memory_bits`` tables share them through a hash.
+	"""
+	coding_type = CodingType.RANGE
+	__slots__ = ('order', 'memory_bits')
+
+	def __init__(self, path: str, directory: str, order: int = DEFAULT_ORDER,
+	             memory_bits: int = DEFAULT_MEMORY_BITS, **kwargs):
+		super().__init__(directory=directory, path=path, suffix='.rc', **kwargs)
+		self.set_model(order, memory_bits)
+
+	def set_model(self, order: int, memory_bits: int):
+		check_model(order, memory_bits)
+		self.order = order
+		self.memory_bits = memory_bits
+
+	@staticmethod
+	def _tables(order: int, memory_bits: int) -> tuple[array, array, list, int, int]:
+		"""Return fresh tables for a block, reusing the memory of the previous block of the thread."""
+		context_bits = min(8 * order, memory_bits)
+		contexts = 1 << context_bits
+		cached = getattr(_local, 'tables', None)
+		if cached is None or cached[0] != context_bits:
+			initial = array('H', [1]) * (contexts * 256), array('I', [1 << GROUP_BITS]) * (contexts * GROUPS)
+			cached = _local.tables = context_bits, initial, (array('H', initial[0]), array('I', initial[1]), [])
+		_, (initial_frequencies, initial_groups), (frequencies, groups, totals) = cached
+		# copied in place, the arrays keep their memory
+		frequencies[:] = initial_frequencies
+		groups[:] = initial_groups
+		totals[:] = [256] * contexts
+		# hash the preceding bytes into context_bits bits when they do not fit
+		shift = 32 - context_bits if context_bits < 8 * order else 0
+		return frequencies, groups, totals, (1 << 8 * order) - 1, shift
+
+	@staticmethod
+	def _rescale(frequencies: array, groups: array, totals: list, context: int):
+		base = context << 8
+		for index in range(base, base + 256):
+			frequencies[index] = (frequencies[index] + 1) >> 1
+		total = 0
+		for group in range(GROUPS):
+			start = base + (group << GROUP_BITS)
+			groups[context * GROUPS + group] = value = sum(frequencies[start:start + (1 << GROUP_BITS)])
+			total += value
+		totals[context] = total
+
+	def encode_block(self, data) -> bytes:
+		frequencies, groups, totals, history_mask, shift = self._tables(self.order, self.memory_bits)
+		rescale = self._rescale
+		out = bytearray(MODEL.pack(self.order, self.memory_bits))
+		low = 0
+		size = MASK
+		history = 0
+		context = 0
+		for symbol in memoryview(data):
+			base = context << 8
+			index = base + symbol
+			group = context * GROUPS + (symbol >> GROUP_BITS)
+			size //= totals[context]
+			low += size * (sum(groups[context * GROUPS:group]) + sum(frequencies[index >> GROUP_BITS << GROUP_BITS:index]))
+			size *= frequencies[index]
+			while True:
+				if (low ^ (low + size)) >= TOP:
+					if size >= BOTTOM:
+						break
+					size = -low & (BOTTOM - 1)
+				out.append(low >> 24)
+				low = low << 8 & MASK
+				size = size << 8 & MASK
+
+			frequencies[index] += INCREMENT
+			groups[group] += INCREMENT
+			totals[context] += INCREMENT
+			if totals[context] > LIMIT:
+				rescale(frequencies, groups, totals, context)
+			history = (history << 8 | symbol) & history_mask
+			context = (history * 0x9E3779B1 & MASK) >> shift if shift else history
+		out += low.to_bytes(4, 'big')
+		return bytes(out)
+
+	def decode_block(self, payload, size: int):
+		order, memory_bits = MODEL.unpack_from(payload)
+		check_model(order, memory_bits)
+		frequencies, groups, totals, history_mask, shift = self._tables(order, memory_bits)
+		rescale = self._rescale
+		data = bytes(payload[MODEL.size:])
+		if size and len(data) < 4:
+			raise ValueError('Truncated range coder stream')
+		decoded = bytearray()
+		code = int.from_bytes(data[:4], 'big')
+		position = 4
+		low = 0
+		width = MASK
+		history = 0
+		context = 0
+		for _ in range(size):
+			first_group = context * GROUPS
+			width //= totals[context]
+			target = (code - low) // width
+			cumulative = list(accumulate(groups[first_group:first_group + GROUPS]))
+			group_index = bisect_right(cumulative, target)
+			if group_index >= GROUPS:
+				raise ValueError('Corrupted range coder stream')
+			group = first_group + group_index
+			group_base = cumulative[group_index] - groups[group]
+			target -= group_base
+			start = (context << 8) + (group_index << GROUP_BITS)
+			cumulative = list(accumulate(frequencies[start:start + (1 << GROUP_BITS)]))
+			offset = bisect_right(cumulative, target)
+			symbol = group_index << GROUP_BITS | offset
+			index = start + offset
+			low += width * (group_base + cumulative[offset] - frequencies[index])
+			width *= frequencies[index]
+			while True:
+				if (low ^ (low + width)) >= TOP:
+					if width >= BOTTOM:
+						break
+					width = -low & (BOTTOM - 1)
+				code = (code << 8 | (data[position] if position < len(data) else 0)) & MASK
+				position += 1
+				low = low << 8 & MASK
+				width = width << 8 & MASK
+			decoded.append(symbol)
+
+			frequencies[index] += INCREMENT
+			groups[group] += INCREMENT
+			totals[context] += INCREMENT
+			if totals[context] > LIMIT:
+				rescale(frequencies, groups, totals, context)
+			history = (history << 8 | symbol) & history_mask
+			context = (history * 0x9E3779B1 & MASK) >> shift if shift else history
+		if position > len(data) + 4:
+			raise ValueError('Truncated range coder stream')
+		return decoded
@@ -0,0 +1,16 @@
+from ..base.abstract import AbstractAlgorithm
+from ..base.enums import CodingType
+
+
+class StoreCoding(AbstractAlgorithm):
+	"""Keeps blocks as they are, for data that does not compress."""
+	coding_type = CodingType.STORE
+
+	def __init__(self, path: str, directory: str, **kwargs):
+		super().__init__(directory=directory, path=path, suffix='.store', **kwargs)
+
+	def encode_block(self, data) -> bytes:
+		return bytes(data)
+
+	def decode_block(self, payload, size: int):
+		return bytes(payload)
@@ -0,0 +1,254 @@
+"""
+In-memory and file object interface.
+
+``compress`` and ``decompress`` turn bytes into a single-file container and
+back, and ``open`` returns a file object that codes the container block by
+block while it is written or read, like ``gzip.open``. Neither touches the
+disk unless given a path, so request bodies and queue messages can be
+compressed in process. The coders used by ``compress`` and ``decompress``
+are kept per thread and reused, which matters for small messages where
+setting up a coder (a trained dictionary above all) costs more than coding.
+"""
+import builtins
+import io
+import os
+import threading
+import zlib
+from typing import BinaryIO, Optional, Union
+
+from .algorithms import get_algorithm
+from .base.abstract import AbstractAlgorithm, decode_task, encode_task
+from .base.container import Header, iter_blocks, pack_block, pack_header, pack_trailer, read_header, read_trailer
+from .base.enums import CodingType
+
+# coders kept per thread for compress and decompress, one per algorithm and options
+CODER_CACHE = 16
+# the path given to coders that never see a file
+_NO_PATH = '-'
+
+_local = threading.local()
+
+
+def cached_coder(algorithm: CodingType, options: dict, decoding: bool = False) -> AbstractAlgorithm:
+	"""
+	Return the coder of this thread for an algorithm and options. Decoders
+	are kept apart from encoders, a decoder takes settings from the data.
+	"""
+	try:
+		key = algorithm, decoding, tuple(sorted(options.items()))
+		hash(key)
+	except TypeError:
+		return get_algorithm(algorithm)(_NO_PATH, '.', **options)
+	coders = _local.__dict__.setdefault('coders', {})
+	coder = coders.get(key)
+	if coder is None:
+		if len(coders) >= CODER_CACHE:
+			coders.clear()
+		coder = coders[key] = get_algorithm(algorithm)(_NO_PATH, '.', **options)
+	return coder
+
+
+def _decoder(stream: BinaryIO, options: dict) -> tuple[AbstractAlgorithm, Header]:
+	header = read_header(stream)
+	if header.is_archive:
+		raise ValueError('An archive holds several files, extract it with decompress_archive')
+	if not header.dictionary:
+		# the data needs no dictionary, the coder given one is kept for the data that does
+		options = {name: value for name, value in options.items() if name != 'dictionary'}
+	coder = cached_coder(header.algorithm, options, decoding=True)
+	coder.expect_dictionary(header)
+	return coder, header
+
+
+def compress(data, algorithm: CodingType = CodingType.HUFFMAN, **options) -> bytes:
+	"""
+	Compress a bytes-like object into a single-file container. The options
+	are those of the algorithm class, ``level`` or ``dictionary`` for example.
+	"""
+	target = io.BytesIO()
+	cached_coder(CodingType(algorithm), options).compress_buffer(data, target)
+	return target.getvalue()
+
+
+def decompress(data, **options) -> bytes:
+	"""Decompress a single-file container, the algorithm is read from its header."""
+	source = io.BytesIO(data)
+	target = io.BytesIO()
+	coder, header = _decoder(source, options)
+	coder.decompress_stream(source, target, header)
+	if source.read(1):
+		raise ValueError('Trailing data after the compressed stream')
+	return target.getvalue()
+
+
+class ZipperFile(io.BufferedIOBase):
+	"""
+	A file object over a single-file container. Written data is coded a
+	block at a time on the calling thread, and read data is decoded a block
+	at a time, with the checksum verified once the last block is read.
+	"""
+
+	def __init__(self, file: Union[str, bytes, os.PathLike, BinaryIO], mode: str = 'rb',
+	             algorithm: CodingType = CodingType.HUFFMAN, **options):
+		self._file = None
+		self._owns_file = False
+		self._writing = False
+		try:
+			if mode not in ('r', 'rb', 'w', 'wb', 'x', 'xb'):
+				raise ValueError(f'Invalid mode: {mode!r}')
+			self._writing = mode[0] != 'r'
+			if isinstance(file, (str, bytes, os.PathLike)):
+				self._file = builtins.open(file, mode[0] + 'b')
+				self._owns_file = True
+			elif hasattr(file, 'write' if self._writing else 'read'):
+				self._file = file
+			else:
+				raise TypeError('file must be a path or a binary file object')
+			self._size = 0
+			self._crc = 0
+			if self._writing:
+				self._coder = get_algorithm(CodingType(algorithm))(_NO_PATH, '.', **options)
+				self._pending = bytearray()
+				self._file.write(pack_header(self._coder.header()))
+			else:
+				self._coder, _ = _decoder(self._file, options)
+				self._blocks = iter_blocks(self._file)
+				self._buffer = memoryview(b'')
+				self._eof = False
+		except BaseException:
+			if self._owns_file:
+				self._file.close()
+			# closed, so that the finalizer has nothing left to write
+			self._file = None
+			super().close()
+			raise
+
+	def readable(self) -> bool:
+		self._checkClosed()
+		return not self._writing
+
+	def writable(self) -> bool:
+		self._checkClosed()
+		return self._writing
+
+	def seekable(self) -> bool:
+		return False
+
+	def _check_mode(self, writing: bool):
+		self._checkClosed()
+		if writing != self._writing:
+			raise io.UnsupportedOperation('not writable' if writing else 'not readable')
+
+	def _write_block(self, data: bytes):
+		self._size += len(data)
+		self._crc = zlib.crc32(data, self._crc)
+		self._file.write(pack_block(*encode_task(self._coder, data)))
+
+	def write(self, data) -> int:
+		self._check_mode(True)
+		with memoryview(data) as view:
+			length = view.nbytes
+			self._pending += view.cast('B')
+		block_size = self._coder.block_size
+		if len(self._pending) >= block_size:
+			view = memoryview(self._pending)
+			start = 0
+			while len(self._pending) - start >= block_size:
+				self._write_block(bytes(view[start:start + block_size]))
+				start += block_size
+			view.release()
+			del self._pending[:start]
+		return length
+
+	def flush(self):
+		"""Code what was written so far as a block of its own, at some cost in ratio, and flush the file."""
+		self._checkClosed()
+		# closing flushes once more, after the file is gone
+		if self._writing and self._file is not None:
+			if self._pending:
+				self._write_block(bytes(self._pending))
+				self._pending.clear()
+			self._file.flush()
+
+	def _fill(self) -> bool:
+		while not self._eof:
+			block = next(self._blocks, None)
+			if block is None:
+				if read_trailer(self._file) != (self._size, self._crc):
+					raise ValueError('Checksum mismatch')
+				self._eof = True
+				break
+			data = decode_task(self._coder, block)
+			self._size += len(data)
+			self._crc = zlib.crc32(data, self._crc)
+			if data:
+				self._buffer = memoryview(data)
+				return True
+		return False
+
+	def _take(self, size: int) -> bytes:
+		data = self._buffer[:size].tobytes()
+		self._buffer = self._buffer[len(data):]
+		return data
+
+	def read(self, size: Optional[int] = -1) -> bytes:
+		self._check_mode(False)
+		if size is None or size < 0:
+			parts = [self._take(len(self._buffer))]
+			while self._fill():
+				parts.append(self._take(len(self._buffer)))
+			return b''.join(parts)
+		parts = []
+		while size > 0 and (self._buffer or self._fill()):
+			parts.append(self._take(size))
+			size -= len(parts[-1])
+		return b''.join(parts)
+
+	def read1(self, size: int = -1) -> bytes:
+		self._check_mode(False)
+		if not self._buffer:
+			self._fill()
+		return self._take(len(self._buffer) if size < 0 else size)
+
+	def peek(self, size: int = 0) -> bytes:
+		self._check_mode(False)
+		if not self._buffer:
+			self._fill()
+		return self._buffer.tobytes()
+
+	def close(self):
+		if self.closed:
+			return
+		try:
+			if self._writing and self._file is not None:
+				if self._pending:
+					self._write_block(bytes(self._pending))
+					self._pending.clear()
+				self._file.write(pack_trailer(self._size, self._crc))
+				self._file.flush()
+		finally:
+			try:
+				if self._owns_file:
+					self._file.close()
+			finally:
+				self._file = None
+				super().close()
+
+
+def open(file: Union[str, bytes, os.PathLike, BinaryIO], mode: str = 'rb',
+         algorithm: CodingType = CodingType.HUFFMAN, encoding: Optional[str] = None, errors: Optional[str] = None,
+         newline: Optional[str] = None, **options) -> Union[ZipperFile, io.TextIOWrapper]:
+	"""
+	Open a single-file container for reading or writing, in binary mode or,
+	with 't' in ``mode``, in text mode. ``file`` is a path or a file object.
+	The algorithm and options only matter for writing, reading takes them
+	from the header, apart from the ``dictionary``.
+	"""
+	if 't' in mode:
+		if 'b' in mode:
+			raise ValueError(f'Invalid mode: {mode!r}')
+		return io.TextIOWrapper(ZipperFile(file, mode.replace('t', ''), algorithm, **options), encoding, errors,
+		                        newline)
+	if encoding is not None or errors is not None or newline is not None:
+		raise ValueError('encoding, errors and newline are for text mode only')
+	return ZipperFile(file, mode, algorithm, **options)
@@ -1,32 +1,448 @@
+import os
+import zlib
 from abc import ABC, abstractmethod
+from collections import Counter, defaultdict
+from functools import lru_cache
 from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, Iterator, Optional
 
-from .metric_model import CompressionMetric, DecompressionMetric
+from .archive import ArchiveReader, ArchiveWriter, DedupArchiveWriter, member_path
+from .container import FLAG_ARCHIVE, FLAG_SOLID, ChunkEntry, Header, IndexEntry, iter_blocks, pack_block, \
+	pack_header, pack_trailer, read_block, read_exact, read_header, read_trailer
+from .dedup import digest, file_digest, new_hasher, split_chunks
+from .enums import CodingType
+from ..utils.buffers import mapped
+from ..utils.parallel import ordered_map, resolve_jobs
+from ..utils.pipeline import prefetch, write_behind
+from ..utils.profiling import phase, profiled_iter
+
+if TYPE_CHECKING:
+	from .metric_model import CompressionMetric, DecompressionMetric
+
+DEFAULT_BLOCK_SIZE = 1 << 20
+# decoded blocks kept while extracting a member of a deduplicated archive
+BLOCK_CACHE = 4
+
+# events of the archive pipeline, see AbstractAlgorithm._member_events, _solid_events and _dedup_events
+MEMBER_START, MEMBER_BLOCK, MEMBER_END, MEMBER_DUPLICATE, MEMBER_COPY, MEMBER_SOLID = range(6)
+
+
+def encode_task(algorithm: 'AbstractAlgorithm', data) -> tuple[int, bytes]:
+	with phase('encode', len(data)):
+		return len(data), algorithm.encode_block(data)
+
+
+def decode_task(algorithm: 'AbstractAlgorithm', block: tuple[int, bytes]):
+	raw_length, payload = block
+	with phase('decode', raw_length):
+		data = algorithm.decode_block(payload, raw_length)
+	if len(data) != raw_length:
+		raise ValueError('Block length mismatch')
+	return data
+
+
+def member_event_task(algorithm: 'AbstractAlgorithm', event: tuple[int, object]) -> tuple[int, object]:
+	kind, value = event
+	if kind == MEMBER_BLOCK:
+		return kind, encode_task(algorithm, value)
+	if kind == MEMBER_SOLID:
+		data, members = value
+		return kind, (encode_task(algorithm, data), members)
+	return event
+
+
+def unchanged(entry: Optional[IndexEntry], file_path: str, stat: os.stat_result, block_size: int) -> bool:
+	"""Tell whether a file still matches its member, reading it only if just its mtime moved."""
+	# a member of a solid block cannot be copied on its own
+	if entry is None or entry.start is not None or entry.size != stat.st_size:
+		return False
+	if entry.mtime == stat.st_mtime_ns:
+		return True
+	with phase('checksum', entry.size):
+		return file_digest(file_path, block_size) == entry.digest
+
+
+def extract_member_task(algorithm: 'AbstractAlgorithm', member: tuple[str, IndexEntry, str]):
+	archive_path, entry, full_path = member
+	os.makedirs(os.path.dirname(full_path) or '.', exist_ok=True)
+	with open(archive_path, 'rb') as source, open(full_path, 'wb') as target:
+		source.seek(entry.offset)
+		algorithm.decompress_stream(source, target)
+
+
+def extract_solid_task(algorithm: 'AbstractAlgorithm', block: tuple[str, int, list[tuple[IndexEntry, str]]]):
+	archive_path, offset, members = block
+	with open(archive_path, 'rb') as source:
+		source.seek(offset)
+		data = decode_task(algorithm, read_block(source))
+	for entry, full_path in members:
+		piece = data[entry.start:entry.start + entry.size]
+		with phase('checksum', len(piece)):
+			crc = zlib.crc32(piece)
+		if (len(piece), crc) != (entry.size, entry.crc):
+			raise ValueError('Checksum mismatch')
+		os.makedirs(os.path.dirname(full_path) or '.', exist_ok=True)
+		with open(full_path, 'wb') as target, phase('write', len(piece)):
+			target.write(piece)
+
+
+def extract_chunks_task(algorithm: 'AbstractAlgorithm', member: tuple[str, IndexEntry, str, list[ChunkEntry]]):
+	archive_path, entry, full_path, spans = member
+	os.makedirs(os.path.dirname(full_path) or '.', exist_ok=True)
+	size = 0
+	crc = 0
+	with open(archive_path, 'rb') as source, open(full_path, 'wb') as target:
+		@lru_cache(maxsize=BLOCK_CACHE)
+		def block(offset: int):
+			source.seek(offset)
+			return decode_task(algorithm, read_block(source))
+
+		for chunk in spans:
+			data = block(chunk.offset)[chunk.start:chunk.start + chunk.length]
+			with phase('write', len(data)):
+				target.write(data)
+			size += len(data)
+			with phase('checksum', len(data)):
+				crc = zlib.crc32(data, crc)
+	if (size, crc) != (entry.size, entry.crc):
+		raise ValueError('Checksum mismatch')
 
 
 class AbstractAlgorithm(ABC):
+	coding_type: CodingType
+	supports_dictionary = False
+
 	def __init__(self, path: str, directory: str, **kwargs):
 		self.suffix = kwargs.get('suffix', '.algo')
+		self.block_size = kwargs.get('block_size', DEFAULT_BLOCK_SIZE)
+		self.jobs = resolve_jobs(kwargs.get('jobs', 1))
+		# blocks read ahead and written behind by I/O threads, 0 keeps all I/O on the calling thread
+		self.buffers = kwargs.get('buffers', 0)
+		self.dedup = kwargs.get('dedup', False)
+		# small members of a directory archive packed together into solid blocks of about solid_size bytes
+		self.solid = kwargs.get('solid', False)
+		self.solid_size = kwargs.get('solid_size', DEFAULT_BLOCK_SIZE)
+		if self.dedup and self.solid:
+			raise ValueError('An archive is either deduplicated or solid')
+		self.dictionary = kwargs.get('dictionary')
+		if self.dictionary is not None and not self.supports_dictionary:
+			raise ValueError(f'{self.coding_type.value} cannot use a trained dictionary')
+		self.locate(path, directory)
+
+	def locate(self, path: str, directory: str):
+		"""Point the coder at another input and output directory, keeping its options and tables."""
 		self.path: str = path
 		self.directory = directory
 		self.dir_for_archive = path
 		self.base_name = Path(path).stem
 
-	@abstractmethod
-	def compress(self, **kwargs):
-		pass
+	@property
+	def dictionary_id(self) -> int:
+		return 0 if self.dictionary is None else self.dictionary.id
 
-	@abstractmethod
-	def decompress(self, **kwargs):
-		pass
+	def header(self, extension: str = '') -> Header:
+		return Header(self.coding_type, extension=extension, dictionary=self.dictionary_id)
+
+	def expect_algorithm(self, header: Header):
+		if header.algorithm != self.coding_type:
+			raise ValueError(f'Compressed with {header.algorithm.value}, not {self.coding_type.value}')
+
+	def expect_dictionary(self, header: Header):
+		"""Check that the dictionary a container was written with is loaded, and drop it if there is none."""
+		if not header.dictionary:
+			self.dictionary = None
+		elif header.dictionary != self.dictionary_id:
+			raise ValueError(f'Compressed with dictionary {header.dictionary:08x}, pass that dictionary with --dict')
 
 	@abstractmethod
-	def compress_archive(self, **kwargs):
+	def encode_block(self, data) -> bytes:
 		pass
 
 	@abstractmethod
-	def decompress_archive(self, **kwargs):
-		pass
+	def decode_block(self, payload, size: int):
+		"""
+		Decode a block of ``size`` bytes. Settings stored in the block, like
+		a code width or a model, only apply to it and are not written back
+		to the coder, which may encode with its own ones next.
+		"""
+
+	def compress_stream(self, source: BinaryIO, target: BinaryIO, extension: str = '') -> tuple[int, int]:
+		blocks = profiled_iter('read', iter(lambda: read_exact(source, self.block_size), b''))
+		return self._compress_blocks(blocks, target, extension, self.buffers)
+
+	def compress_buffer(self, data, target: BinaryIO, extension: str = '') -> tuple[int, int]:
+		"""Compress a buffer, a mapped file for example, cutting blocks as slices instead of copies."""
+		view = memoryview(data).cast('B')
+		# slices of a map cannot be pickled to worker processes, those get copies
+		to_block = bytes if self.jobs > 1 else lambda block: block
+		blocks = (to_block(view[start:start + self.block_size]) for start in range(0, len(view), self.block_size))
+		# a single block has nothing to overlap with
+		return self._compress_blocks(blocks, target, extension, self.buffers if len(view) > self.block_size else 0)
+
+	def compress_file(self, path, target: BinaryIO, extension: str = '') -> tuple[int, int]:
+		if self.buffers and os.path.getsize(path) > self.block_size:
+			# faulting in pages of a map holds the GIL, a reader thread overlaps only plain reads with coding
+			with open(path, 'rb') as source:
+				return self.compress_stream(source, target, extension)
+		with mapped(path) as data:
+			return self.compress_buffer(data, target, extension)
+
+	def _compress_blocks(self, blocks: Iterator, target: BinaryIO, extension: str, buffers: int) -> tuple[int, int]:
+		size = 0
+		crc = 0
+
+		def chunks(blocks):
+			nonlocal size, crc
+			for chunk in blocks:
+				size += len(chunk)
+				with phase('checksum', len(chunk)):
+					crc = zlib.crc32(chunk, crc)
+				yield chunk
+
+		with prefetch(blocks, buffers) as blocks, write_behind(target, buffers) as writer:
+			writer.write(pack_header(self.header(extension)))
+			for raw_length, payload in ordered_map(encode_task, chunks(blocks), self, self.jobs):
+				writer.write(pack_block(raw_length, payload))
+			writer.write(pack_trailer(size, crc))
+		return size, crc
+
+	def decompress_stream(self, source: BinaryIO, target: BinaryIO, header: Optional[Header] = None) -> Header:
+		if header is None:
+			header = read_header(source)
+		self.expect_algorithm(header)
+		self.expect_dictionary(header)
+		size = 0
+		crc = 0
+		blocks = profiled_iter('read', iter_blocks(source), lambda block: len(block[1]))
+		with prefetch(blocks, self.buffers) as blocks, write_behind(target, self.buffers) as writer:
+			for data in ordered_map(decode_task, blocks, self, self.jobs):
+				writer.write(data)
+				size += len(data)
+				with phase('checksum', len(data)):
+					crc = zlib.crc32(data, crc)
+		if read_trailer(source) != (size, crc):
+			raise ValueError('Checksum mismatch')
+		return header
+
+	def compress(self):
+		with open(os.path.join(self.directory, self.base_name + self.suffix), 'wb') as target:
+			self.compress_file(self.path, target, os.path.splitext(self.path)[1])
+
+	def decompress(self):
+		"""Decompress next to the output and replace it once the checksum matched, a failure leaves it alone."""
+		with open(self.path, 'rb') as source:
+			header = read_header(source)
+			self.expect_algorithm(header)
+			self.expect_dictionary(header)
+			path_to_save = os.path.join(self.directory, self.base_name + header.extension)
+			os.makedirs(os.path.dirname(path_to_save), exist_ok=True)
+			temporary = path_to_save + '.part'
+			try:
+				with open(temporary, 'wb') as target:
+					self.decompress_stream(source, target, header)
+			except BaseException:
+				if os.path.exists(temporary):
+					os.remove(temporary)
+				raise
+		os.replace(temporary, path_to_save)
+
+	def _walk_directory(self) -> Iterator[tuple[str, str]]:
+		for root, _, files in os.walk(self.dir_for_archive):
+			for file in files:
+				file_path = os.path.join(root, file)
+				yield file_path, os.path.relpath(file_path, self.dir_for_archive)
+
+	def _file_events(self, file_path: str, relative_path: str, stat: os.stat_result,
+	                 previous: Optional[dict[str, IndexEntry]]) -> Iterator[tuple[int, object]]:
+		if previous is not None:
+			entry = previous.get(relative_path.replace(os.sep, '/'))
+			if unchanged(entry, file_path, stat, self.block_size):
+				yield MEMBER_COPY, entry._replace(mtime=stat.st_mtime_ns)
+				return
+		yield MEMBER_START, (relative_path, os.path.splitext(file_path)[1], stat.st_mtime_ns)
+		size = 0
+		crc = 0
+		hasher = new_hasher()
+		with open(file_path, 'rb') as source:
+			for chunk in profiled_iter('read', iter(lambda: read_exact(source, self.block_size), b'')):
+				size += len(chunk)
+				with phase('checksum', len(chunk)):
+					crc = zlib.crc32(chunk, crc)
+					hasher.update(chunk)
+				yield MEMBER_BLOCK, chunk
+		yield MEMBER_END, (size, crc, hasher.digest())
+
+	def _member_events(self, previous: Optional[dict[str, IndexEntry]] = None) -> Iterator[tuple[int, object]]:
+		for file_path, relative_path in self._walk_directory():
+			yield from self._file_events(file_path, relative_path, os.stat(file_path), previous)
+
+	def _solid_events(self, previous: Optional[dict[str, IndexEntry]] = None) -> Iterator[tuple[int, object]]:
+		"""
+		Like ``_member_events``, but files smaller than ``solid_size`` are
+		sorted by extension and packed back to back into solid blocks, which
+		are always compressed again on an update.
+		"""
+		small = []
+		for file_path, relative_path in self._walk_directory():
+			stat = os.stat(file_path)
+			if 0 < stat.st_size < self.solid_size:
+				small.append((file_path, relative_path, stat))
+			else:
+				yield from self._file_events(file_path, relative_path, stat, previous)
+		# files of a kind next to each other share statistics and matches
+		small.sort(key=lambda file: (os.path.splitext(file[1])[1].lower(), os.path.basename(file[1]), file[1]))
+		pending = bytearray()
+		members = []
+		for file_path, relative_path, stat in small:
+			with open(file_path, 'rb') as source, phase('read', stat.st_size):
+				data = source.read()
+			if pending and len(pending) + len(data) > self.solid_size:
+				yield MEMBER_SOLID, (bytes(pending), members)
+				pending.clear()
+				members = []
+			with phase('checksum', len(data)):
+				hasher = new_hasher()
+				hasher.update(data)
+				members.append((relative_path, len(pending), len(data), zlib.crc32(data), stat.st_mtime_ns,
+				                hasher.digest()))
+			pending += data
+		if pending:
+			yield MEMBER_SOLID, (bytes(pending), members)
+
+	def _dedup_events(self, writer: DedupArchiveWriter) -> Iterator[tuple[int, object]]:
+		files = [(file_path, relative_path, os.stat(file_path)) for file_path, relative_path in self._walk_directory()]
+		sizes = Counter(stat.st_size for _, _, stat in files)
+		originals: dict[tuple[int, bytes], int] = {}
+		pending = bytearray()
+		for number, (file_path, relative_path, stat) in enumerate(files):
+			# only a file sharing its size with another one can be a whole duplicate, the rest are hashed while read
+			if sizes[stat.st_size] > 1:
+				with phase('checksum', stat.st_size):
+					key = stat.st_size, file_digest(file_path, self.block_size)
+				if key in originals:
+					yield MEMBER_DUPLICATE, (relative_path, originals[key], stat.st_mtime_ns)
+					continue
+				originals[key] = number
+
+			size = 0
+			crc = 0
+			hasher = new_hasher()
+
+			def pieces():
+				nonlocal size, crc
+				for piece in profiled_iter('read', iter(lambda: read_exact(source, self.block_size), b'')):
+					size += len(piece)
+					with phase('checksum', len(piece)):
+						crc = zlib.crc32(piece, crc)
+						hasher.update(piece)
+					yield piece
+
+			ids = []
+			with open(file_path, 'rb') as source:
+				for chunk in profiled_iter('chunking', split_chunks(pieces())):
+					chunk_id, new = writer.add_chunk(digest(chunk), len(chunk), number)
+					ids.append(chunk_id)
+					if not new:
+						continue
+					if pending and len(pending) + len(chunk) > self.block_size:
+						yield MEMBER_BLOCK, bytes(pending)
+						pending.clear()
+					pending += chunk
+			yield MEMBER_END, (relative_path, ids, size, crc, stat.st_mtime_ns, hasher.digest())
+		if pending:
+			yield MEMBER_BLOCK, bytes(pending)
+
+	def _compress_dedup_archive(self, target: BinaryIO):
+		writer = DedupArchiveWriter(target, self.coding_type, self.dictionary_id)
+		for kind, value in ordered_map(member_event_task, self._dedup_events(writer), self, self.jobs):
+			if kind == MEMBER_BLOCK:
+				writer.add_block(*value)
+			elif kind == MEMBER_END:
+				writer.add_recipe(*value)
+			else:
+				writer.add_duplicate(*value)
+		writer.close()
+
+	def _compress_archive(self, target: BinaryIO, previous: Optional[ArchiveReader] = None):
+		# an update keeps a solid archive solid
+		solid = self.solid or (previous is not None and previous.header.is_solid)
+		writer = ArchiveWriter(target, self.coding_type, FLAG_ARCHIVE | (FLAG_SOLID if solid else 0),
+		                       self.dictionary_id)
+		entries = None if previous is None else {entry.path: entry for entry in previous.entries}
+		events = self._solid_events(entries) if solid else self._member_events(entries)
+		for kind, value in ordered_map(member_event_task, events, self, self.jobs):
+			if kind == MEMBER_START:
+				relative_path, extension, mtime = value
+				start = writer.offset
+				writer.write(pack_header(self.header(extension)))
+			elif kind == MEMBER_BLOCK:
+				writer.write(pack_block(*value))
+			elif kind == MEMBER_END:
+				size, crc, content_digest = value
+				writer.write(pack_trailer(size, crc))
+				writer.add_entry(relative_path, start, size, crc, self.coding_type, mtime, content_digest)
+			elif kind == MEMBER_SOLID:
+				(raw_length, payload), members = value
+				writer.add_solid_block(raw_length, payload, members)
+			else:
+				with phase('copy', value.compressed_size):
+					writer.copy(value, previous.map)
+		writer.close()
+
+	def compress_archive(self):
+		archive_name = os.path.join(self.directory, self.base_name + self.suffix)
+		with open(archive_name, 'wb') as f, write_behind(f, self.buffers) as f:
+			if self.dedup:
+				self._compress_dedup_archive(f)
+			else:
+				self._compress_archive(f)
+
+	def update_archive(self, archive_path: str):
+		"""
+		Bring an archive in line with the directory: new and changed files are
+		compressed, unchanged members are copied without decoding them and
+		members whose file is gone are dropped.
+		"""
+		temporary = archive_path + '.part'
+		with ArchiveReader(archive_path) as reader:
+			if reader.header.is_dedup:
+				raise ValueError('A deduplicated archive cannot be updated, compress the directory again')
+			if reader.header.dictionary != self.dictionary_id:
+				raise ValueError('The archive was compressed with another dictionary')
+			try:
+				with open(temporary, 'wb') as f, write_behind(f, self.buffers) as f:
+					self._compress_archive(f, reader)
+			except BaseException:
+				if os.path.exists(temporary):
+					os.remove(temporary)
+				raise
+		os.replace(temporary, archive_path)
+
+	def decompress_archive(self, member: Optional[str] = None):
+		with ArchiveReader(self.dir_for_archive) as reader:
+			self.expect_algorithm(reader.header)
+			self.expect_dictionary(reader.header)
+			entries = reader.entries if member is None else [reader.find(member)]
+			spans = [reader.spans(entry) for entry in entries] if reader.header.is_dedup else None
+
+		if spans is None:
+			# every solid block is decoded once, for all the members wanted from it
+			blocks = defaultdict(list)
+			for entry in entries:
+				if entry.start is not None:
+					blocks[entry.offset].append((entry, member_path(self.directory, entry.path)))
+			tasks = ((self.dir_for_archive, offset, members) for offset, members in blocks.items())
+			for _ in ordered_map(extract_solid_task, tasks, self, self.jobs):
+				pass
+			task = extract_member_task
+			tasks = ((self.dir_for_archive, entry, member_path(self.directory, entry.path)) for entry in entries
+			         if entry.start is None)
+		else:
+			task = extract_chunks_task
+			tasks = ((self.dir_for_archive, entry, member_path(self.directory, entry.path), entry_spans)
+			         for entry, entry_spans in zip(entries, spans))
+		for _ in ordered_map(task, tasks, self, self.jobs):
+			pass
 
 
 class AbstractBuilder(ABC):
@@ -36,17 +452,17 @@ class AbstractBuilder(ABC):
 		self.output = output
 
 	@abstractmethod
-	def compression_metrics(self, **kwargs) -> CompressionMetric:
+	def compression_metrics(self, **kwargs) -> 'CompressionMetric':
 		pass
 
 	@abstractmethod
-	def decompression_metrics(self, **kwargs) -> DecompressionMetric:
+	def decompression_metrics(self, **kwargs) -> 'DecompressionMetric':
 		pass
 
 	@abstractmethod
-	def execute_compression(self, **kwargs) -> CompressionMetric:
+	def execute_compression(self, **kwargs) -> 'CompressionMetric':
 		pass
 
 	@abstractmethod
-	def execute_decompression(self, **kwargs) -> DecompressionMetric:
+	def execute_decompression(self, **kwargs) -> 'DecompressionMetric':
 		pass
@@ -0,0 +1,178 @@
+import mmap
+import os
+from collections import defaultdict
+from typing import BinaryIO
+
+from .container import FLAG_ARCHIVE, FLAG_DEDUP, ChunkEntry, Header, IndexEntry, pack_block, pack_chunk_table, \
+	pack_header, pack_index, pack_recipe, unpack_chunk_table, unpack_header, unpack_index, unpack_recipe
+from .enums import CodingType
+
+COPY_SIZE = 1 << 20
+
+
+def member_path(directory: str, relative_path: str) -> str:
+	parts = relative_path.split('/')
+	if relative_path.startswith('/') or any(part in ('', '.', '..') for part in parts):
+		raise ValueError(f'Unsafe member path: {relative_path!r}')
+	return os.path.join(directory, *parts)
+
+
+class ArchiveWriter:
+	def __init__(self, target: BinaryIO, algorithm: CodingType, flags: int = FLAG_ARCHIVE, dictionary: int = 0):
+		self.target = target
+		self.algorithm = algorithm
+		self.entries: list[IndexEntry] = []
+		self.offset = 0
+		self.write(pack_header(Header(algorithm, flags=flags, dictionary=dictionary)))
+
+	def write(self, data: bytes):
+		self.target.write(data)
+		self.offset += len(data)
+
+	def add_entry(self, relative_path: str, offset: int, size: int, crc: int, algorithm: CodingType, mtime: int = 0,
+	              digest: bytes = bytes(16)):
+		self.entries.append(IndexEntry(relative_path.replace('\\', '/'), offset, size, self.offset - offset, crc,
+		                               algorithm, mtime, digest))
+
+	def add(self, relative_path: str, blob: bytes, size: int, crc: int, algorithm: CodingType, mtime: int = 0,
+	        digest: bytes = bytes(16)):
+		offset = self.offset
+		self.write(blob)
+		self.add_entry(relative_path, offset, size, crc, algorithm, mtime, digest)
+
+	def add_solid_block(self, raw_length: int, payload: bytes, members: list[tuple[str, int, int, int, int, bytes]]):
+		"""
+		Write a solid block and index the members packed into it, given as
+		``(path, start, size, crc, mtime, digest)``. Every member is charged
+		a byte and a share of the rest of the block by its size, so the
+		charges add up to the block.
+		"""
+		offset = self.offset
+		self.write(pack_block(raw_length, payload))
+		spare = max(self.offset - offset - len(members), 0)
+		packed = 0
+		charged = 0
+		for relative_path, start, size, crc, mtime, digest in members:
+			# the rounding is carried over to the next member instead of being lost
+			packed += size
+			share = spare * packed // raw_length - charged
+			charged += share
+			self.entries.append(IndexEntry(relative_path.replace('\\', '/'), offset, size, 1 + share, crc,
+			                               self.algorithm, mtime, digest, start))
+
+	def copy(self, entry: IndexEntry, source):
+		"""Append a member of another archive as it is, ``source`` is a buffer over that archive."""
+		offset = self.offset
+		end = entry.offset + entry.compressed_size
+		for start in range(entry.offset, end, COPY_SIZE):
+			self.write(source[start:min(start + COPY_SIZE, end)])
+		self.entries.append(entry._replace(offset=offset))
+
+	def close(self):
+		self.write(pack_index(self.entries, self.offset))
+
+
+class DedupArchiveWriter(ArchiveWriter):
+	"""
+	Writer of deduplicated archives.
+
+	Chunk ids are handed out by ``add_chunk`` while the input is read, ahead
+	of the writes. A chunk gets its place once the block holding it is
+	written with ``add_block``, the chunks of a block always have
+	consecutive ids.
+	"""
+
+	def __init__(self, target: BinaryIO, algorithm: CodingType, dictionary: int = 0):
+		super().__init__(target, algorithm, flags=FLAG_ARCHIVE | FLAG_DEDUP, dictionary=dictionary)
+		self.ids: dict[bytes, int] = {}
+		self.lengths: list[int] = []
+		# index of the member that introduced every chunk, and the bytes every member added
+		self.owners: list[int] = []
+		self.added: dict[int, int] = defaultdict(int)
+		self.chunks: list[ChunkEntry] = []
+
+	def add_chunk(self, digest: bytes, length: int, owner: int) -> tuple[int, bool]:
+		chunk_id = self.ids.get(digest)
+		if chunk_id is not None:
+			return chunk_id, False
+		chunk_id = self.ids[digest] = len(self.lengths)
+		self.lengths.append(length)
+		self.owners.append(owner)
+		return chunk_id, True
+
+	def add_block(self, raw_length: int, payload: bytes):
+		offset = self.offset
+		self.write(pack_block(raw_length, payload))
+		written = self.offset - offset
+		start = 0
+		charged = 0
+		while start < raw_length:
+			chunk_id = len(self.chunks)
+			length = self.lengths[chunk_id]
+			self.chunks.append(ChunkEntry(offset, start, length))
+			start += length
+			# a block is coded as a whole, its chunks are charged by their length, an estimate
+			share = written * start // raw_length - charged
+			charged += share
+			self.added[self.owners[chunk_id]] += share
+
+	def add_recipe(self, relative_path: str, ids: list[int], size: int, crc: int, mtime: int, digest: bytes):
+		offset = self.offset
+		self.write(pack_recipe(ids))
+		self.add_entry(relative_path, offset, size, crc, self.algorithm, mtime, digest)
+
+	def add_duplicate(self, relative_path: str, original: int, mtime: int):
+		self.entries.append(self.entries[original]._replace(path=relative_path.replace('\\', '/'), compressed_size=0,
+		                                                    mtime=mtime))
+
+	def close(self):
+		self.write(pack_chunk_table(self.chunks, self.offset))
+		self.entries = [entry._replace(compressed_size=entry.compressed_size + self.added[number])
+		                for number, entry in enumerate(self.entries)]
+		super().close()
+
+
+class ArchiveReader:
+	def __init__(self, path):
+		self.path = path
+		self.file = open(path, 'rb')
+		try:
+			self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+			self.header, _ = unpack_header(self.map)
+			if not self.header.is_archive:
+				raise ValueError('Not an archive')
+			self.entries = unpack_index(self.map)
+			self.chunks = unpack_chunk_table(self.map) if self.header.is_dedup else None
+		except Exception:
+			self.close()
+			raise
+
+	def find(self, relative_path: str) -> IndexEntry:
+		relative_path = relative_path.replace('\\', '/').strip('/')
+		for entry in self.entries:
+			if entry.path == relative_path:
+				return entry
+		raise KeyError(f'No member {relative_path!r} in {self.path}')
+
+	def open_member(self, entry: IndexEntry) -> BinaryIO:
+		self.file.seek(entry.offset)
+		return self.file
+
+	def spans(self, entry: IndexEntry) -> list[ChunkEntry]:
+		"""Return where the chunks of a member of a deduplicated archive are stored, in order."""
+		ids = unpack_recipe(self.map, entry.offset)
+		if any(chunk_id >= len(self.chunks) for chunk_id in ids):
+			raise ValueError(f'Unknown chunk in {entry.path!r}')
+		return [self.chunks[chunk_id] for chunk_id in ids]
+
+	def close(self):
+		if getattr(self, 'map', None) is not None:
+			self.map.close()
+			self.map = None
+		self.file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
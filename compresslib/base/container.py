@@ -0,0 +1,322 @@
+"""
+Binary container used for the files written by every algorithm.
+
+All integers are little-endian::
+
+	offset  size  field
+	0       4     magic, b'ZIPR'
+	4       1     format version
+	5       1     algorithm id (1 - huffman, 2 - lzw, 3 - adaptive huffman,
+	                            4 - range coder, 5 - lz77, 6 - store,
+	                            7 - auto)
+	6       1     flags (bit 0 - archive, bit 1 - deduplicated archive,
+	                     bit 2 - trained dictionary, bit 3 - solid archive)
+	7       1     length of the original extension in bytes
+	8       n     original extension, utf-8
+	        4     id of the trained dictionary, only with flag bit 2
+
+A single file continues with a sequence of independently coded blocks::
+
+	4       raw (uncompressed) length of the block
+	4       payload length
+	m       payload
+
+terminated by a block with both lengths set to zero and a trailer holding
+the original size (8 bytes) and the CRC-32 of the original data (4 bytes).
+The writer never has to seek, so files can be produced and consumed as a
+stream. The payload starts with the algorithm block header: 256 code
+lengths for huffman, a single byte with the code width for lzw, the context
+order and memory bits for the range coder, the level, window and back end
+for lz77 and nothing for adaptive huffman, whose model is rebuilt while
+decoding, or for store. An auto block starts with the algorithm id picked
+for it, followed by that algorithm's payload. With a trained dictionary
+(see ``dictionary.py``) a huffman block starts with one byte telling
+whether it uses the dictionary code lengths, which are then not stored, and
+lzw blocks start from the dictionary phrase table.
+
+An archive stores a header with the archive flag set, its members one
+after another, each a complete single-file container, and a central index
+at the end. Every index entry is::
+
+	8       offset of the member from the start of the archive
+	4       offset of the member in its decoded solid block, 0xffffffff
+	        for a member stored as a container of its own
+	8       original size
+	8       compressed (member) size
+	4       CRC-32 of the original data
+	1       algorithm id
+	8       modification time of the original file in nanoseconds
+	16      BLAKE2b digest of the original data
+	2       length of the relative path in bytes
+	p       relative path, utf-8, always with '/' separators
+
+and the archive ends with a fixed footer: the offset of the index (8
+bytes), the number of entries (4 bytes) and the magic b'ZIDX'. Readers
+find the index from the footer, so listing an archive or extracting one
+member only reads the footer, the index and that member. The modification
+time, size and digest let an update copy unchanged members as they are.
+
+A solid archive packs small members back to back into shared blocks, laid
+out like the blocks of a single file and sorted by extension, so that
+similar files share one model. The index entry of such a member points at
+its block and at its offset in the decoded block, and its compressed size
+is its share of the block. Empty files and files of at least a block are
+stored as member containers as in any other archive.
+
+A deduplicated archive has no member containers. Its members are cut into
+content-defined chunks, and every distinct chunk is stored once in a chunk
+store: blocks laid out like the blocks of a single file, each holding
+several chunks back to back. A member is a recipe of chunk ids::
+
+	4       number of chunks
+	4 * n   chunk ids
+
+Identical members share one recipe, and the compressed size of an index
+entry counts the bytes the member added to the archive. The chunk table
+sits between the last recipe and the index, one entry per chunk id::
+
+	8       offset of the block holding the chunk
+	4       offset of the chunk in the decoded block
+	4       chunk length
+
+followed by the offset of the table (8 bytes), the number of chunks (4
+bytes) and the magic b'ZCHK'.
+"""
+import struct
+from typing import BinaryIO, Iterator, NamedTuple, Optional
+
+from .enums import CodingType
+
+MAGIC = b'ZIPR'
+VERSION = 5
+
+FLAG_ARCHIVE = 1
+FLAG_DEDUP = 2
+FLAG_DICTIONARY = 4
+FLAG_SOLID = 8
+
+HEADER = struct.Struct('<4sBBBB')
+DICTIONARY_ID = struct.Struct('<I')
+BLOCK = struct.Struct('<II')
+TRAILER = struct.Struct('<QI')
+INDEX_ENTRY = struct.Struct('<QIQQIBq16sH')
+# the solid block offset of a member that is not in a solid block
+NOT_SOLID = 0xffffffff
+FOOTER = struct.Struct('<QI4s')
+INDEX_MAGIC = b'ZIDX'
+RECIPE = struct.Struct('<I')
+CHUNK_ENTRY = struct.Struct('<QII')
+CHUNK_MAGIC = b'ZCHK'
+
+ALGORITHM_IDS = {
+	CodingType.HUFFMAN: 1,
+	CodingType.LZW: 2,
+	CodingType.ADAPTIVE_HUFFMAN: 3,
+	CodingType.RANGE: 4,
+	CodingType.LZ77: 5,
+	CodingType.STORE: 6,
+	CodingType.AUTO: 7,
+}
+ALGORITHMS = {value: key for key, value in ALGORITHM_IDS.items()}
+
+
+class Header(NamedTuple):
+	algorithm: CodingType
+	flags: int = 0
+	extension: str = ''
+	dictionary: int = 0
+
+	@property
+	def is_archive(self) -> bool:
+		return bool(self.flags & FLAG_ARCHIVE)
+
+	@property
+	def is_dedup(self) -> bool:
+		return bool(self.flags & FLAG_DEDUP)
+
+	@property
+	def is_solid(self) -> bool:
+		return bool(self.flags & FLAG_SOLID)
+
+
+def pack_header(header: Header) -> bytes:
+	extension = header.extension.encode('utf-8')
+	if not header.dictionary:
+		return HEADER.pack(MAGIC, VERSION, ALGORITHM_IDS[header.algorithm], header.flags, len(extension)) + extension
+	return HEADER.pack(MAGIC, VERSION, ALGORITHM_IDS[header.algorithm], header.flags | FLAG_DICTIONARY,
+	                   len(extension)) + extension + DICTIONARY_ID.pack(header.dictionary)
+
+
+def _parse_header(head, offset: int = 0) -> tuple[Header, int]:
+	if len(head) - offset < HEADER.size:
+		raise ValueError('Truncated header')
+	magic, version, algorithm, flags, extension_length = HEADER.unpack_from(head, offset)
+	if magic != MAGIC:
+		raise ValueError('Not a zipper container')
+	if version != VERSION:
+		raise ValueError(f'Unsupported container version: {version}')
+	if algorithm not in ALGORITHMS:
+		raise ValueError(f'Unknown algorithm id: {algorithm}')
+	return Header(ALGORITHMS[algorithm], flags), extension_length
+
+
+def _variable_length(header: Header, extension_length: int) -> int:
+	return extension_length + (DICTIONARY_ID.size if header.flags & FLAG_DICTIONARY else 0)
+
+
+def _parse_variable(header: Header, extension_length: int, variable: bytes) -> Header:
+	if len(variable) != _variable_length(header, extension_length):
+		raise ValueError('Truncated header')
+	extension = variable[:extension_length].decode('utf-8')
+	if not header.flags & FLAG_DICTIONARY:
+		return header._replace(extension=extension)
+	# the flag only announces the dictionary id after the extension
+	dictionary, = DICTIONARY_ID.unpack_from(variable, extension_length)
+	return header._replace(flags=header.flags & ~FLAG_DICTIONARY, extension=extension, dictionary=dictionary)
+
+
+def unpack_header(buffer, offset: int = 0) -> tuple[Header, int]:
+	header, extension_length = _parse_header(buffer, offset)
+	offset += HEADER.size
+	end = offset + _variable_length(header, extension_length)
+	return _parse_variable(header, extension_length, bytes(buffer[offset:end])), end
+
+
+def read_exact(stream: BinaryIO, size: int) -> bytes:
+	chunks = []
+	while size > 0:
+		data = stream.read(size)
+		if not data:
+			break
+		chunks.append(data)
+		size -= len(data)
+	return b''.join(chunks)
+
+
+def read_header(stream: BinaryIO) -> Header:
+	header, extension_length = _parse_header(read_exact(stream, HEADER.size))
+	return _parse_variable(header, extension_length, read_exact(stream, _variable_length(header, extension_length)))
+
+
+def sniff(path) -> Optional[Header]:
+	try:
+		with open(path, 'rb') as f:
+			return read_header(f)
+	except (IsADirectoryError, PermissionError, ValueError):
+		return None
+
+
+def pack_block(raw_length: int, payload: bytes) -> bytes:
+	return BLOCK.pack(raw_length, len(payload)) + payload
+
+
+def iter_blocks(stream: BinaryIO) -> Iterator[tuple[int, bytes]]:
+	while True:
+		head = read_exact(stream, BLOCK.size)
+		if len(head) != BLOCK.size:
+			raise ValueError('Truncated block header')
+		raw_length, payload_length = BLOCK.unpack(head)
+		if not raw_length and not payload_length:
+			return
+		payload = read_exact(stream, payload_length)
+		if len(payload) != payload_length:
+			raise ValueError('Truncated block')
+		yield raw_length, payload
+
+
+def pack_trailer(size: int, crc: int) -> bytes:
+	return BLOCK.pack(0, 0) + TRAILER.pack(size, crc)
+
+
+def read_trailer(stream: BinaryIO) -> tuple[int, int]:
+	trailer = read_exact(stream, TRAILER.size)
+	if len(trailer) != TRAILER.size:
+		raise ValueError('Truncated trailer')
+	return TRAILER.unpack(trailer)
+
+
+class IndexEntry(NamedTuple):
+	path: str
+	offset: int
+	size: int
+	compressed_size: int
+	crc: int
+	algorithm: CodingType
+	mtime: int = 0
+	digest: bytes = bytes(16)
+	# offset in the decoded solid block at ``offset``, None for a member container
+	start: Optional[int] = None
+
+
+def read_block(stream: BinaryIO) -> tuple[int, bytes]:
+	block = next(iter_blocks(stream), None)
+	if block is None:
+		raise ValueError('Missing block')
+	return block
+
+
+def pack_index(entries: list[IndexEntry], index_offset: int) -> bytes:
+	parts = []
+	for entry in entries:
+		path = entry.path.encode('utf-8')
+		start = NOT_SOLID if entry.start is None else entry.start
+		parts.append(INDEX_ENTRY.pack(entry.offset, start, entry.size, entry.compressed_size, entry.crc,
+		                              ALGORITHM_IDS[entry.algorithm], entry.mtime, entry.digest, len(path)))
+		parts.append(path)
+	parts.append(FOOTER.pack(index_offset, len(entries), INDEX_MAGIC))
+	return b''.join(parts)
+
+
+def unpack_index(buffer) -> list[IndexEntry]:
+	if len(buffer) < FOOTER.size:
+		raise ValueError('Truncated archive')
+	offset, count, magic = FOOTER.unpack_from(buffer, len(buffer) - FOOTER.size)
+	if magic != INDEX_MAGIC:
+		raise ValueError('Archive index not found')
+	entries = []
+	for _ in range(count):
+		member_offset, start, size, compressed_size, crc, algorithm, mtime, digest, path_length = \
+			INDEX_ENTRY.unpack_from(buffer, offset)
+		offset += INDEX_ENTRY.size
+		path = bytes(buffer[offset:offset + path_length]).decode('utf-8')
+		offset += path_length
+		entries.append(IndexEntry(path, member_offset, size, compressed_size, crc, ALGORITHMS[algorithm], mtime,
+		                          digest, None if start == NOT_SOLID else start))
+	return entries
+
+
+class ChunkEntry(NamedTuple):
+	offset: int
+	start: int
+	length: int
+
+
+def pack_recipe(ids: list[int]) -> bytes:
+	return RECIPE.pack(len(ids)) + struct.pack(f'<{len(ids)}I', *ids)
+
+
+def unpack_recipe(buffer, offset: int) -> list[int]:
+	if len(buffer) - offset < RECIPE.size:
+		raise ValueError('Truncated recipe')
+	count, = RECIPE.unpack_from(buffer, offset)
+	offset += RECIPE.size
+	if len(buffer) - offset < 4 * count:
+		raise ValueError('Truncated recipe')
+	return list(struct.unpack_from(f'<{count}I', buffer, offset))
+
+
+def pack_chunk_table(chunks: list[ChunkEntry], table_offset: int) -> bytes:
+	return b''.join(CHUNK_ENTRY.pack(*chunk) for chunk in chunks) + \
+		FOOTER.pack(table_offset, len(chunks), CHUNK_MAGIC)
+
+
+def unpack_chunk_table(buffer) -> list[ChunkEntry]:
+	if len(buffer) < 2 * FOOTER.size:
+		raise ValueError('Truncated archive')
+	index_offset, _, _ = FOOTER.unpack_from(buffer, len(buffer) - FOOTER.size)
+	if index_offset < FOOTER.size:
+		raise ValueError('Chunk table not found')
+	offset, count, magic = FOOTER.unpack_from(buffer, index_offset - FOOTER.size)
+	if magic != CHUNK_MAGIC or offset + count * CHUNK_ENTRY.size > index_offset - FOOTER.size:
+		raise ValueError('Chunk table not found')
+	return [ChunkEntry(*CHUNK_ENTRY.unpack_from(buffer, offset + number * CHUNK_ENTRY.size)) for number in range(count)]
@@ -0,0 +1,72 @@
+"""
+Content-defined chunking for deduplicated archives.
+
+Chunk boundaries come from a gear rolling hash: every byte shifts the hash
+left and adds a per-byte constant, so its top bits only depend on the last
+64 bytes. A chunk ends where those bits are all zero, which happens at the
+same content wherever it sits in a file. An insertion then only changes the
+chunks around it instead of shifting every block boundary after it.
+"""
+import hashlib
+from typing import Iterable, Iterator
+
+MIN_CHUNK = 2 << 10
+MAX_CHUNK = 64 << 10
+# the top CUT_BITS bits of the hash are zero on average every 8 KiB past MIN_CHUNK
+CUT_BITS = 13
+WINDOW = 64
+MASK = (1 << 64) - 1
+CUT_MASK = ((1 << CUT_BITS) - 1) << (64 - CUT_BITS)
+DIGEST_SIZE = 16
+GEAR = tuple(int.from_bytes(hashlib.blake2b(bytes([byte]), digest_size=8).digest(), 'little') for byte in range(256))
+
+
+def find_cut(data, start: int, end: int) -> int:
+	"""Return the end of the chunk starting at ``start``, at most ``end``."""
+	limit = min(end, start + MAX_CHUNK)
+	# the hash only depends on the last WINDOW bytes, so the bytes before those never matter
+	position = start + MIN_CHUNK - WINDOW
+	if position >= limit:
+		return limit
+	gear = GEAR
+	value = 0
+	for position, byte in enumerate(data[position:limit], position):
+		value = ((value << 1) + gear[byte]) & MASK
+		if not value & CUT_MASK and position - start >= MIN_CHUNK:
+			return position + 1
+	return limit
+
+
+def split_chunks(pieces: Iterable[bytes]) -> Iterator[bytes]:
+	"""Cut the concatenation of ``pieces`` into content-defined chunks."""
+	pending = bytearray()
+	for piece in pieces:
+		pending += piece
+		start = 0
+		# a cut is final once a whole MAX_CHUNK is buffered after the chunk start
+		while len(pending) - start >= MAX_CHUNK:
+			end = find_cut(pending, start, len(pending))
+			yield bytes(pending[start:end])
+			start = end
+		del pending[:start]
+	start = 0
+	while start < len(pending):
+		end = find_cut(pending, start, len(pending))
+		yield bytes(pending[start:end])
+		start = end
+
+
+def digest(data) -> bytes:
+	return hashlib.blake2b(data, digest_size=DIGEST_SIZE).digest()
+
+
+def new_hasher():
+	return hashlib.blake2b(digest_size=DIGEST_SIZE)
+
+
+def file_digest(path, block_size: int) -> bytes:
+	hasher = new_hasher()
+	with open(path, 'rb') as f:
+		for block in iter(lambda: f.read(block_size), b''):
+			hasher.update(block)
+	return hasher.digest()
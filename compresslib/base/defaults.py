@@ -0,0 +1,35 @@
+"""
+Defaults and limits of the options, kept free of imports so that the CLI
+can offer them without loading the coders.
+"""
+
+# lzw code width in bits
+MIN_BITS = 9
+MAX_BITS = 20
+DEFAULT_BITS = 16
+
+# range coder, the context table never holds more than 1 << memory_bits contexts of 256 counts each,
+# 2.3 MiB at 12 bits and within a few percent of the ratio of 16 bits (36 MiB) on text
+MIN_ORDER = 0
+MAX_ORDER = 2
+DEFAULT_ORDER = 2
+MIN_MEMORY_BITS = 0
+MAX_MEMORY_BITS = 16
+DEFAULT_MEMORY_BITS = 12
+
+# lz77 window in bits and effort
+MIN_WINDOW_BITS = 10
+MAX_WINDOW_BITS = 20
+DEFAULT_WINDOW_BITS = 16
+MIN_LEVEL = 1
+MAX_LEVEL = 9
+DEFAULT_LEVEL = 6
+
+# lzw phrases kept in a trained dictionary
+DEFAULT_PHRASES = 1 << 15
+
+# one block being read and one being written while the current one is coded
+DEFAULT_BUFFERS = 2
+
+# the environment variable naming the address of ``zipper serve``
+ENV_SERVER = 'ZIPPER_SERVER'
@@ -0,0 +1,88 @@
+"""
+Trained dictionaries shared by many small files.
+
+A dictionary file holds, little-endian::
+
+	4       magic, b'ZDIC'
+	4       dictionary id, the CRC-32 of everything after it (1 if that is 0)
+	256     huffman code lengths, none of them zero
+	4       number of lzw phrases
+	4 * n   lzw phrases, each ``prefix code << 8 | next byte``
+
+The phrases are numbered from the first free lzw code on, every prefix
+comes before the phrases extending it and the most used phrases come
+first, so any leading part of the table is a valid table of its own.
+Containers written with a dictionary carry its id in their header.
+"""
+import struct
+import zlib
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+from .defaults import DEFAULT_PHRASES
+
+MAGIC = b'ZDIC'
+HEAD = struct.Struct('<4sI')
+COUNT = struct.Struct('<I')
+CODE_LENGTHS = 256
+
+
+class Dictionary(NamedTuple):
+	id: int
+	code_lengths: bytes
+	phrases: tuple[int, ...]
+
+
+def make_dictionary(code_lengths: bytes, phrases: Iterable[int]) -> Dictionary:
+	phrases = tuple(phrases)
+	if len(code_lengths) != CODE_LENGTHS or not all(code_lengths):
+		raise ValueError('A dictionary needs a code length for every byte')
+	return Dictionary(_dictionary_id(_pack_body(code_lengths, phrases)), bytes(code_lengths), phrases)
+
+
+def _dictionary_id(body: bytes) -> int:
+	# a zero id in a header means no dictionary
+	return zlib.crc32(body) or 1
+
+
+def _pack_body(code_lengths: bytes, phrases: tuple[int, ...]) -> bytes:
+	return bytes(code_lengths) + COUNT.pack(len(phrases)) + struct.pack(f'<{len(phrases)}I', *phrases)
+
+
+def pack_dictionary(dictionary: Dictionary) -> bytes:
+	return HEAD.pack(MAGIC, dictionary.id) + _pack_body(dictionary.code_lengths, dictionary.phrases)
+
+
+def unpack_dictionary(blob: bytes) -> Dictionary:
+	if len(blob) < HEAD.size + CODE_LENGTHS + COUNT.size:
+		raise ValueError('Truncated dictionary')
+	magic, dictionary_id = HEAD.unpack_from(blob)
+	if magic != MAGIC:
+		raise ValueError('Not a zipper dictionary')
+	if _dictionary_id(blob[HEAD.size:]) != dictionary_id:
+		raise ValueError('Corrupted dictionary')
+	offset = HEAD.size
+	code_lengths = blob[offset:offset + CODE_LENGTHS]
+	count, = COUNT.unpack_from(blob, offset + CODE_LENGTHS)
+	offset += CODE_LENGTHS + COUNT.size
+	if len(blob) - offset != 4 * count:
+		raise ValueError('Truncated dictionary')
+	return make_dictionary(code_lengths, struct.unpack_from(f'<{count}I', blob, offset))
+
+
+def load_dictionary(path) -> Dictionary:
+	return unpack_dictionary(Path(path).read_bytes())
+
+
+def save_dictionary(dictionary: Dictionary, path):
+	Path(path).write_bytes(pack_dictionary(dictionary))
+
+
+def train(samples: Iterable[bytes], max_phrases: int = DEFAULT_PHRASES) -> Dictionary:
+	"""Build a dictionary from sample files that look like the files it will be used for."""
+	# the coders are imported here, base modules never import them at load time
+	from ..algorithms.huffman import train_code_lengths
+	from ..algorithms.lzw import train_phrases
+
+	samples = list(samples)
+	return make_dictionary(train_code_lengths(samples), train_phrases(samples, max_phrases))
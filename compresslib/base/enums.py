@@ -4,3 +4,8 @@ from enum import Enum
 class CodingType(str, Enum):
 	LZW = 'lzw'
 	HUFFMAN = 'huff'
+	ADAPTIVE_HUFFMAN = 'ahuff'
+	RANGE = 'range'
+	LZ77 = 'lz77'
+	STORE = 'store'
+	AUTO = 'auto'
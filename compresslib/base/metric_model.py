@@ -1,14 +1,15 @@
 import traceback
+from typing import TYPE_CHECKING, Optional
 
 from pydantic import BaseModel
 from pydantic import BeforeValidator
-from rich.align import Align
-from rich.console import Console, ConsoleOptions
-from rich.layout import Layout
-from rich.panel import Panel
-from rich.table import Table
 from typing_extensions import Annotated
 
+# rich is only imported when a model is rendered, so plain output never loads it
+if TYPE_CHECKING:
+	from rich.console import Console, ConsoleOptions
+	from rich.panel import Panel
+
 TracebackLocation = Annotated[
 	tuple, BeforeValidator(lambda tb: (x for x in traceback.extract_tb(tb)))]
 
@@ -21,7 +22,11 @@ class TraceBack(BaseModel):
 	traceback: TracebackLocation
 	info: TracebackInfo
 
-	def __rich_console__(self, console: Console, options: ConsoleOptions):
+	def __rich_console__(self, console: 'Console', options: 'ConsoleOptions'):
+		from rich.align import Align
+		from rich.layout import Layout
+		from rich.panel import Panel
+
 		exp_type = self._recognize_type_exp()
 		layout = Layout(name='root')
 		layout.split_row(Layout(name='right'), Layout(name='left'))
@@ -45,14 +50,45 @@ class FileMetric(BaseModel):
 	size: int
 
 
+class PhaseMetric(BaseModel):
+	name: str
+	calls: int
+	elapsed: float
+	size: int
+	peak_memory: Optional[int] = None
+
+
+def phase_table(phases: list[PhaseMetric]) -> 'Panel':
+	from rich.panel import Panel
+	from rich.table import Table
+
+	table = Table(box=None)
+	table.add_column('[bold]Phase', no_wrap=True)
+	table.add_column('[bold]Calls', justify='right', no_wrap=True)
+	table.add_column('[bold]Time', justify='right', no_wrap=True)
+	table.add_column('[bold]Bytes', justify='right', no_wrap=True)
+	table.add_column('[bold]Throughput', justify='right', no_wrap=True)
+	table.add_column('[bold]Peak memory', justify='right', no_wrap=True)
+	for metric in phases:
+		throughput = f'{metric.size / 1024 / 1024 / metric.elapsed:.2f}MB/s' if metric.size and metric.elapsed else '-'
+		peak = f'{metric.peak_memory / 1024 / 1024:.2f}MB' if metric.peak_memory is not None else '-'
+		table.add_row(metric.name, f'{metric.calls}', f'[magenta]{metric.elapsed:.4f}s', f'{metric.size}',
+		              throughput, peak)
+	return Panel.fit(table, title='[bold]Phases', style='blue')
+
+
 class CompressionMetric(BaseModel):
 	file: FileMetric
 	compressed_file: FileMetric
 	ratio: float
 	space_saved: float
 	elapsed: float
+	phases: list[PhaseMetric] = []
+
+	def __rich_console__(self, console: 'Console', options: 'ConsoleOptions'):
+		from rich.panel import Panel
+		from rich.table import Table
 
-	def __rich_console__(self, console: Console, options: ConsoleOptions):
 		yield f'[bold green] Done with compression [magenta]{self.file.filename}[/magenta][/bold green]'
 		table = Table(show_header=False, box=None)
 		table.add_column('[bold]File', justify='right', no_wrap=True)
@@ -63,11 +99,84 @@ class CompressionMetric(BaseModel):
 		table.add_row('[bold]Space saved', f'[magenta]{self.space_saved / 1024 / 1024:.4f}MB')
 		table.add_row('[bold]Elapsed time', f'[magenta]{self.elapsed:.4f}s')
 		yield Panel.fit(table, title='[bold]Compression metrics', style='blue')
+		if self.phases:
+			yield phase_table(self.phases)
 
 
 class DecompressionMetric(BaseModel):
 	file: FileMetric
 	elapsed: float
+	phases: list[PhaseMetric] = []
 
-	def __rich_console__(self, console: Console, options: ConsoleOptions):
+	def __rich_console__(self, console: 'Console', options: 'ConsoleOptions'):
 		yield f'[bold green] Done with compression [magenta]{self.file.filename}[/magenta] in [magenta]{self.elapsed}s[/bold green]'
+		if self.phases:
+			yield phase_table(self.phases)
+
+
+class MemberMetric(BaseModel):
+	path: str
+	size: int
+	compressed_size: int
+	algorithm: str
+	solid: bool = False
+
+
+class ArchiveListing(BaseModel):
+	archive: FileMetric
+	members: list[MemberMetric]
+	# members share blocks, their compressed sizes are shares of those blocks
+	estimated: bool = False
+
+	def __rich_console__(self, console: 'Console', options: 'ConsoleOptions'):
+		from rich.panel import Panel
+		from rich.table import Table
+
+		table = Table(box=None, caption='~ members sharing blocks are charged an estimated share of them'
+		                                 if self.estimated else None)
+		table.add_column('[bold]Size', justify='right', no_wrap=True)
+		table.add_column('[bold]~Compressed' if self.estimated else '[bold]Compressed', justify='right', no_wrap=True)
+		table.add_column('[bold]Ratio', justify='right', no_wrap=True)
+		table.add_column('[bold]Algorithm', no_wrap=True)
+		table.add_column('[bold]Path')
+		for member in self.members:
+			ratio = member.compressed_size / member.size * 100 if member.size else 0
+			table.add_row(f'{member.size}', f'{member.compressed_size}', f'{ratio:.2f}%',
+			              f'{member.algorithm} solid' if member.solid else member.algorithm, f'[magenta]{member.path}')
+		yield Panel.fit(table, title=f'[bold]{self.archive.filename}[/bold] ({len(self.members)} members)',
+		                style='blue')
+
+
+class BatchMetric(CompressionMetric):
+	throughput: float
+
+
+class BatchError(BaseModel):
+	filename: str
+	error: str
+
+
+class BatchSummary(BaseModel):
+	files: int
+	failed: int
+	size: int
+	compressed_size: int
+	elapsed: float
+
+	def __rich_console__(self, console: 'Console', options: 'ConsoleOptions'):
+		from rich.panel import Panel
+		from rich.table import Table
+
+		table = Table(show_header=False, box=None)
+		table.add_column('[bold]Metric', justify='right', no_wrap=True)
+		table.add_column('[bold]Value', no_wrap=True)
+		ratio = self.compressed_size / self.size * 100 if self.size else 0
+		throughput = self.size / 1024 / 1024 / self.elapsed if self.elapsed else 0
+		table.add_row('[bold]Files', f'[magenta]{self.files}')
+		table.add_row('[bold]Failed', f'[red]{self.failed}' if self.failed else '[magenta]0')
+		table.add_row('[bold]Original size', f'[magenta]{self.size / 1024 / 1024:.4f}MB')
+		table.add_row('[bold]Compressed size', f'[magenta]{self.compressed_size / 1024 / 1024:.4f}MB')
+		table.add_row('[bold]Ratio', f'[magenta]{ratio:.4f}%')
+		table.add_row('[bold]Elapsed time', f'[magenta]{self.elapsed:.4f}s')
+		table.add_row('[bold]Throughput', f'[magenta]{throughput:.2f}MB/s')
+		yield Panel.fit(table, title='[bold]Batch summary', style='blue')
@@ -0,0 +1,9 @@
+from .corpora import CORPORA, DEFAULT_SIZES, generate
+
+
+def __getattr__(name):
+	# the runner pulls in pydantic and the algorithms, load it on first use
+	if name in ('run_benchmark', 'run_case'):
+		from . import runner
+		return getattr(runner, name)
+	raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
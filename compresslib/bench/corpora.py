@@ -0,0 +1,94 @@
+import random
+import struct
+from typing import Callable
+
+WORDS = ('the', 'of', 'and', 'to', 'in', 'is', 'that', 'for', 'it', 'as', 'was', 'with', 'be', 'by', 'on', 'not',
+         'he', 'this', 'are', 'or', 'his', 'from', 'at', 'which', 'but', 'have', 'an', 'had', 'they', 'you',
+         'compression', 'dictionary', 'symbol', 'frequency', 'archive', 'stream', 'block', 'encoder', 'decoder',
+         'table', 'huffman', 'window', 'entropy', 'storage', 'network', 'transfer', 'benchmark', 'latency')
+LEVELS = ('DEBUG', 'INFO', 'INFO', 'INFO', 'WARN', 'ERROR')
+ENDPOINTS = ('/api/v1/users', '/api/v1/orders', '/api/v2/search', '/health', '/static/app.js', '/login')
+
+
+def _fill(rng: random.Random, size: int, piece: Callable[[], bytes]) -> bytes:
+	parts = []
+	total = 0
+	while total < size:
+		part = piece()
+		parts.append(part)
+		total += len(part)
+	return b''.join(parts)[:size]
+
+
+def text(size: int, seed: int = 0) -> bytes:
+	rng = random.Random(seed)
+	# zipf-like word weights, like natural language
+	weights = [1 / (rank + 1) for rank in range(len(WORDS))]
+
+	def sentence():
+		words = rng.choices(WORDS, weights, k=rng.randint(5, 18))
+		return (' '.join(words).capitalize() + rng.choice('..!?') + rng.choice(' \n')).encode()
+
+	return _fill(rng, size, sentence)
+
+
+def logs(size: int, seed: int = 0) -> bytes:
+	rng = random.Random(seed)
+	clock = 1_700_000_000
+
+	def line():
+		nonlocal clock
+		clock += rng.randint(0, 3)
+		return (f'{clock} {rng.choice(LEVELS):5} [worker-{rng.randint(1, 16)}] {rng.choice(("GET", "POST"))} '
+		        f'{rng.choice(ENDPOINTS)} status={rng.choice((200, 200, 200, 201, 404, 500))} '
+		        f'user_id={rng.randint(1, 5000)} duration_ms={rng.randint(1, 900)}\n').encode()
+
+	return _fill(rng, size, line)
+
+
+def random_bytes(size: int, seed: int = 0) -> bytes:
+	return random.Random(seed).randbytes(size)
+
+
+def repetitive(size: int, seed: int = 0) -> bytes:
+	rng = random.Random(seed)
+	pattern = bytearray(rng.randbytes(64))
+
+	def copy():
+		if rng.random() < 0.05:
+			pattern[rng.randrange(len(pattern))] = rng.randrange(256)
+		return bytes(pattern)
+
+	return _fill(rng, size, copy)
+
+
+def binary(size: int, seed: int = 0) -> bytes:
+	rng = random.Random(seed)
+	record = struct.Struct('<IIhdB')
+	state = [0, 1000, 0, 20.0]
+
+	def pack():
+		state[0] += 1
+		state[1] += rng.randint(0, 8)
+		state[2] = rng.randint(-300, 300)
+		state[3] += rng.uniform(-0.5, 0.5)
+		return record.pack(state[0], state[1], state[2], round(state[3], 2), rng.choice((0, 0, 0, 1, 2)))
+
+	return _fill(rng, size, pack)
+
+
+CORPORA: dict[str, Callable[[int, int], bytes]] = {
+	'text': text,
+	'logs': logs,
+	'random': random_bytes,
+	'repetitive': repetitive,
+	'binary': binary,
+}
+DEFAULT_SIZES = (64 << 10, 1 << 20)
+
+
+def generate(name: str, size: int, seed: int = 0) -> bytes:
+	try:
+		return CORPORA[name](size, seed)
+	except KeyError:
+		raise ValueError(f'Unknown corpus: {name}') from None
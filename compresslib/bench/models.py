@@ -0,0 +1,50 @@
+from typing import TYPE_CHECKING, Optional
+
+from pydantic import BaseModel
+
+if TYPE_CHECKING:
+	from rich.console import Console, ConsoleOptions
+
+
+class TrialStats(BaseModel):
+	mean: float
+	median: float
+	stdev: float
+	min: float
+	max: float
+
+
+class CaseResult(BaseModel):
+	algorithm: str
+	corpus: str
+	size: int
+	compressed_size: int
+	ratio: float
+	compress: TrialStats
+	decompress: TrialStats
+	compress_throughput: float
+	decompress_throughput: float
+	peak_rss: Optional[int] = None
+
+
+class BenchmarkReport(BaseModel):
+	python: str
+	platform: str
+	trials: int
+	results: list[CaseResult]
+
+	def __rich_console__(self, console: 'Console', options: 'ConsoleOptions'):
+		from rich.panel import Panel
+		from rich.table import Table
+
+		table = Table(box=None)
+		for column in ('Algorithm', 'Corpus', 'Size', 'Ratio', 'Compress', 'Decompress', 'Peak RSS'):
+			table.add_column(f'[bold]{column}', justify='left' if column in ('Algorithm', 'Corpus') else 'right',
+			                 no_wrap=True)
+		for result in self.results:
+			rss = f'{result.peak_rss / 1024 / 1024:.1f}MB' if result.peak_rss is not None else '-'
+			table.add_row(result.algorithm, result.corpus, f'{result.size / 1024:.0f}KB', f'{result.ratio:.2f}%',
+			              f'[magenta]{result.compress_throughput:.2f}MB/s',
+			              f'[magenta]{result.decompress_throughput:.2f}MB/s', rss)
+		yield Panel.fit(table, title=f'[bold]Benchmark[/bold] ({self.trials} trials, median throughput)',
+		                style='blue')
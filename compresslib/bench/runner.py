@@ -0,0 +1,84 @@
+import io
+import multiprocessing
+import platform
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Optional
+
+from .corpora import DEFAULT_SIZES, generate
+from .models import BenchmarkReport, CaseResult, TrialStats
+from ..algorithms import get_algorithm
+from ..base.enums import CodingType
+
+
+def peak_rss() -> Optional[int]:
+	try:
+		import resource
+	except ImportError:
+		return None
+	usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# bytes on macOS, kilobytes everywhere else
+	return usage if sys.platform == 'darwin' else usage * 1024
+
+
+def trial_stats(samples: list[float]) -> TrialStats:
+	return TrialStats(mean=statistics.fmean(samples), median=statistics.median(samples),
+	                  stdev=statistics.stdev(samples) if len(samples) > 1 else 0.0,
+	                  min=min(samples), max=max(samples))
+
+
+def throughput(size: int, seconds: float) -> float:
+	return size / 1024 / 1024 / seconds if seconds else float('inf')
+
+
+def run_case(coding_type: CodingType, corpus: str, size: int, trials: int = 3, seed: int = 0,
+             measure_rss: bool = False, **options) -> CaseResult:
+	data = generate(corpus, size, seed)
+	algorithm = get_algorithm(coding_type)(directory='.', path='-', **options)
+	compress_times = []
+	decompress_times = []
+	compressed = b''
+	for _ in range(trials):
+		target = io.BytesIO()
+		start = time.perf_counter()
+		algorithm.compress_stream(io.BytesIO(data), target)
+		compress_times.append(time.perf_counter() - start)
+		compressed = target.getvalue()
+
+		output = io.BytesIO()
+		start = time.perf_counter()
+		algorithm.decompress_stream(io.BytesIO(compressed), output)
+		decompress_times.append(time.perf_counter() - start)
+		if output.getvalue() != data:
+			raise AssertionError(f'{coding_type.value} did not round-trip the {corpus} corpus')
+
+	compress = trial_stats(compress_times)
+	decompress = trial_stats(decompress_times)
+	return CaseResult(algorithm=coding_type.value, corpus=corpus, size=size, compressed_size=len(compressed),
+	                  ratio=len(compressed) / size * 100 if size else 0.0, compress=compress, decompress=decompress,
+	                  compress_throughput=throughput(size, compress.median),
+	                  decompress_throughput=throughput(size, decompress.median),
+	                  peak_rss=peak_rss() if measure_rss else None)
+
+
+def _isolated_case(args: tuple) -> CaseResult:
+	coding_type, corpus, size, trials, seed, options = args
+	return run_case(coding_type, corpus, size, trials, seed, measure_rss=True, **options)
+
+
+def run_benchmark(algorithms: Iterable[CodingType], corpora: Iterable[str], sizes: Iterable[int] = DEFAULT_SIZES,
+                  trials: int = 3, seed: int = 0, isolate: bool = True, **options) -> BenchmarkReport:
+	cases = [(coding_type, corpus, size) for coding_type in algorithms for corpus in corpora for size in sizes]
+	results = []
+	for coding_type, corpus, size in cases:
+		if isolate:
+			# a fresh interpreter per case, so its peak RSS belongs to that case alone
+			with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as executor:
+				result = executor.submit(_isolated_case, (coding_type, corpus, size, trials, seed, options)).result()
+		else:
+			result = run_case(coding_type, corpus, size, trials, seed, **options)
+		results.append(result)
+	return BenchmarkReport(python=platform.python_version(), platform=platform.platform(), trials=trials,
+	                       results=results)
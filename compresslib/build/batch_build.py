@@ -0,0 +1,62 @@
+import time
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Type, Union
+
+from ..algorithms import get_algorithm
+from ..base.abstract import AbstractAlgorithm
+from ..base.enums import CodingType
+from ..base.metric_model import BatchError, BatchMetric, BatchSummary, FileMetric
+
+
+class BatchBuild:
+	"""Compress many files in one process with a single algorithm object."""
+
+	def __init__(self, algorithm: Optional[Type[AbstractAlgorithm]] = None, output: Optional[Path] = None,
+	             **options):
+		algorithm = algorithm or get_algorithm(CodingType.HUFFMAN)
+		self.algorithm = algorithm(directory='.', path='-', **options)
+		self.output = output
+		self.summary = BatchSummary(files=0, failed=0, size=0, compressed_size=0, elapsed=0.0)
+		# targets written by this batch, a later file never overwrites one
+		self.targets: set[Path] = set()
+
+	def target(self, file: Path) -> Path:
+		# the full name, so a.txt and a.log do not share a target
+		return (self.output or file.parent).joinpath(file.name + self.algorithm.suffix)
+
+	def compress_file(self, file: Path) -> BatchMetric:
+		if not file.is_file():
+			raise ValueError(f'{file} is not a file')
+		target = self.target(file)
+		resolved = target.resolve()
+		if resolved in self.targets:
+			raise ValueError(f'{target} was already written by this batch')
+		if target.exists() and target.samefile(file):
+			raise ValueError(f'{target} is the input itself')
+		self.targets.add(resolved)
+		start = time.perf_counter()
+		with open(target, 'wb') as f:
+			# the target name keeps the extension, the header needs none
+			size, _ = self.algorithm.compress_file(file, f)
+			compressed_size = f.tell()
+		elapsed = time.perf_counter() - start
+		return BatchMetric(file=FileMetric(filename=str(file), size=size),
+		                   compressed_file=FileMetric(filename=str(target), size=compressed_size),
+		                   ratio=compressed_size / size * 100 if size else 0.0, space_saved=size - compressed_size,
+		                   elapsed=elapsed, throughput=size / 1024 / 1024 / elapsed if elapsed else 0.0)
+
+	def execute(self, files: Iterable[Path]) -> Iterator[Union[BatchMetric, BatchError]]:
+		if self.output is not None:
+			self.output.mkdir(parents=True, exist_ok=True)
+		for file in files:
+			self.summary.files += 1
+			try:
+				metric = self.compress_file(file)
+			except (OSError, ValueError) as error:
+				self.summary.failed += 1
+				yield BatchError(filename=str(file), error=f'{type(error).__name__}: {error}')
+				continue
+			self.summary.size += metric.file.size
+			self.summary.compressed_size += metric.compressed_file.size
+			self.summary.elapsed += metric.elapsed
+			yield metric
@@ -1,53 +1,80 @@
 import timeit
+from functools import partial
 from pathlib import Path
-from typing import Type
+from typing import TYPE_CHECKING, Optional, Type
 
-from ..algorithms.huffman import HuffmanCoding
+from ..algorithms import get_algorithm
 from ..base.abstract import AbstractBuilder, AbstractAlgorithm
-from ..base.metric_model import CompressionMetric, FileMetric, DecompressionMetric
+from ..base.container import sniff
+from ..base.enums import CodingType
 from ..utils.path_utils import get_size
+from ..utils.profiling import Profiler, profiling
+
+if TYPE_CHECKING:
+	from ..base.metric_model import CompressionMetric, DecompressionMetric, PhaseMetric
+
+
+# the metric models are imported on use, running a build without them never loads pydantic
+def phase_metrics(profiler: Profiler) -> list['PhaseMetric']:
+	from ..base.metric_model import PhaseMetric
+	return [PhaseMetric(name=name, calls=record.calls, elapsed=record.elapsed, size=record.size,
+	                    peak_memory=record.peak_memory) for name, record in profiler.phases.items()]
 
 
 class HuffBuild(AbstractBuilder):
-	def __init__(self, directory: Path, file: Path, algorithm: Type[AbstractAlgorithm] = HuffmanCoding):
-		super().__init__(algorithm=algorithm(directory=str(directory), path=str(file)),
-		                 filename=file, output=directory)
+	def __init__(self, directory: Path, file: Path, algorithm: Optional[Type[AbstractAlgorithm]] = None,
+	             member: Optional[str] = None, update: Optional[Path] = None, trace_memory: bool = False,
+	             coder: Optional[AbstractAlgorithm] = None, **options):
+		# a coder kept from an earlier build brings its options and tables along
+		if coder is None:
+			algorithm = algorithm or get_algorithm(CodingType.HUFFMAN)
+			coder = algorithm(directory=str(directory), path=str(file), **options)
+		else:
+			coder.locate(str(file), str(directory))
+		super().__init__(algorithm=coder, filename=file, output=directory)
+		self.member = member
+		self.update = update
+		self.profiler = Profiler(trace_memory=trace_memory)
 
-	def compression_metrics(self, elapsed: float) -> CompressionMetric:
+	def phase_metrics(self) -> list['PhaseMetric']:
+		return phase_metrics(self.profiler)
+
+	def compression_metrics(self, elapsed: float) -> 'CompressionMetric':
+		from ..base.metric_model import CompressionMetric, FileMetric
 		original_file = FileMetric(filename=str(self.filename), size=get_size(self.filename))
-		compressed_file = FileMetric(filename=str(self.output.joinpath(self.filename.name).with_suffix(self.algorithm.suffix)),
-		                             size=get_size(self.output.joinpath(self.filename.name).with_suffix(self.algorithm.suffix)))
+		compressed_path = self.update or self.output.joinpath(self.filename.name).with_suffix(self.algorithm.suffix)
+		compressed_file = FileMetric(filename=str(compressed_path), size=get_size(compressed_path))
 		ratio = (compressed_file.size / original_file.size) * 100
 		space_saved = original_file.size - compressed_file.size
 		return CompressionMetric(file=original_file, compressed_file=compressed_file, ratio=ratio,
-		                         space_saved=space_saved, elapsed=elapsed)
+		                         space_saved=space_saved, elapsed=elapsed, phases=self.phase_metrics())
 
-	def decompression_metrics(self, elapsed: float) -> DecompressionMetric:
+	def decompression_metrics(self, elapsed: float) -> 'DecompressionMetric':
+		from ..base.metric_model import DecompressionMetric, FileMetric
 		file = FileMetric(filename=str(self.filename), size=get_size(self.filename))
-		return DecompressionMetric(file=file, elapsed=elapsed)
-
-	def execute_func(self):
-		if self.filename.suffix == self.algorithm.suffix:
-			return self.execute_decompression
-		else:
-			return self.execute_compression
+		return DecompressionMetric(file=file, elapsed=elapsed, phases=self.phase_metrics())
 
 	def execute_compression(self):
-		if self.filename.is_file():
+		if self.update is not None:
+			elapsed = timeit.timeit(partial(self.algorithm.update_archive, str(self.update)), number=1)
+		elif self.filename.is_file():
 			elapsed = timeit.timeit(self.algorithm.compress, number=1)
 		else:
 			elapsed = timeit.timeit(self.algorithm.compress_archive, number=1)
 		return elapsed
 
 	def execute_decompression(self):
-		try:
+		if sniff(self.filename).is_archive:
+			elapsed = timeit.timeit(partial(self.algorithm.decompress_archive, member=self.member), number=1)
+		elif self.member is not None:
+			raise ValueError(f'{self.filename} is not an archive')
+		else:
 			elapsed = timeit.timeit(self.algorithm.decompress, number=1)
-		except AttributeError:
-			elapsed = timeit.timeit(self.algorithm.decompress_archive, number=1)
 		return elapsed
 
 	def execute(self, func):
-		elapsed = func()
+		with profiling(self.profiler):
+			elapsed = func()
 		if func == self.execute_compression:
 			return self.compression_metrics(elapsed)
 		else:
@@ -0,0 +1,119 @@
+"""
+Client of ``zipper serve``.
+
+A request is one line of JSON, followed by ``length`` bytes of body when
+the request carries one. The answer has the same shape: a JSON line with
+``ok`` and either ``metric`` or ``error``, followed by ``length`` bytes of
+output for a request that sent a body. Paths in requests are read and
+written by the server, so they must be absolute, and a server on a TCP
+port refuses them.
+
+This module only imports the standard library, running it as
+``python -m compresslib.client`` forwards a file to the server without
+loading typer, pydantic or the coders.
+"""
+import json
+import os
+import socket
+import sys
+from typing import BinaryIO, Optional, Union
+
+from .base.defaults import ENV_SERVER
+
+
+def default_address() -> str:
+	import tempfile
+
+	directory = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+	return os.path.join(directory, f'zipper-{os.getuid()}.sock')
+
+
+def parse_address(address: str) -> Union[str, tuple[str, int]]:
+	"""Tell a ``host:port`` TCP address from the path of a Unix socket."""
+	host, separator, port = address.rpartition(':')
+	if separator and port.isdigit() and '/' not in address:
+		return host or '127.0.0.1', int(port)
+	return address
+
+
+def connect(address: str) -> socket.socket:
+	target = parse_address(address)
+	if isinstance(target, tuple):
+		return socket.create_connection(target)
+	sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	try:
+		sock.connect(target)
+	except OSError:
+		sock.close()
+		raise
+	return sock
+
+
+class Client:
+	"""A connection to the server, several requests may be sent over it one after another."""
+
+	def __init__(self, address: Optional[str] = None):
+		self.socket = connect(address or os.environ.get(ENV_SERVER) or default_address())
+		self.reader = self.socket.makefile('rb')
+
+	def __enter__(self) -> 'Client':
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+	def close(self):
+		self.reader.close()
+		self.socket.close()
+
+	def request(self, command: str, body: Optional[bytes] = None, **fields) -> tuple[dict, Optional[bytes]]:
+		"""Send a request and return the metric and the output body, raise ValueError with the server's error."""
+		request = dict(fields, command=command)
+		if body is not None:
+			request['length'] = len(body)
+		self.socket.sendall(json.dumps(request).encode() + b'\n')
+		if body is not None:
+			self.socket.sendall(body)
+		line = self.reader.readline()
+		if not line:
+			raise ValueError('The server closed the connection')
+		response = json.loads(line)
+		output = None
+		if 'length' in response:
+			output = self.reader.read(response['length'])
+			if len(output) != response['length']:
+				raise ValueError('The server closed the connection')
+		if not response['ok']:
+			raise ValueError(response['error'])
+		return response['metric'], output
+
+
+def forward(command: str, path: str, address: Optional[str] = None, stdin: Optional[BinaryIO] = None,
+            stdout: Optional[BinaryIO] = None, **fields) -> dict:
+	"""Run one request on the server, for a path or, with '-', for the data of ``stdin`` written to ``stdout``."""
+	with Client(address) as client:
+		if path != '-':
+			return client.request(command, path=os.path.abspath(path), **fields)[0]
+		metric, output = client.request(command, (stdin or sys.stdin.buffer).read(), **fields)
+		(stdout or sys.stdout.buffer).write(output)
+		return metric
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+	argv = sys.argv[1:] if argv is None else argv
+	if len(argv) < 2 or argv[0] not in ('compress', 'decompress'):
+		print('usage: python -m compresslib.client compress|decompress PATH [ALGORITHM]', file=sys.stderr)
+		return 2
+	fields = {'algorithm': argv[2]} if len(argv) > 2 and argv[0] == 'compress' else {}
+	try:
+		metric = forward(argv[0], argv[1], **fields)
+	except (OSError, ValueError) as error:
+		print(f'{type(error).__name__}: {error}', file=sys.stderr)
+		return 1
+	if argv[1] != '-':
+		print(json.dumps(metric))
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
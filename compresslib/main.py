@@ -1,82 +1,405 @@
 import sys
+from contextlib import nullcontext
+from functools import cache
 from pathlib import Path
+from typing import List, Optional
 
-from rich.console import Console
-from typer import Typer, Argument, Option, launch
-from typer import confirm
+from typer import Typer, Argument, Exit, Option
 
-from .algorithms.huffman import HuffmanCoding
-from .algorithms.lzw import LZWCoding
+from .algorithms import get_algorithm
+from .base.defaults import DEFAULT_BITS, DEFAULT_BUFFERS, DEFAULT_LEVEL, DEFAULT_MEMORY_BITS, DEFAULT_ORDER, \
+	DEFAULT_PHRASES, DEFAULT_WINDOW_BITS, ENV_SERVER, MAX_BITS, MAX_LEVEL, MAX_MEMORY_BITS, MAX_ORDER, \
+	MAX_WINDOW_BITS, MIN_BITS, MIN_LEVEL, MIN_MEMORY_BITS, MIN_ORDER, MIN_WINDOW_BITS
 from .base.enums import CodingType
-from .base.metric_model import TraceBack
-from .build.huff_build import HuffBuild
-from .utils.url import generate_issue_link
+from .bench import CORPORA, DEFAULT_SIZES
 
+# rich, the pydantic models and the algorithms are imported inside the
+# commands that use them, so starting the CLI stays cheap
 app = Typer()
-console = Console()
+settings = {'quiet': False}
+
+STREAM = '-'
+
+
+@cache
+def get_console(stderr: bool = False):
+	from rich.console import Console
+	return Console(stderr=stderr)
+
+
+def show(renderable, stderr: bool = False):
+	if not settings['quiet']:
+		get_console(stderr).print(renderable)
+
+
+def status(message: str):
+	if settings['quiet']:
+		return nullcontext()
+	return get_console().status(message, spinner="growHorizontal")
+
+
+def fail(message: str):
+	if settings['quiet']:
+		print(message, file=sys.stderr)
+	else:
+		get_console(stderr=True).print(f'[red]{message}[/red]')
+	raise Exit(code=1)
+
+
+def stream_error(error: Exception):
+	fail(f'{type(error).__name__}: {error}')
+
+
+def report_error():
+	if settings['quiet']:
+		stream_error(sys.exc_info()[1])
+
+	from typer import confirm, launch
+	from .base.metric_model import TraceBack
+	from .utils.url import generate_issue_link
+
+	tb = sys.exc_info()[2]
+	traceback = TraceBack(traceback=tb, info=sys.exc_info())
+	console = get_console()
+	console.size = (65, 10)
+	console.print(traceback)
+	if confirm("Would you like to send issue?", default=False):
+		link = generate_issue_link(title=f'[AUTO ISSUE]', body=traceback.info)
+		launch(link)
+
+
+def algorithm_options(algorithm: CodingType, jobs: int, buffers: int, lzw_max_bits: int, rc_order: int,
+                      rc_memory_bits: int, level: int, lz77_window_bits: int, lz77_huffman: bool) -> dict:
+	options = {'jobs': jobs, 'buffers': buffers}
+	match algorithm:
+		case CodingType.LZW:
+			options['max_bits'] = lzw_max_bits
+		case CodingType.RANGE:
+			options['order'] = rc_order
+			options['memory_bits'] = rc_memory_bits
+		case CodingType.LZ77:
+			options['level'] = level
+			options['window_bits'] = lz77_window_bits
+			options['huffman'] = lz77_huffman
+	return options
+
+
+def read_dictionary(path: Path):
+	from .base.dictionary import load_dictionary
+
+	try:
+		return load_dictionary(path)
+	except ValueError as error:
+		fail(f'{path}: {error}')
+
+
+def forward_request(command: str, path: Path, server: str, **fields):
+	"""Run a cmp or ucmp on 'zipper serve', without loading the coders here."""
+	from .client import forward
+
+	fields = {name: value for name, value in fields.items() if value is not None}
+	try:
+		metric = forward(command, str(path), server, **fields)
+	except (OSError, ValueError) as error:
+		fail(f'{server}: {error}')
+	if str(path) != STREAM and not settings['quiet']:
+		from .base.metric_model import CompressionMetric, DecompressionMetric
+		show((CompressionMetric if command == 'compress' else DecompressionMetric).model_validate(metric))
+
+
+def absolute(path: Optional[Path]) -> Optional[str]:
+	return None if path is None else str(path.resolve())
+
+
+def execute_build(build, fn, message: str, profile: Optional[Path] = None):
+	if settings['quiet'] and profile is None:
+		# skip the metrics (and pydantic) entirely
+		fn()
+		return
+	with status(message):
+		if profile is None or profile.suffix == '.json':
+			res = build.execute(func=fn)
+		else:
+			import cProfile
+			profiler = cProfile.Profile()
+			res = profiler.runcall(build.execute, func=fn)
+			profiler.dump_stats(profile)
+	if profile is not None and profile.suffix == '.json':
+		profile.write_text(res.model_dump_json(indent=2))
+	show(res)
+
+
+@app.callback()
+def main(quiet: bool = Option(False, '--quiet', '-q',
+                              help="Plain output: print only data and errors, without rich formatting")):
+	settings['quiet'] = quiet
 
 
 @app.command('cmp')
 def compress(
-		path: Path = Argument(help="The path of the file to be compressed", exists=True),
+		path: Path = Argument(help="The path of the file to be compressed, '-' for stdin to stdout",
+		                      exists=True, allow_dash=True),
 		algorithm: CodingType = Option(CodingType.HUFFMAN,
 		                               '--algorithm', '-a',
-		                               help="The algorithm to be used for compression")):
+		                               help="The algorithm to be used for compression"),
+		lzw_max_bits: int = Option(DEFAULT_BITS, '--lzw-max-bits', min=MIN_BITS, max=MAX_BITS,
+		                           help="The maximum LZW code width in bits"),
+		rc_order: int = Option(DEFAULT_ORDER, '--rc-order', min=MIN_ORDER, max=MAX_ORDER,
+		                       help="The number of preceding bytes the range coder model conditions on"),
+		rc_memory_bits: int = Option(DEFAULT_MEMORY_BITS, '--rc-memory-bits', min=MIN_MEMORY_BITS, max=MAX_MEMORY_BITS,
+		                             help="At most 2^N range coder contexts of 512 bytes each"),
+		level: int = Option(DEFAULT_LEVEL, '--level', '-l', min=MIN_LEVEL, max=MAX_LEVEL,
+		                    help="LZ77 effort, from 1 (fastest) to 9 (smallest output)"),
+		lz77_window_bits: int = Option(DEFAULT_WINDOW_BITS, '--lz77-window-bits', min=MIN_WINDOW_BITS,
+		                               max=MAX_WINDOW_BITS, help="The LZ77 window is 2^N bytes"),
+		lz77_huffman: bool = Option(True, '--lz77-huffman/--lz77-raw',
+		                            help="Huffman code the LZ77 output, deflate-style"),
+		jobs: int = Option(1, '--jobs', '-j', min=0, help="Worker processes for blocks and archive members, 0 for all cores"),
+		buffers: int = Option(DEFAULT_BUFFERS, '--buffers', min=0,
+		                      help="Blocks read ahead and written behind by I/O threads, 0 to do all I/O inline"),
+		dedup: bool = Option(False, '--dedup',
+		                     help="Store content repeated across the files of a directory archive only once"),
+		solid: bool = Option(False, '--solid',
+		                     help="Pack the small files of a directory archive together into shared blocks"),
+		solid_size: int = Option(1024, '--solid-size', min=1,
+		                         help="The size of a solid block in KiB, smaller files are packed into them"),
+		update: Path = Option(None, '--update', exists=True, dir_okay=False,
+		                      help="Refresh this archive from the directory PATH, recompressing only new and changed files"),
+		dictionary_path: Path = Option(None, '--dict', exists=True, dir_okay=False,
+		                               help="A dictionary made by 'zipper train', for huff and lzw"),
+		profile: Path = Option(None, '--profile', dir_okay=False,
+		                       help="Trace memory per phase and write a JSON trace (.json) or cProfile stats to this file"),
+		server: str = Option(None, '--server', envvar=ENV_SERVER,
+		                     help="Forward the work to 'zipper serve' at this socket path or localhost host:port")):
 	try:
-		match algorithm:
-			case CodingType.HUFFMAN:
-				algo = HuffmanCoding
-			case CodingType.LZW:
-				algo = LZWCoding
-			case _:
-				console.print("[red]Invalid algorithm[/red]")
-				return
-
-		build = HuffBuild(directory=path.parent, file=path, algorithm=algo)
-
-		fn = build.execute_func()
-		with console.status("[bold green]Compressing...", spinner="growHorizontal"):
-			res = build.execute(func=fn)
-		console.print(res)
+		if server is not None:
+			if profile is not None:
+				fail("--profile cannot be used with --server")
+			options = algorithm_options(algorithm, jobs, buffers, lzw_max_bits, rc_order, rc_memory_bits, level,
+			                            lz77_window_bits, lz77_huffman)
+			# the server's workers code one request each, they have no jobs of their own
+			del options['jobs']
+			forward_request('compress', path, server, algorithm=algorithm.value,
+			                options=dict(options, dedup=dedup, solid=solid, solid_size=solid_size << 10),
+			                update=absolute(update), dictionary=absolute(dictionary_path))
+			return
+		if update is not None:
+			from .base.container import sniff
+			header = sniff(update)
+			if header is None or not header.is_archive:
+				fail(f"{update} is not an archive")
+			if not path.is_dir():
+				fail(f"{path} is not a directory")
+			# new and changed members are compressed like the rest of the archive
+			algorithm = header.algorithm
+		options = algorithm_options(algorithm, jobs, buffers, lzw_max_bits, rc_order, rc_memory_bits, level,
+		                            lz77_window_bits, lz77_huffman)
+		if dedup and solid:
+			fail("--dedup and --solid cannot be used together")
+		options.update(dedup=dedup, solid=solid, solid_size=solid_size << 10)
+		algo = get_algorithm(algorithm)
+		if dictionary_path is not None:
+			if not algo.supports_dictionary:
+				fail(f"{algorithm.value} cannot use a dictionary")
+			options['dictionary'] = read_dictionary(dictionary_path)
+
+		if str(path) == STREAM:
+			try:
+				algo(directory='.', path=STREAM, **options).compress_stream(sys.stdin.buffer, sys.stdout.buffer)
+			except Exception as error:
+				stream_error(error)
+			return
+
+		from .build.huff_build import HuffBuild
+		build = HuffBuild(directory=path.parent, file=path, algorithm=algo, update=update,
+		                  trace_memory=profile is not None, **options)
+		execute_build(build, build.execute_compression, "[bold green]Compressing...", profile)
+	except Exit:
+		raise
 	except:
-		tb = sys.exc_info()[2]
-		traceback = TraceBack(traceback=tb, info=sys.exc_info())
-		console.size = (65, 10)
-		console.print(traceback)
-		if confirm("Would you like to send issue?", default=False):
-			link = generate_issue_link(title=f'[AUTO ISSUE]', body=traceback.info)
-			launch(link)
+		report_error()
 
 
 @app.command('ucmp')
 def decompress(
-		path: Path = Argument(help="The path of the file to be decompressed", exists=True, file_okay=True,
-		                      formats=[".lzw", ".huff"]),
-		output: Path = Option(None, '--output', '-o', help="The path of the output file", dir_okay=True)):
+		path: Path = Argument(help="The path of the file to be decompressed, '-' for stdin to stdout",
+		                      exists=True, file_okay=True, allow_dash=True),
+		output: Path = Option(None, '--output', '-o', help="The path of the output file", dir_okay=True),
+		jobs: int = Option(1, '--jobs', '-j', min=0, help="Worker processes for blocks and archive members, 0 for all cores"),
+		buffers: int = Option(DEFAULT_BUFFERS, '--buffers', min=0,
+		                      help="Blocks read ahead and written behind by I/O threads, 0 to do all I/O inline"),
+		member: str = Option(None, '--member', '-m', help="Extract only this member of an archive"),
+		dictionary_path: Path = Option(None, '--dict', exists=True, dir_okay=False,
+		                               help="The dictionary the file was compressed with"),
+		profile: Path = Option(None, '--profile', dir_okay=False,
+		                       help="Trace memory per phase and write a JSON trace (.json) or cProfile stats to this file"),
+		server: str = Option(None, '--server', envvar=ENV_SERVER,
+		                     help="Forward the work to 'zipper serve' at this socket path or localhost host:port")):
+	if server is not None:
+		if profile is not None:
+			fail("--profile cannot be used with --server")
+		forward_request('decompress', path, server, output=absolute(output), member=member,
+		                dictionary=absolute(dictionary_path), options={'buffers': buffers})
+		return
+
+	from .base.container import read_header, sniff
+
+	if str(path) == STREAM:
+		try:
+			header = read_header(sys.stdin.buffer)
+			algo = get_algorithm(header.algorithm)
+			dictionary = read_dictionary(dictionary_path) if header.dictionary and dictionary_path else None
+			algo(directory='.', path=STREAM, jobs=jobs, buffers=buffers, dictionary=dictionary).decompress_stream(
+				sys.stdin.buffer, sys.stdout.buffer, header)
+		except Exception as error:
+			stream_error(error)
+		return
+
 	try:
-		match path.suffix:
-			case ".lzw":
-				algo = LZWCoding
-			case ".huff":
-				algo = HuffmanCoding
-			case _:
-				console.print("[red]Invalid algorithm[/red]")
-				return
-
-		build = HuffBuild(directory=output or path.parent, file=path, algorithm=algo)
-		fn = build.execute_func()
-		with console.status("[bold green]Decompressing...", spinner="growHorizontal"):
-			res = build.execute(func=fn)
-		console.print(res)
+		header = sniff(path)
+		if header is None:
+			fail("Not a compressed file")
+		dictionary = read_dictionary(dictionary_path) if header.dictionary and dictionary_path else None
+
+		from .build.huff_build import HuffBuild
+		build = HuffBuild(directory=output or path.parent, file=path, algorithm=get_algorithm(header.algorithm),
+		                  member=member, jobs=jobs, buffers=buffers, dictionary=dictionary,
+		                  trace_memory=profile is not None)
+		execute_build(build, build.execute_decompression, "[bold green]Decompressing...", profile)
+	except Exit:
+		raise
 	except:
-		tb = sys.exc_info()[2]
-		traceback = TraceBack(traceback=tb, info=sys.exc_info())
-		console.size = (65, 10)
-		console.print(traceback)
-		if confirm("Would you like to send issue?", default=False):
-			link = generate_issue_link(title=f'[AUTO ISSUE]', body=traceback.info)
-			launch(link)
+		report_error()
+
+
+@app.command('serve')
+def serve(
+		address: str = Option(None, '--address',
+		                      help="The Unix socket path, or a localhost host:port, to listen on (default: a socket in "
+		                           "XDG_RUNTIME_DIR or the temporary directory)"),
+		workers: int = Option(0, '--workers', '-w', min=0, help="Worker processes, 0 for all cores")):
+	from .client import default_address
+	from .server import serve as run_server
+
+	address = address or default_address()
+	try:
+		run_server(address, workers, ready=lambda: show(f'Listening on [bold]{address}[/bold]', stderr=True))
+	except (OSError, ValueError) as error:
+		fail(str(error))
+
+
+@app.command('ls')
+def list_archive(
+		path: Path = Argument(help="The path of the archive to be listed", exists=True, dir_okay=False)):
+	from .base.archive import ArchiveReader
+
+	try:
+		with ArchiveReader(path) as reader:
+			entries = reader.entries
+			estimated = reader.header.is_dedup or reader.header.is_solid
+	except ValueError as error:
+		fail(str(error))
+	if settings['quiet']:
+		for entry in entries:
+			print(f'{entry.size}\t{entry.compressed_size}\t{entry.algorithm.value}\t{entry.path}')
+		return
+
+	from .base.metric_model import ArchiveListing, FileMetric, MemberMetric
+	from .utils.path_utils import get_size
+	members = [MemberMetric(path=entry.path, size=entry.size, compressed_size=entry.compressed_size,
+	                        algorithm=entry.algorithm.value, solid=entry.start is not None) for entry in entries]
+	show(ArchiveListing(archive=FileMetric(filename=str(path), size=get_size(path)), members=members,
+	                    estimated=estimated))
+
+
+@app.command('batch')
+def batch(
+		paths: List[Path] = Argument(None, help="The files to be compressed, read one per line from stdin if omitted or '-'"),
+		algorithm: CodingType = Option(CodingType.HUFFMAN, '--algorithm', '-a',
+		                               help="The algorithm to be used for compression"),
+		lzw_max_bits: int = Option(DEFAULT_BITS, '--lzw-max-bits', min=MIN_BITS, max=MAX_BITS,
+		                           help="The maximum LZW code width in bits"),
+		rc_order: int = Option(DEFAULT_ORDER, '--rc-order', min=MIN_ORDER, max=MAX_ORDER,
+		                       help="The number of preceding bytes the range coder model conditions on"),
+		rc_memory_bits: int = Option(DEFAULT_MEMORY_BITS, '--rc-memory-bits', min=MIN_MEMORY_BITS, max=MAX_MEMORY_BITS,
+		                             help="At most 2^N range coder contexts of 512 bytes each"),
+		level: int = Option(DEFAULT_LEVEL, '--level', '-l', min=MIN_LEVEL, max=MAX_LEVEL,
+		                    help="LZ77 effort, from 1 (fastest) to 9 (smallest output)"),
+		lz77_window_bits: int = Option(DEFAULT_WINDOW_BITS, '--lz77-window-bits', min=MIN_WINDOW_BITS,
+		                               max=MAX_WINDOW_BITS, help="The LZ77 window is 2^N bytes"),
+		lz77_huffman: bool = Option(True, '--lz77-huffman/--lz77-raw',
+		                            help="Huffman code the LZ77 output, deflate-style"),
+		output: Path = Option(None, '--output', '-o', file_okay=False,
+		                      help="Directory for the compressed files, next to each input if omitted"),
+		jobs: int = Option(1, '--jobs', '-j', min=0, help="Worker processes for the blocks of each file, 0 for all cores"),
+		buffers: int = Option(DEFAULT_BUFFERS, '--buffers', min=0,
+		                      help="Blocks read ahead and written behind by I/O threads, 0 to do all I/O inline")):
+	from .base.metric_model import BatchError
+	from .build.batch_build import BatchBuild
+
+	options = algorithm_options(algorithm, jobs, buffers, lzw_max_bits, rc_order, rc_memory_bits, level,
+	                            lz77_window_bits, lz77_huffman)
+	if not paths or [str(path) for path in paths] == [STREAM]:
+		paths = (Path(line.strip()) for line in sys.stdin if line.strip())
+
+	build = BatchBuild(algorithm=get_algorithm(algorithm), output=output, **options)
+	for metric in build.execute(paths):
+		sys.stdout.write(metric.model_dump_json(exclude={'phases'}) + '\n')
+		sys.stdout.flush()
+		# the summary is not shown in quiet mode, failures still go to stderr
+		if settings['quiet'] and isinstance(metric, BatchError):
+			print(f'{metric.filename}: {metric.error}', file=sys.stderr)
+	show(build.summary, stderr=True)
+	if build.summary.failed:
+		if settings['quiet']:
+			print(f'{build.summary.failed} of {build.summary.files} files failed', file=sys.stderr)
+		raise Exit(code=1)
+
+
+@app.command('train')
+def train(
+		samples: List[Path] = Argument(help="Sample files, or directories of them, that look like the files to compress",
+		                               exists=True),
+		output: Path = Option(..., '--output', '-o', dir_okay=False, help="The dictionary file to write"),
+		phrases: int = Option(DEFAULT_PHRASES, '--phrases', min=0,
+		                      help="At most this many LZW phrases, the most used are kept")):
+	from .base.dictionary import save_dictionary, train as train_dictionary
+
+	def read_samples():
+		for sample in samples:
+			files = sorted(path for path in sample.rglob('*') if path.is_file()) if sample.is_dir() else [sample]
+			for file in files:
+				yield file.read_bytes()
+
+	with status("[bold green]Training..."):
+		dictionary = train_dictionary(read_samples(), phrases)
+	save_dictionary(dictionary, output)
+	if settings['quiet']:
+		print(f'{dictionary.id:08x}')
+	else:
+		show(f'Dictionary [bold]{dictionary.id:08x}[/bold] with {len(dictionary.phrases)} LZW phrases written to {output}')
+
+
+@app.command('bench')
+def bench(
+		algorithms: List[CodingType] = Option(list(CodingType), '--algorithm', '-a',
+		                                      help="The algorithms to benchmark, repeat for several"),
+		corpora: List[str] = Option(list(CORPORA), '--corpus', '-c',
+		                            help=f"The generated corpora to run on: {', '.join(CORPORA)}"),
+		sizes: List[int] = Option([size >> 10 for size in DEFAULT_SIZES], '--size', '-s', min=1,
+		                          help="Corpus sizes in KB, repeat for several"),
+		trials: int = Option(3, '--trials', '-n', min=1, help="Timed runs per case"),
+		json_path: Path = Option(None, '--json', help="Write the results as JSON to this file", dir_okay=False)):
+	from .bench.runner import run_benchmark
 
+	unknown = [corpus for corpus in corpora if corpus not in CORPORA]
+	if unknown:
+		fail(f"Unknown corpus: {', '.join(unknown)}")
+	with status("[bold green]Benchmarking..."):
+		report = run_benchmark(algorithms, corpora, [size << 10 for size in sizes], trials)
+	show(report)
+	if json_path:
+		json_path.write_text(report.model_dump_json(indent=2))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,310 @@
+"""
+The ``zipper serve`` daemon.
+
+An asyncio server on a Unix socket, or on a loopback TCP port, reads the
+requests described in ``client.py`` and runs them on a pool of worker
+processes. The workers are started and import the coders and the metric
+models once, and keep coders, with their decode tables and primed LZW
+tables, and the dictionaries they loaded for later requests. A request
+then costs a round trip to a warm process instead of starting Python.
+
+Request fields, besides ``command`` (compress or decompress) and either
+``path`` or ``length``::
+
+	algorithm    compress, the CLI name of the algorithm (default huff)
+	options      algorithm options: level, max_bits, order, memory_bits,
+	             window_bits, huffman, block_size, buffers, dedup, solid and
+	             solid_size
+	update       compress, an archive to refresh from the directory path
+	dictionary   the path of a dictionary made by ``zipper train``
+	output       decompress, the output directory (default next to path)
+	member       decompress, the only archive member to extract
+
+Requests on one connection are answered in order, connections are served
+concurrently. Any local user can connect to a TCP port, so over TCP only
+requests with a body are run and requests naming a path are refused.
+"""
+import asyncio
+import ipaddress
+import json
+import os
+import signal
+import socket
+import stat
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable, Optional
+
+from .client import parse_address
+from .utils.parallel import resolve_jobs
+
+# bodies are held in memory by the server and a worker while they are coded
+MAX_BODY = 1 << 30
+# the workers run requests serially, there is no jobs option
+OPTIONS = frozenset({'level', 'max_bits', 'order', 'memory_bits', 'window_bits', 'huffman', 'block_size', 'buffers',
+                     'dedup', 'solid', 'solid_size'})
+# fields naming files the server reads or writes, only accepted on the Unix socket
+PATH_FIELDS = frozenset({'path', 'update', 'dictionary', 'output'})
+
+# dictionaries loaded by this worker, by path, with the mtime they were loaded at
+_dictionaries = {}
+
+
+def _warm():
+	"""Import everything a request may need, run once in every worker."""
+	from . import api
+	from .algorithms import get_algorithm
+	from .base.enums import CodingType
+	from .base import metric_model
+	from .build import huff_build
+
+	for coding_type in CodingType:
+		get_algorithm(coding_type)
+	return os.getpid()
+
+
+def _dictionary(path: str):
+	from .base.dictionary import load_dictionary
+
+	mtime = os.stat(path).st_mtime_ns
+	cached = _dictionaries.get(path)
+	if cached is None or cached[0] != mtime:
+		cached = _dictionaries[path] = mtime, load_dictionary(path)
+	return cached[1]
+
+
+def _absolute(request: dict, name: str) -> Optional[str]:
+	value = request.get(name)
+	if value is not None and not (isinstance(value, str) and os.path.isabs(value)):
+		raise ValueError(f'{name} must be an absolute path')
+	return value
+
+
+def _options(request: dict) -> dict:
+	options = request.get('options') or {}
+	if not isinstance(options, dict) or not options.keys() <= OPTIONS:
+		raise ValueError(f'Options are a JSON object with some of: {", ".join(sorted(OPTIONS))}')
+	return dict(options)
+
+
+def _run_body(command: str, request: dict, options: dict, body: bytes):
+	from . import api
+	from .base.enums import CodingType
+	from .base.metric_model import CompressionMetric, DecompressionMetric, FileMetric
+	from .build.huff_build import phase_metrics
+	from .utils.profiling import Profiler, profiling
+
+	dictionary = _absolute(request, 'dictionary')
+	if dictionary is not None:
+		options['dictionary'] = _dictionary(dictionary)
+	profiler = Profiler()
+	start = time.perf_counter()
+	with profiling(profiler):
+		if command == 'compress':
+			output = api.compress(body, CodingType(request.get('algorithm', CodingType.HUFFMAN)), **options)
+		else:
+			output = api.decompress(body, **options)
+	elapsed = time.perf_counter() - start
+	if command == 'decompress':
+		return DecompressionMetric(file=FileMetric(filename='-', size=len(body)), elapsed=elapsed,
+		                           phases=phase_metrics(profiler)), output
+	return CompressionMetric(file=FileMetric(filename='-', size=len(body)),
+	                         compressed_file=FileMetric(filename='-', size=len(output)),
+	                         ratio=len(output) / len(body) * 100 if body else 0.0, space_saved=len(body) - len(output),
+	                         elapsed=elapsed, phases=phase_metrics(profiler)), output
+
+
+def _run_path(command: str, request: dict, options: dict, path: str):
+	from .api import cached_coder
+	from .base.container import sniff
+	from .base.enums import CodingType
+	from .build.huff_build import HuffBuild
+
+	file = Path(path)
+	dictionary = _absolute(request, 'dictionary')
+	if command == 'compress':
+		algorithm = CodingType(request.get('algorithm', CodingType.HUFFMAN))
+		update = _absolute(request, 'update')
+		if update is not None:
+			header = sniff(update)
+			if header is None or not header.is_archive:
+				raise ValueError(f'{update} is not an archive')
+			if not file.is_dir():
+				raise ValueError(f'{file} is not a directory')
+			algorithm = header.algorithm
+		elif not file.exists():
+			raise ValueError(f'{file} does not exist')
+		if dictionary is not None:
+			options['dictionary'] = _dictionary(dictionary)
+		build = HuffBuild(directory=file.parent, file=file, update=update and Path(update),
+		                  coder=cached_coder(algorithm, options))
+		return build.execute(build.execute_compression)
+
+	header = sniff(file)
+	if header is None:
+		raise ValueError(f'{file} is not a compressed file')
+	# like ucmp, a dictionary is only handed to the coder of data that was compressed with one
+	if dictionary is not None and header.dictionary:
+		options['dictionary'] = _dictionary(dictionary)
+	output = _absolute(request, 'output')
+	build = HuffBuild(directory=Path(output) if output else file.parent, file=file, member=request.get('member'),
+	                  coder=cached_coder(header.algorithm, options, decoding=True))
+	return build.execute(build.execute_decompression)
+
+
+def handle(request: dict, body: Optional[bytes]) -> tuple[dict, Optional[bytes]]:
+	"""Run a request in a worker and return the answer line and, for a body, the output."""
+	try:
+		command = request.get('command')
+		if command not in ('compress', 'decompress'):
+			raise ValueError(f'Unknown command: {command!r}')
+		options = _options(request)
+		if body is not None:
+			metric, output = _run_body(command, request, options, body)
+		else:
+			path = _absolute(request, 'path')
+			if path is None:
+				raise ValueError('A request needs a path or a body')
+			metric, output = _run_path(command, request, options, path), None
+	except Exception as error:
+		return {'ok': False, 'error': f'{type(error).__name__}: {error}'}, None
+	response = {'ok': True, 'metric': metric.model_dump(mode='json')}
+	if output is not None:
+		response['length'] = len(output)
+	return response, output
+
+
+def _is_loopback(host: str) -> bool:
+	if host == 'localhost':
+		return True
+	try:
+		return ipaddress.ip_address(host).is_loopback
+	except ValueError:
+		return False
+
+
+def _remove_stale_socket(path: str):
+	try:
+		mode = os.stat(path).st_mode
+	except FileNotFoundError:
+		return
+	if not stat.S_ISSOCK(mode):
+		raise ValueError(f'{path} exists and is not a socket')
+	probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	try:
+		probe.connect(path)
+	except OSError:
+		# nobody listens, a server before this one did not clean up
+		os.remove(path)
+	else:
+		raise ValueError(f'A server already listens on {path}')
+	finally:
+		probe.close()
+
+
+class Server:
+	def __init__(self, address: str, workers: int = 0):
+		self.address = address
+		self.workers = resolve_jobs(workers)
+		self.pool: Optional[ProcessPoolExecutor] = None
+		self.ready = threading.Event()
+		self._loop: Optional[asyncio.AbstractEventLoop] = None
+		self._stop: Optional[asyncio.Event] = None
+		self._tcp = isinstance(parse_address(address), tuple)
+
+	def _start_pool(self):
+		import multiprocessing
+
+		# spawned, the workers do not inherit the event loop and its threads
+		self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+	async def _submit(self, request: dict, body: Optional[bytes]) -> tuple[dict, Optional[bytes]]:
+		loop = asyncio.get_running_loop()
+		try:
+			return await loop.run_in_executor(self.pool, handle, request, body)
+		except BrokenProcessPool:
+			# a worker died, the request is failed and the next one gets a fresh pool
+			self.pool.shutdown(wait=False)
+			self._start_pool()
+			return {'ok': False, 'error': 'A worker process died'}, None
+
+	async def _connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+		try:
+			while True:
+				try:
+					line = await reader.readline()
+					if not line:
+						break
+					request = json.loads(line)
+					if not isinstance(request, dict):
+						raise ValueError('A request is a JSON object')
+					length = request.pop('length', None)
+					if length is not None and (type(length) is not int or not 0 <= length <= MAX_BODY):
+						raise ValueError(f'Invalid body length: {length!r}')
+				except ValueError as error:
+					# the stream cannot be followed any more, answer and hang up
+					writer.write(json.dumps({'ok': False, 'error': f'{type(error).__name__}: {error}'}).encode() + b'\n')
+					await writer.drain()
+					break
+				body = await reader.readexactly(length) if length is not None else None
+				if self._tcp and not request.keys().isdisjoint(PATH_FIELDS):
+					response, output = {'ok': False, 'error': 'ValueError: Requests over TCP cannot name paths, '
+					                                          'send the data or use the Unix socket'}, None
+				else:
+					response, output = await self._submit(request, body)
+				writer.write(json.dumps(response).encode() + b'\n')
+				if output is not None:
+					writer.write(output)
+				await writer.drain()
+		except (asyncio.IncompleteReadError, ConnectionError):
+			pass
+		finally:
+			writer.close()
+			try:
+				await writer.wait_closed()
+			except ConnectionError:
+				pass
+
+	async def run(self, ready: Optional[Callable[[], None]] = None):
+		self._loop = asyncio.get_running_loop()
+		self._stop = asyncio.Event()
+		target = parse_address(self.address)
+		if isinstance(target, tuple):
+			if not _is_loopback(target[0]):
+				raise ValueError('The server only listens on loopback addresses')
+			server = await asyncio.start_server(self._connection, *target)
+		else:
+			_remove_stale_socket(target)
+			# only the user running the server may connect
+			umask = os.umask(0o177)
+			try:
+				server = await asyncio.start_unix_server(self._connection, target)
+			finally:
+				os.umask(umask)
+		self._start_pool()
+		try:
+			await asyncio.gather(*(self._loop.run_in_executor(self.pool, _warm) for _ in range(self.workers)))
+			if threading.current_thread() is threading.main_thread():
+				for number in (signal.SIGINT, signal.SIGTERM):
+					self._loop.add_signal_handler(number, self._stop.set)
+			self.ready.set()
+			if ready is not None:
+				ready()
+			async with server:
+				await self._stop.wait()
+		finally:
+			server.close()
+			self.pool.shutdown(cancel_futures=True)
+			if isinstance(target, str) and os.path.exists(target):
+				os.remove(target)
+
+	def stop(self):
+		"""Stop the server from another thread."""
+		self._loop.call_soon_threadsafe(self._stop.set)
+
+
+def serve(address: str, workers: int = 0, ready: Optional[Callable[[], None]] = None):
+	asyncio.run(Server(address, workers).run(ready))
@@ -0,0 +1,59 @@
+"""
+Zero-copy input and byte counting.
+
+Files are mapped read-only and handed to the coders as memoryview slices
+of the map, so no block is ever copied out of the page cache on the way
+in. Byte histograms use NumPy when it is installed and fall back to
+``collections.Counter``, which also counts in C but one byte at a time.
+"""
+import mmap
+import os
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator
+
+# importing NumPy costs about 100 ms, only blocks at least this large pay it back
+NUMPY_THRESHOLD = 1 << 16
+
+_numpy = None
+
+
+def _load_numpy():
+	global _numpy
+	if _numpy is None:
+		try:
+			import numpy
+		except ImportError:
+			numpy = False
+		_numpy = numpy
+	return _numpy
+
+
+def byte_histogram(data) -> list[int]:
+	"""Return how often each of the 256 byte values occurs in ``data``, any buffer."""
+	if len(data) >= NUMPY_THRESHOLD:
+		numpy = _load_numpy()
+		if numpy:
+			return numpy.bincount(numpy.frombuffer(data, dtype=numpy.uint8), minlength=256).tolist()
+	counts = Counter(memoryview(data).cast('B'))
+	return [counts.get(byte, 0) for byte in range(256)]
+
+
+@contextmanager
+def mapped(path) -> Iterator[memoryview]:
+	"""Map a file read-only and yield a memoryview of it, empty files cannot be mapped and give an empty view."""
+	with open(path, 'rb') as f:
+		if not os.fstat(f.fileno()).st_size:
+			yield memoryview(b'')
+			return
+		buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		view = memoryview(buffer)
+		try:
+			yield view
+		finally:
+			view.release()
+			try:
+				buffer.close()
+			except BufferError:
+				# a slice is still referenced, from a traceback for example, the map closes once it is freed
+				pass
@@ -0,0 +1,50 @@
+import os
+from collections import deque
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+_worker_state = None
+
+
+def resolve_jobs(jobs: int) -> int:
+	return jobs if jobs > 0 else os.cpu_count() or 1
+
+
+def _initializer(state):
+	global _worker_state
+	_worker_state = state
+
+
+def _invoke(task: Callable, item):
+	return task(_worker_state, item)
+
+
+def ordered_map(task: Callable[[Any, Any], Any], items: Iterable, state, jobs: int = 1,
+                in_flight: Optional[int] = None) -> Iterator:
+	"""
+	Yield ``task(state, item)`` for every item in input order.
+
+	With more than one job the items are sent to a process pool that gets a
+	copy of ``state`` once per worker, and at most ``in_flight`` items are
+	submitted ahead of the one being yielded. Nested calls made from inside a
+	worker always run serially.
+	"""
+	if jobs > 1:
+		# imported here, the pool machinery is only needed when there is a pool
+		import multiprocessing
+		if multiprocessing.parent_process() is not None:
+			jobs = 1
+	if jobs <= 1:
+		for item in items:
+			yield task(state, item)
+		return
+
+	from concurrent.futures import ProcessPoolExecutor
+	in_flight = in_flight or jobs * 2
+	with ProcessPoolExecutor(jobs, initializer=_initializer, initargs=(state,)) as executor:
+		pending = deque()
+		for item in items:
+			pending.append(executor.submit(_invoke, task, item))
+			if len(pending) >= in_flight:
+				yield pending.popleft().result()
+		while pending:
+			yield pending.popleft().result()
@@ -0,0 +1,141 @@
+"""
+Overlapped reading, coding and writing.
+
+``prefetch`` pulls the items of an iterable on a reader thread and
+``write_behind`` hands writes over to a writer thread, both through queues
+of at most ``buffers`` items. File reads and writes release the GIL, so
+while the calling thread codes a block the next one is read and the last
+one written. With no buffers both run inline on the calling thread.
+"""
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import BinaryIO, Iterable, Iterator
+
+from .profiling import phase, record
+
+# how often a blocked reader checks whether it is still wanted
+POLL_INTERVAL = 0.1
+
+_END = object()
+
+
+class _Failure:
+	__slots__ = ('error',)
+
+	def __init__(self, error: BaseException):
+		self.error = error
+
+
+def _put(items: queue.Queue, item, stop: threading.Event) -> bool:
+	while not stop.is_set():
+		try:
+			items.put(item, timeout=POLL_INTERVAL)
+			return True
+		except queue.Full:
+			pass
+	return False
+
+
+def _consume(items: queue.Queue) -> Iterator:
+	while True:
+		item = items.get()
+		if item is _END:
+			return
+		if isinstance(item, _Failure):
+			raise item.error
+		yield item
+
+
+@contextmanager
+def prefetch(iterable: Iterable, buffers: int) -> Iterator[Iterator]:
+	"""
+	Yield an iterator over ``iterable`` that a reader thread runs up to
+	``buffers`` items ahead of. An error raised by the iterable is raised
+	again where its item would have been, and the reader stops once the
+	block is left.
+	"""
+	if buffers <= 0:
+		yield iter(iterable)
+		return
+	items = queue.Queue(buffers)
+	stop = threading.Event()
+
+	def read():
+		try:
+			for item in iterable:
+				if not _put(items, item, stop):
+					return
+			_put(items, _END, stop)
+		except BaseException as error:
+			_put(items, _Failure(error), stop)
+
+	reader = threading.Thread(target=read, name='zipper-reader', daemon=True)
+	reader.start()
+	try:
+		yield _consume(items)
+	finally:
+		stop.set()
+		reader.join()
+
+
+class _Writer:
+	def __init__(self, target: BinaryIO):
+		self.target = target
+
+	def write(self, data) -> int:
+		with phase('write', len(data)):
+			return self.target.write(data)
+
+
+class _WriteBehind:
+	def __init__(self, target: BinaryIO, buffers: int):
+		self.target = target
+		self.pending = queue.Queue(buffers)
+		self.error = None
+		self.writer = threading.Thread(target=self._drain, name='zipper-writer', daemon=True)
+		self.writer.start()
+
+	def _drain(self):
+		while True:
+			data = self.pending.get()
+			if data is _END:
+				return
+			# after a failure the queue is still emptied, so that write never blocks
+			if self.error is None:
+				try:
+					start = time.perf_counter()
+					self.target.write(data)
+					record('write', time.perf_counter() - start, len(data))
+				except BaseException as error:
+					self.error = error
+
+	def write(self, data) -> int:
+		if self.error is not None:
+			raise self.error
+		self.pending.put(data)
+		return len(data)
+
+	def close(self):
+		self.pending.put(_END)
+		self.writer.join()
+		if self.error is not None:
+			raise self.error
+
+
+@contextmanager
+def write_behind(target: BinaryIO, buffers: int) -> Iterator:
+	"""
+	Yield an object whose ``write`` queues data for a writer thread, at most
+	``buffers`` writes ahead. Everything is written once the block is left,
+	the data passed to ``write`` must not change until then.
+	"""
+	if buffers <= 0:
+		yield _Writer(target)
+		return
+	writer = _WriteBehind(target, buffers)
+	try:
+		yield writer
+	finally:
+		writer.close()
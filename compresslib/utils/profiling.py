@@ -0,0 +1,125 @@
+"""
+Phase-level profiling hooks.
+
+Library code reports into the active profiler with the ``phase`` context
+manager, the ``profiled`` decorator or ``profiled_iter`` for generators.
+All of them are no-ops unless a ``Profiler`` has been activated with
+``profiling``. Phases are keyed by name and may nest, the time of an inner
+phase is then counted in the outer one as well. Reader and writer threads
+report with ``record``, which never traces memory. Work done inside worker
+processes is not recorded.
+"""
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from typing import Callable, Iterable, Iterator, Optional
+
+_active: Optional['Profiler'] = None
+_NULL = nullcontext()
+
+
+class PhaseRecord:
+	__slots__ = ('calls', 'elapsed', 'size', 'peak_memory')
+
+	def __init__(self):
+		self.calls = 0
+		self.elapsed = 0.0
+		self.size = 0
+		self.peak_memory: Optional[int] = None
+
+
+class Profiler:
+	def __init__(self, trace_memory: bool = False):
+		self.trace_memory = trace_memory
+		self.phases: dict[str, PhaseRecord] = {}
+		# peaks seen by open phases before a nested phase reset the tracemalloc peak
+		self._peaks: list[int] = []
+		self._lock = threading.Lock()
+
+	def record(self, name: str, elapsed: float, size: int = 0, peak_memory: Optional[int] = None):
+		with self._lock:
+			record = self.phases.get(name)
+			if record is None:
+				record = self.phases[name] = PhaseRecord()
+			record.calls += 1
+			record.elapsed += elapsed
+			record.size += size
+			if peak_memory is not None:
+				record.peak_memory = max(record.peak_memory or 0, peak_memory)
+
+	@contextmanager
+	def phase(self, name: str, size: int = 0):
+		tracing = self.trace_memory and tracemalloc.is_tracing()
+		if tracing:
+			if self._peaks:
+				self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+			self._peaks.append(0)
+			tracemalloc.reset_peak()
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			elapsed = time.perf_counter() - start
+			peak = max(tracemalloc.get_traced_memory()[1], self._peaks.pop()) if tracing else None
+			self.record(name, elapsed, size, peak)
+
+
+@contextmanager
+def profiling(profiler: Profiler):
+	global _active
+	previous = _active
+	started = profiler.trace_memory and not tracemalloc.is_tracing()
+	if started:
+		tracemalloc.start()
+	_active = profiler
+	try:
+		yield profiler
+	finally:
+		_active = previous
+		if started:
+			tracemalloc.stop()
+
+
+def phase(name: str, size: int = 0):
+	if _active is None:
+		return _NULL
+	return _active.phase(name, size)
+
+
+def record(name: str, elapsed: float, size: int = 0):
+	profiler = _active
+	if profiler is not None:
+		profiler.record(name, elapsed, size)
+
+
+def profiled(name: str):
+	def decorator(func: Callable) -> Callable:
+		@wraps(func)
+		def wrapper(*args, **kwargs):
+			if _active is None:
+				return func(*args, **kwargs)
+			with _active.phase(name):
+				return func(*args, **kwargs)
+
+		return wrapper
+
+	return decorator
+
+
+def profiled_iter(name: str, iterable: Iterable, size: Callable = len) -> Iterator:
+	"""Time every step of ``iterable`` and count ``size(item)`` bytes for it."""
+	iterator = iter(iterable)
+	while True:
+		if _active is None:
+			item = next(iterator, _NULL)
+		else:
+			profiler = _active
+			start = time.perf_counter()
+			item = next(iterator, _NULL)
+			if item is not _NULL:
+				profiler.record(name, time.perf_counter() - start, size(item))
+		if item is _NULL:
+			return
+		yield item
@@ -0,0 +1,68 @@
+import io
+import random
+
+import pytest
+
+from compresslib.algorithms.adaptive_huffman import AdaptiveHuffmanCoding, FGKTree
+from compresslib.algorithms.huffman import HuffmanCoding
+
+
+@pytest.fixture
+def coder():
+	return AdaptiveHuffmanCoding(directory='.', path='-')
+
+
+def test_encoded_bits(coder):
+	# 'a' as NYT (empty code) + raw byte, 'a' as '1', 'b' as NYT '0' + raw byte
+	assert coder.encode_block(b'aab') == bytes([0b01100001, 0b10011000, 0b10000000])
+	assert coder.decode_block(bytes([0b01100001, 0b10011000, 0b10000000]), 3) == b'aab'
+
+
+@pytest.mark.parametrize('data', [b'', b'a', b'aaaaaaa', b'abracadabra', bytes(range(256)) * 4,
+                                  random.Random(1).randbytes(20000)])
+def test_roundtrip(coder, data):
+	assert coder.decode_block(coder.encode_block(data), len(data)) == data
+
+
+def test_sibling_property():
+	tree = FGKTree()
+	rng = random.Random(2)
+	for _ in range(5000):
+		tree.update(min(int(rng.expovariate(0.05)), 255))
+		weights = [tree.weight[tree.node_at[number]] for number in range(tree.number[tree.nyt], len(tree.node_at))]
+		assert weights == sorted(weights)
+	for node in range(tree.size):
+		if tree.left[node] >= 0:
+			assert tree.weight[node] == tree.weight[tree.left[node]] + tree.weight[tree.right[node]]
+
+
+def test_matches_static_ratio(coder):
+	data = b''.join(b'GET /api/v1/item/%d 200\n' % (i % 97) for i in range(5000))
+	adaptive = coder.encode_block(data)
+	static = HuffmanCoding(directory='.', path='-').encode_block(data)
+	assert len(adaptive) <= len(static) * 1.02
+
+
+def test_truncated_stream(coder):
+	payload = coder.encode_block(b'some text to truncate')
+	with pytest.raises(ValueError):
+		coder.decode_block(payload[:5], 21)
+
+
+def test_stream_roundtrip():
+	data = b''.join(b'event %d\n' % i for i in range(3000))
+	compressed = io.BytesIO()
+	AdaptiveHuffmanCoding('.', '-', block_size=4096).compress_stream(io.BytesIO(data), compressed)
+	compressed.seek(0)
+	output = io.BytesIO()
+	AdaptiveHuffmanCoding('.', '-').decompress_stream(compressed, output)
+	assert output.getvalue() == data
+
+
+def test_file_roundtrip(tmp_path):
+	file = tmp_path / 'notes.txt'
+	file.write_bytes(b'adaptive huffman file ' * 300)
+	AdaptiveHuffmanCoding(directory=str(tmp_path), path=str(file)).compress()
+	assert (tmp_path / 'notes.ahuff').exists()
+	AdaptiveHuffmanCoding(directory=str(tmp_path / 'out'), path=str(tmp_path / 'notes.ahuff')).decompress()
+	assert (tmp_path / 'out' / 'notes.txt').read_bytes() == file.read_bytes()
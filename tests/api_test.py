@@ -0,0 +1,118 @@
+import io
+import random
+
+import pytest
+
+import compresslib
+from compresslib.api import ZipperFile, cached_coder, compress, decompress
+from compresslib.base.dictionary import make_dictionary
+from compresslib.base.enums import CodingType
+
+DATA = b''.join(b'message %d: status ok\n' % (number % 300) for number in range(5000)) + \
+       random.Random(10).randbytes(5000)
+
+
+@pytest.mark.parametrize('coding_type', list(CodingType))
+def test_bytes_roundtrip(coding_type):
+	for data in (b'', b'x', DATA):
+		assert decompress(compress(data, coding_type, block_size=40_000)) == data
+
+
+def test_bytes_api_checks_input():
+	compressed = compress(DATA, CodingType.LZW)
+	assert decompress(memoryview(compressed)) == DATA
+	with pytest.raises(ValueError):
+		decompress(compressed + b'x')
+	with pytest.raises(ValueError):
+		decompress(compressed[:-3])
+	with pytest.raises(ValueError):
+		decompress(b'not compressed at all')
+
+
+@pytest.mark.parametrize('coding_type, options', [(CodingType.LZW, {'max_bits': 9}),
+                                                   (CodingType.RANGE, {'order': 0, 'memory_bits': 4})])
+def test_decoding_leaves_encoder_settings_alone(coding_type, options):
+	first = compress(DATA, coding_type)
+	assert decompress(compress(DATA, coding_type, **options)) == DATA
+	assert compress(DATA, coding_type) == first
+	# a coder that decodes a block keeps its own settings for encoding
+	coder = cached_coder(coding_type, {})
+	payload = type(coder)('-', '.', **options).encode_block(DATA[:5000])
+	assert coder.decode_block(payload, 5000) == DATA[:5000]
+	assert compress(DATA, coding_type) == first
+
+
+def test_bytes_api_with_dictionary():
+	dictionary = make_dictionary(bytes([8] * 256), [ord('o') << 8 | ord('k')])
+	compressed = compress(b'ok ok ok', 'lzw', dictionary=dictionary)
+	assert decompress(compressed, dictionary=dictionary) == b'ok ok ok'
+	with pytest.raises(ValueError, match='dictionary'):
+		decompress(compressed)
+	# a coder given a dictionary still reads data made without one
+	assert decompress(compress(b'plain', 'lzw'), dictionary=dictionary) == b'plain'
+	assert decompress(compressed, dictionary=dictionary) == b'ok ok ok'
+
+
+@pytest.mark.parametrize('coding_type', [CodingType.HUFFMAN, CodingType.LZ77])
+def test_file_object_roundtrip(coding_type):
+	buffer = io.BytesIO()
+	with compresslib.open(buffer, 'wb', coding_type, block_size=10_000) as f:
+		for start in range(0, len(DATA), 777):
+			assert f.write(DATA[start:start + 777]) == len(DATA[start:start + 777])
+		assert f.writable() and not f.readable()
+	assert buffer.closed is False
+	assert decompress(buffer.getvalue()) == DATA
+
+	buffer.seek(0)
+	with compresslib.open(buffer) as f:
+		assert f.read(5) == DATA[:5]
+		assert f.read1(3) == DATA[5:8]
+		assert f.peek()[:2] == DATA[8:10]
+		assert f.readline() == DATA[8:DATA.index(b'\n') + 1]
+		assert f.read(20_000) == DATA[DATA.index(b'\n') + 1:][:20_000]
+		assert f.read() == DATA[DATA.index(b'\n') + 20_001:]
+		assert f.read() == b''
+
+
+def test_file_object_flush_makes_a_readable_prefix():
+	buffer = io.BytesIO()
+	f = ZipperFile(buffer, 'wb', CodingType.LZW)
+	f.write(b'first ')
+	f.flush()
+	f.write(b'second')
+	f.close()
+	with pytest.raises(ValueError):
+		f.write(b'late')
+	assert decompress(buffer.getvalue()) == b'first second'
+
+
+def test_open_path_and_text_mode(tmp_path):
+	path = tmp_path / 'notes.huff'
+	with compresslib.open(path, 'wt', encoding='utf-8') as f:
+		f.write('zürich\nbern\n')
+	with compresslib.open(str(path), 'rt', encoding='utf-8') as f:
+		assert list(f) == ['zürich\n', 'bern\n']
+	with pytest.raises(FileExistsError):
+		compresslib.open(path, 'xb')
+
+
+def test_open_rejects_bad_arguments(tmp_path):
+	with pytest.raises(ValueError):
+		compresslib.open(io.BytesIO(), 'ab')
+	with pytest.raises(ValueError):
+		compresslib.open(io.BytesIO(), 'rbt')
+	with pytest.raises(TypeError):
+		compresslib.open(42, 'rb')
+	with pytest.raises(ValueError):
+		compresslib.open(io.BytesIO(b'plain text'))
+	with compresslib.open(io.BytesIO(compress(b'abc')), 'rb') as f:
+		with pytest.raises(io.UnsupportedOperation):
+			f.write(b'x')
+
+
+def test_reading_detects_corruption():
+	compressed = bytearray(compress(DATA, CodingType.STORE))
+	compressed[-5] ^= 1
+	with compresslib.open(io.BytesIO(bytes(compressed))) as f:
+		with pytest.raises(ValueError, match='Checksum'):
+			f.read()
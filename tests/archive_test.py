@@ -0,0 +1,136 @@
+import io
+import os
+
+import pytest
+
+from compresslib.algorithms.lzw import LZWCoding
+from compresslib.base.abstract import MEMBER_BLOCK, MEMBER_END, MEMBER_START
+from compresslib.base.archive import ArchiveReader, ArchiveWriter, member_path
+from compresslib.base.enums import CodingType
+
+
+@pytest.fixture
+def tree(tmp_path):
+	source = tmp_path / 'tree'
+	(source / 'docs').mkdir(parents=True)
+	(source / 'a.txt').write_bytes(b'alpha ' * 500)
+	(source / 'docs' / 'b.md').write_bytes(b'# beta\n' * 200)
+	(source / 'docs' / 'empty').write_bytes(b'')
+	return source
+
+
+def test_writer_reader_roundtrip(tmp_path):
+	archive = tmp_path / 'archive.bin'
+	with open(archive, 'wb') as f:
+		writer = ArchiveWriter(f, CodingType.LZW)
+		writer.add('one', b'first member', 10, 1, CodingType.LZW)
+		writer.add('dir\\two', b'second', 20, 2, CodingType.HUFFMAN)
+		writer.close()
+
+	with ArchiveReader(archive) as reader:
+		assert [entry.path for entry in reader.entries] == ['one', 'dir/two']
+		entry = reader.find('dir/two')
+		assert (entry.size, entry.compressed_size, entry.crc, entry.algorithm) == (20, 6, 2, CodingType.HUFFMAN)
+		assert reader.open_member(entry).read(entry.compressed_size) == b'second'
+		with pytest.raises(KeyError):
+			reader.find('three')
+
+
+def test_reader_rejects_single_files(tmp_path):
+	compressed = tmp_path / 'single.lzw'
+	with open(compressed, 'wb') as f:
+		LZWCoding('-', '.').compress_stream(io.BytesIO(b'not an archive'), f)
+	with pytest.raises(ValueError):
+		ArchiveReader(compressed)
+
+
+@pytest.mark.parametrize('path', ['../escape', '/etc/passwd', 'a/../../b', 'a//b'])
+def test_member_path_rejects_unsafe_paths(path):
+	with pytest.raises(ValueError):
+		member_path('out', path)
+
+
+def test_extract_single_member(tmp_path, tree):
+	LZWCoding(str(tree), str(tmp_path)).compress_archive()
+	output = tmp_path / 'out'
+	LZWCoding(str(tmp_path / 'tree.lzw'), str(output)).decompress_archive(member='docs/b.md')
+	assert [path.name for path in output.rglob('*') if path.is_file()] == ['b.md']
+	assert (output / 'docs' / 'b.md').read_bytes() == (tree / 'docs' / 'b.md').read_bytes()
+
+
+def test_archive_roundtrip(tmp_path, tree):
+	LZWCoding(str(tree), str(tmp_path)).compress_archive()
+	with ArchiveReader(tmp_path / 'tree.lzw') as reader:
+		assert sorted(entry.path for entry in reader.entries) == ['a.txt', 'docs/b.md', 'docs/empty']
+
+	output = tmp_path / 'out'
+	LZWCoding(str(tmp_path / 'tree.lzw'), str(output)).decompress_archive()
+	for file in tree.rglob('*'):
+		if file.is_file():
+			assert (output / file.relative_to(tree)).read_bytes() == file.read_bytes()
+
+
+def test_member_events_stream_blocks(tree):
+	events = list(LZWCoding(str(tree), '.', block_size=1024)._member_events())
+	kinds = [kind for kind, _ in events]
+	assert kinds.count(MEMBER_START) == kinds.count(MEMBER_END) == 3
+	blocks = [value for kind, value in events if kind == MEMBER_BLOCK]
+	assert max(len(block) for block in blocks) == 1024
+	assert sum(len(block) for block in blocks) == 3000 + 1400
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_multi_block_archive_roundtrip(tmp_path, tree, jobs):
+	LZWCoding(str(tree), str(tmp_path), block_size=700, jobs=jobs).compress_archive()
+	output = tmp_path / 'out'
+	LZWCoding(str(tmp_path / 'tree.lzw'), str(output), jobs=jobs).decompress_archive()
+	for file in tree.rglob('*'):
+		if file.is_file():
+			assert (output / file.relative_to(tree)).read_bytes() == file.read_bytes()
+
+
+def test_update_archive(tmp_path, tree):
+	LZWCoding(str(tree), str(tmp_path)).compress_archive()
+	archive = tmp_path / 'tree.lzw'
+	with ArchiveReader(archive) as reader:
+		before = {entry.path: entry for entry in reader.entries}
+		unchanged_blob = reader.map[before['docs/b.md'].offset:][:before['docs/b.md'].compressed_size]
+
+	(tree / 'a.txt').write_bytes(b'changed ' * 300)
+	(tree / 'docs' / 'empty').unlink()
+	(tree / 'docs' / 'new.txt').write_bytes(b'new file')
+	# a new mtime with the same content is caught by the digest
+	stat = (tree / 'docs' / 'b.md').stat()
+	os.utime(tree / 'docs' / 'b.md', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+	LZWCoding(str(tree), str(tmp_path)).update_archive(str(archive))
+	with ArchiveReader(archive) as reader:
+		after = {entry.path: entry for entry in reader.entries}
+		entry = after['docs/b.md']
+		assert reader.map[entry.offset:entry.offset + entry.compressed_size] == unchanged_blob
+	assert sorted(after) == ['a.txt', 'docs/b.md', 'docs/new.txt']
+	assert after['docs/b.md'].mtime == before['docs/b.md'].mtime + 10 ** 9
+	assert after['a.txt'].size == 2400 and after['a.txt'].digest != before['a.txt'].digest
+	assert not (tmp_path / 'tree.lzw.part').exists()
+
+	output = tmp_path / 'out'
+	LZWCoding(str(archive), str(output)).decompress_archive()
+	for file in tree.rglob('*'):
+		if file.is_file():
+			assert (output / file.relative_to(tree)).read_bytes() == file.read_bytes()
+	assert not (output / 'docs' / 'empty').exists()
+
+
+def test_update_skips_unchanged_files_without_reading(tmp_path, tree, monkeypatch):
+	LZWCoding(str(tree), str(tmp_path)).compress_archive()
+	archive = tmp_path / 'tree.lzw'
+	before = archive.read_bytes()
+	monkeypatch.setattr('compresslib.base.abstract.file_digest', None)
+	LZWCoding(str(tree), str(tmp_path)).update_archive(str(archive))
+	assert archive.read_bytes() == before
+
+
+def test_update_rejects_dedup_archives(tmp_path, tree):
+	LZWCoding(str(tree), str(tmp_path), dedup=True).compress_archive()
+	with pytest.raises(ValueError):
+		LZWCoding(str(tree), str(tmp_path)).update_archive(str(tmp_path / 'tree.lzw'))
@@ -0,0 +1,98 @@
+import io
+import random
+
+import pytest
+
+from compresslib.algorithms.auto import AutoCoding, choose, entropy, estimate, repetitiveness, sample
+from compresslib.algorithms.lzw import LZWCoding
+from compresslib.algorithms.store import StoreCoding
+from compresslib.base.container import ALGORITHM_IDS
+from compresslib.base.enums import CodingType
+
+TEXT = b''.join(b'line %d: the quick brown fox jumps over the lazy dog\n' % (i % 40) for i in range(4000))
+NOISE = random.Random(6).randbytes(100000)
+# order-0 skewed, but no longer repeats for lzw to find
+SKEWED = bytes(random.Random(7).choices(range(256), weights=[1 / (i + 1) ** 1.5 for i in range(256)], k=100000))
+
+
+@pytest.fixture
+def lzw():
+	return LZWCoding('-', '.')
+
+
+def test_entropy():
+	assert entropy(b'') == 0
+	assert entropy(b'aaaa') == 0
+	assert entropy(bytes(range(256))) == 8
+	assert entropy(b'ab' * 10) == 1
+
+
+def test_repetitiveness():
+	assert repetitiveness(b'abc') == 0
+	assert repetitiveness(bytes(range(256))) == 0
+	assert repetitiveness(b'abcd' * 100) > 0.95
+
+
+def test_sample_is_spread_over_the_block():
+	data = bytes(range(256)) * 1000
+	probe = sample(data)
+	assert len(probe) == 4 * 4096
+	assert sample(b'short') == b'short'
+
+
+@pytest.mark.parametrize('data, expected', [(TEXT, CodingType.LZW), (NOISE, CodingType.STORE),
+                                            (SKEWED, CodingType.HUFFMAN), (b'', CodingType.STORE)])
+def test_choose(lzw, data, expected):
+	assert choose(data, lzw) == expected
+
+
+def test_estimate_skips_lzw_without_repeats(lzw):
+	assert CodingType.LZW not in estimate(NOISE, lzw)
+
+
+@pytest.mark.parametrize('data, expected', [(TEXT, CodingType.LZW), (NOISE, CodingType.STORE),
+                                            (SKEWED, CodingType.HUFFMAN), (b'xy', CodingType.STORE)])
+def test_block_records_choice(data, expected):
+	coder = AutoCoding('-', '.')
+	payload = coder.encode_block(data)
+	assert payload[0] == ALGORITHM_IDS[expected]
+	assert len(payload) <= len(data) + 1
+	assert coder.decode_block(payload, len(data)) == data
+
+
+def test_rejects_unknown_block(lzw):
+	with pytest.raises(ValueError):
+		AutoCoding('-', '.').decode_block(bytes([ALGORITHM_IDS[CodingType.AUTO]]) + b'data', 4)
+
+
+def test_store_roundtrip():
+	compressed = io.BytesIO()
+	StoreCoding('-', '.').compress_stream(io.BytesIO(NOISE), compressed)
+	compressed.seek(0)
+	output = io.BytesIO()
+	StoreCoding('-', '.').decompress_stream(compressed, output)
+	assert output.getvalue() == NOISE
+
+
+def test_mixed_stream_picks_per_block():
+	data = TEXT[:65536] + NOISE[:65536]
+	compressed = io.BytesIO()
+	AutoCoding('-', '.', block_size=65536).compress_stream(io.BytesIO(data), compressed)
+	assert len(compressed.getvalue()) < 65536 + 30000
+	compressed.seek(0)
+	output = io.BytesIO()
+	AutoCoding('-', '.').decompress_stream(compressed, output)
+	assert output.getvalue() == data
+
+
+def test_archive_roundtrip(tmp_path):
+	source = tmp_path / 'tree'
+	source.mkdir()
+	(source / 'notes.txt').write_bytes(TEXT)
+	(source / 'photo.jpg').write_bytes(NOISE)
+	AutoCoding(directory=str(tmp_path), path=str(source)).compress_archive()
+	archive = tmp_path / 'tree.auto'
+	assert archive.stat().st_size < len(NOISE) + len(TEXT) // 3
+	AutoCoding(directory=str(tmp_path / 'out'), path=str(archive)).decompress_archive()
+	assert (tmp_path / 'out' / 'notes.txt').read_bytes() == TEXT
+	assert (tmp_path / 'out' / 'photo.jpg').read_bytes() == NOISE
@@ -0,0 +1,62 @@
+import json
+
+from typer.testing import CliRunner
+
+from compresslib.algorithms.huffman import HuffmanCoding
+from compresslib.algorithms.lzw import LZWCoding
+from compresslib.base.metric_model import BatchError, BatchMetric
+from compresslib.build.batch_build import BatchBuild
+from compresslib.main import app
+
+
+def test_batch_compresses_every_file(tmp_path):
+	files = []
+	for i in range(3):
+		file = tmp_path / f'file{i}.txt'
+		file.write_bytes(b'batch line %d\n' % i * 200)
+		files.append(file)
+
+	build = BatchBuild(algorithm=LZWCoding, output=tmp_path / 'out')
+	results = list(build.execute(files))
+	assert all(isinstance(result, BatchMetric) for result in results)
+	assert [result.compressed_file.filename for result in results] == \
+	       [str(tmp_path / 'out' / f'file{i}.txt.lzw') for i in range(3)]
+	assert build.summary.files == 3
+	assert build.summary.failed == 0
+	assert build.summary.size == sum(file.stat().st_size for file in files)
+
+	LZWCoding(directory=str(tmp_path / 'restored'), path=str(tmp_path / 'out' / 'file1.txt.lzw')).decompress()
+	assert (tmp_path / 'restored' / 'file1.txt').read_bytes() == files[1].read_bytes()
+
+
+def test_batch_reports_failures_and_continues(tmp_path):
+	file = tmp_path / 'data.bin'
+	file.write_bytes(b'')
+	build = BatchBuild(algorithm=HuffmanCoding)
+	results = list(build.execute([tmp_path / 'missing', tmp_path, file]))
+	assert [type(result) for result in results] == [BatchError, BatchError, BatchMetric]
+	assert results[2].ratio == 0
+	assert build.summary.failed == 2
+	assert json.loads(results[0].model_dump_json())['filename'] == str(tmp_path / 'missing')
+
+
+def test_batch_never_overwrites(tmp_path):
+	(tmp_path / 'a.txt').write_bytes(b'text ' * 100)
+	(tmp_path / 'a.log').write_bytes(b'log ' * 100)
+	(tmp_path / 'other').mkdir()
+	(tmp_path / 'other' / 'a.txt').write_bytes(b'other ' * 100)
+	build = BatchBuild(algorithm=LZWCoding, output=tmp_path / 'out')
+	results = list(build.execute([tmp_path / 'a.txt', tmp_path / 'a.log', tmp_path / 'other' / 'a.txt']))
+	assert [type(result) for result in results] == [BatchMetric, BatchMetric, BatchError]
+	assert 'already written' in results[2].error
+	LZWCoding(directory=str(tmp_path / 'restored'), path=str(tmp_path / 'out' / 'a.txt.lzw')).decompress()
+	assert (tmp_path / 'restored' / 'a.txt').read_bytes() == (tmp_path / 'a.txt').read_bytes()
+
+
+def test_quiet_batch_reports_failures_on_stderr(tmp_path):
+	(tmp_path / 'good.txt').write_bytes(b'good ' * 100)
+	result = CliRunner().invoke(app, ['-q', 'batch', str(tmp_path / 'good.txt'), str(tmp_path / 'missing.txt')])
+	assert result.exit_code == 1
+	assert len(result.stdout.splitlines()) == 2
+	assert result.stderr.splitlines()[0].startswith(f'{tmp_path / "missing.txt"}: ')
+	assert result.stderr.splitlines()[-1] == '1 of 2 files failed'
@@ -0,0 +1,56 @@
+import json
+import os
+
+import pytest
+
+from compresslib.base.enums import CodingType
+from compresslib.bench import CORPORA, generate, run_benchmark, run_case
+from compresslib.bench.models import BenchmarkReport
+
+BASELINE = os.environ.get('ZIPPER_BENCH_BASELINE')
+TOLERANCE = float(os.environ.get('ZIPPER_BENCH_TOLERANCE', '0.5'))
+
+
+@pytest.mark.parametrize('name', list(CORPORA))
+def test_corpus_is_deterministic(name):
+	assert generate(name, 5000) == generate(name, 5000)
+	assert len(generate(name, 5000)) == 5000
+	assert generate(name, 0) == b''
+
+
+def test_unknown_corpus():
+	with pytest.raises(ValueError):
+		generate('nope', 10)
+
+
+@pytest.mark.parametrize('coding_type', list(CodingType))
+def test_run_case(coding_type):
+	result = run_case(coding_type, 'logs', 8192, trials=2)
+	assert result.algorithm == coding_type.value
+	assert result.size == 8192
+	assert 0 < result.ratio < 100 or coding_type == CodingType.STORE
+	assert result.compress.min <= result.compress.median <= result.compress.max
+	assert result.compress_throughput > 0
+	assert result.peak_rss is None
+
+
+def test_report_json_roundtrip():
+	report = run_benchmark([CodingType.HUFFMAN], ['text', 'random'], [4096], trials=1, isolate=False)
+	assert [result.corpus for result in report.results] == ['text', 'random']
+	assert BenchmarkReport.model_validate_json(report.model_dump_json()) == report
+
+
+def test_isolated_case_reports_rss():
+	report = run_benchmark([CodingType.LZW], ['repetitive'], [4096], trials=1)
+	assert report.results[0].peak_rss > 0
+
+
+@pytest.mark.skipif(not BASELINE, reason='ZIPPER_BENCH_BASELINE is not set')
+def test_no_regression_against_baseline():
+	with open(BASELINE) as f:
+		baseline = BenchmarkReport.model_validate(json.load(f))
+	for expected in baseline.results:
+		result = run_case(CodingType(expected.algorithm), expected.corpus, expected.size, baseline.trials)
+		assert result.compressed_size <= expected.compressed_size
+		assert result.compress_throughput >= expected.compress_throughput * TOLERANCE
+		assert result.decompress_throughput >= expected.decompress_throughput * TOLERANCE
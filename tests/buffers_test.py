@@ -0,0 +1,50 @@
+import io
+import random
+from collections import Counter
+
+import pytest
+
+from compresslib.algorithms import get_algorithm
+from compresslib.base.enums import CodingType
+from compresslib.utils import buffers
+from compresslib.utils.buffers import NUMPY_THRESHOLD, byte_histogram, mapped
+
+DATA = random.Random(8).randbytes(50_000) + b'abc' * 20_000
+
+
+@pytest.mark.parametrize('data', [b'', b'hello', DATA, bytearray(DATA[:NUMPY_THRESHOLD + 3])])
+def test_byte_histogram(data):
+	counts = Counter(data)
+	assert byte_histogram(data) == [counts[byte] for byte in range(256)]
+	assert byte_histogram(memoryview(data)) == byte_histogram(data)
+
+
+def test_byte_histogram_without_numpy(monkeypatch):
+	monkeypatch.setattr(buffers, '_numpy', False)
+	counts = Counter(DATA)
+	assert byte_histogram(DATA) == [counts[byte] for byte in range(256)]
+
+
+def test_mapped(tmp_path):
+	(tmp_path / 'empty').write_bytes(b'')
+	(tmp_path / 'data').write_bytes(DATA)
+	with mapped(tmp_path / 'empty') as view:
+		assert len(view) == 0
+	with mapped(tmp_path / 'data') as view:
+		assert view[:10] == DATA[:10]
+		assert len(view) == len(DATA)
+	with pytest.raises(ValueError):
+		view[0]
+
+
+@pytest.mark.parametrize('coding_type', list(CodingType))
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_compress_file_matches_stream(tmp_path, coding_type, jobs):
+	(tmp_path / 'data').write_bytes(DATA)
+	coder = get_algorithm(coding_type)('-', '.', block_size=40_000, jobs=jobs)
+	mapped_output = io.BytesIO()
+	assert coder.compress_file(tmp_path / 'data', mapped_output) == coder.compress_stream(io.BytesIO(DATA), io.BytesIO())
+	mapped_output.seek(0)
+	output = io.BytesIO()
+	coder.decompress_stream(mapped_output, output)
+	assert output.getvalue() == DATA
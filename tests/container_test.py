@@ -0,0 +1,64 @@
+import io
+
+import pytest
+
+from compresslib.base.container import (FLAG_ARCHIVE, Header, IndexEntry, iter_blocks, pack_block, pack_header,
+                                        pack_index, pack_trailer, read_header, read_trailer, sniff, unpack_header,
+                                        unpack_index)
+from compresslib.base.enums import CodingType
+
+
+def test_header_roundtrip():
+	header = Header(CodingType.HUFFMAN, extension='.txt')
+	blob = pack_header(header) + b'payload'
+	unpacked, offset = unpack_header(blob)
+	assert unpacked == header
+	assert blob[offset:] == b'payload'
+	stream = io.BytesIO(blob)
+	assert read_header(stream) == header
+	assert stream.read() == b'payload'
+
+
+def test_blocks_roundtrip():
+	stream = io.BytesIO(pack_block(5, b'abc') + pack_block(1, b'') + pack_trailer(6, 42) + b'rest')
+	assert list(iter_blocks(stream)) == [(5, b'abc'), (1, b'')]
+	assert read_trailer(stream) == (6, 42)
+	assert stream.read() == b'rest'
+
+
+def test_truncated_blocks():
+	with pytest.raises(ValueError):
+		list(iter_blocks(io.BytesIO(pack_block(5, b'abc')[:-1])))
+
+
+def test_unpack_header_rejects_foreign_data():
+	with pytest.raises(ValueError):
+		unpack_header(b'\x80\x04\x95' + bytes(32))
+
+
+def test_sniff(tmp_path):
+	archive = tmp_path / 'archive.bin'
+	archive.write_bytes(pack_header(Header(CodingType.LZW, flags=FLAG_ARCHIVE)))
+	plain = tmp_path / 'plain.txt'
+	plain.write_text('hello')
+
+	assert sniff(archive).algorithm == CodingType.LZW
+	assert sniff(archive).is_archive
+	assert sniff(plain) is None
+	assert sniff(tmp_path) is None
+
+
+def test_index_roundtrip():
+	entries = [
+		IndexEntry('a.txt', 9, 100, 40, 0xffffffff, CodingType.HUFFMAN),
+		IndexEntry('dir/b.txt', 49, 0, 30, 0, CodingType.LZW, 1_700_000_000_123_456_789, bytes(range(16))),
+		IndexEntry('c.txt', 79, 5, 2, 7, CodingType.LZW, start=0),
+		IndexEntry('d.txt', 79, 3, 1, 8, CodingType.LZW, start=5),
+	]
+	blob = b'x' * 79 + pack_index(entries, 79)
+	assert unpack_index(blob) == entries
+
+
+def test_unpack_index_without_footer():
+	with pytest.raises(ValueError):
+		unpack_index(b'no index here, just some bytes')
@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+from compresslib.algorithms.huffman import HuffmanCoding
+from compresslib.algorithms.lzw import LZWCoding
+from compresslib.base.archive import ArchiveReader
+from compresslib.base.container import ChunkEntry, pack_chunk_table, pack_index, pack_recipe, unpack_chunk_table, \
+	unpack_recipe
+from compresslib.base.dedup import MAX_CHUNK, MIN_CHUNK, split_chunks
+
+DATA = random.Random(7).randbytes(300_000)
+
+
+@pytest.fixture
+def tree(tmp_path):
+	source = tmp_path / 'tree'
+	(source / 'copy').mkdir(parents=True)
+	(source / 'data.bin').write_bytes(DATA)
+	(source / 'copy' / 'data.bin').write_bytes(DATA)
+	(source / 'edited.bin').write_bytes(DATA[:100_000] + b'inserted' + DATA[100_000:])
+	(source / 'small.txt').write_bytes(b'small ' * 10)
+	(source / 'empty').write_bytes(b'')
+	return source
+
+
+def test_chunks_cover_input_within_bounds():
+	chunks = list(split_chunks(DATA[start:start + 50_000] for start in range(0, len(DATA), 50_000)))
+	assert b''.join(chunks) == DATA
+	assert all(MIN_CHUNK <= len(chunk) <= MAX_CHUNK for chunk in chunks[:-1])
+	assert chunks == list(split_chunks([DATA]))
+
+
+def test_chunks_resist_insertion():
+	chunks = list(split_chunks([DATA]))
+	shifted = list(split_chunks([b'prefix' + DATA]))
+	assert len(set(chunks) - set(shifted)) <= 2
+
+
+def test_recipe_and_chunk_table_roundtrip():
+	assert unpack_recipe(b'xx' + pack_recipe([3, 0, 3]), 2) == [3, 0, 3]
+	with pytest.raises(ValueError):
+		unpack_recipe(pack_recipe([1, 2])[:-1], 0)
+	chunks = [ChunkEntry(9, 0, 10), ChunkEntry(9, 10, 5)]
+	blob = b'x' * 20 + pack_chunk_table(chunks, 20)
+	assert unpack_chunk_table(blob + pack_index([], len(blob))) == chunks
+	with pytest.raises(ValueError):
+		unpack_chunk_table(b'x' * 20 + pack_index([], 20))
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_dedup_archive_roundtrip(tmp_path, tree, jobs):
+	LZWCoding(str(tree), str(tmp_path), block_size=100_000, jobs=jobs, dedup=True).compress_archive()
+	output = tmp_path / 'out'
+	LZWCoding(str(tmp_path / 'tree.lzw'), str(output), jobs=jobs).decompress_archive()
+	for file in tree.rglob('*'):
+		if file.is_file():
+			assert (output / file.relative_to(tree)).read_bytes() == file.read_bytes()
+
+
+def test_dedup_stores_repeated_content_once(tmp_path, tree):
+	HuffmanCoding(directory=str(tmp_path), path=str(tree), dedup=True).compress_archive()
+	with ArchiveReader(tmp_path / 'tree.huff') as reader:
+		assert reader.header.is_dedup
+		entries = {entry.path: entry for entry in reader.entries}
+		stored = sum(chunk.length for chunk in reader.chunks)
+	assert stored < len(DATA) + 20_000
+	duplicate = entries['copy/data.bin'] if entries['copy/data.bin'].compressed_size == 0 else entries['data.bin']
+	assert duplicate.compressed_size == 0
+	assert entries['edited.bin'].compressed_size < 20_000
+	assert sum(entry.compressed_size for entry in entries.values()) <= (tmp_path / 'tree.huff').stat().st_size
+
+
+def test_dedup_extract_single_member(tmp_path, tree):
+	LZWCoding(str(tree), str(tmp_path), dedup=True).compress_archive()
+	output = tmp_path / 'out'
+	LZWCoding(str(tmp_path / 'tree.lzw'), str(output)).decompress_archive(member='edited.bin')
+	assert [path.name for path in output.rglob('*') if path.is_file()] == ['edited.bin']
+	assert (output / 'edited.bin').read_bytes() == (tree / 'edited.bin').read_bytes()
+
+
+def test_dedup_detects_corruption(tmp_path, tree):
+	LZWCoding(str(tree), str(tmp_path), dedup=True).compress_archive()
+	archive = tmp_path / 'tree.lzw'
+	with ArchiveReader(archive) as reader:
+		chunk = reader.chunks[0]
+	blob = bytearray(archive.read_bytes())
+	blob[chunk.offset + 8] ^= 0xff
+	archive.write_bytes(bytes(blob))
+	with pytest.raises(ValueError):
+		LZWCoding(str(archive), str(tmp_path / 'out')).decompress_archive()
@@ -0,0 +1,158 @@
+import io
+import json
+import random
+
+import pytest
+
+from compresslib.algorithms.huffman import HuffmanCoding
+from compresslib.algorithms.lzw import FIRST_CODE, LZWCoding, train_phrases
+from compresslib.algorithms.range_coder import RangeCoding
+from compresslib.base.container import Header, pack_header, read_header, unpack_header
+from compresslib.base.dictionary import load_dictionary, make_dictionary, pack_dictionary, save_dictionary, train, \
+	unpack_dictionary
+from compresslib.base.enums import CodingType
+
+
+def records(seed: int, count: int) -> list[bytes]:
+	rng = random.Random(seed)
+	return [json.dumps({'id': rng.randint(1, 10 ** 6), 'user': rng.choice(['alice', 'bob', 'carol']),
+	                    'event': rng.choice(['login', 'logout', 'view']), 'amount': round(rng.random() * 100, 2)}).encode()
+	        for _ in range(count)]
+
+
+@pytest.fixture(scope='module')
+def dictionary():
+	return train(records(0, 300))
+
+
+def roundtrip(coder_class, data: bytes, dictionary) -> bytes:
+	compressed = io.BytesIO()
+	coder_class(directory='.', path='-', dictionary=dictionary).compress_stream(io.BytesIO(data), compressed)
+	compressed.seek(0)
+	output = io.BytesIO()
+	coder_class(directory='.', path='-', dictionary=dictionary).decompress_stream(compressed, output)
+	assert output.getvalue() == data
+	return compressed.getvalue()
+
+
+def test_header_carries_dictionary_id():
+	header = Header(CodingType.LZW, extension='.json', dictionary=0xdeadbeef)
+	blob = pack_header(header) + b'rest'
+	assert unpack_header(blob) == (header, len(blob) - 4)
+	stream = io.BytesIO(blob)
+	assert read_header(stream) == header
+	assert stream.read() == b'rest'
+
+
+def test_dictionary_file_roundtrip(tmp_path, dictionary):
+	assert all(dictionary.code_lengths)
+	assert unpack_dictionary(pack_dictionary(dictionary)) == dictionary
+	save_dictionary(dictionary, tmp_path / 'records.zdict')
+	assert load_dictionary(tmp_path / 'records.zdict') == dictionary
+	corrupted = bytearray(pack_dictionary(dictionary))
+	corrupted[-1] ^= 1
+	with pytest.raises(ValueError):
+		unpack_dictionary(bytes(corrupted))
+
+
+def test_trained_phrases_keep_prefixes_first():
+	phrases = train_phrases([b'abcabcabcabc', b'abcabcab'], 100)
+	assert phrases
+	for index, phrase in enumerate(phrases):
+		assert phrase >> 8 < 256 or phrase >> 8 < FIRST_CODE + index
+	assert len(train_phrases([b'abcabcabcabc'] * 5, 2)) == 2
+
+
+@pytest.mark.parametrize('coder_class', [HuffmanCoding, LZWCoding])
+def test_dictionary_shrinks_small_records(coder_class, dictionary):
+	plain = with_dictionary = 0
+	for record in records(1, 30):
+		plain += len(roundtrip(coder_class, record, None))
+		with_dictionary += len(roundtrip(coder_class, record, dictionary))
+	assert with_dictionary < plain * 0.8
+
+
+@pytest.mark.parametrize('coder_class', [HuffmanCoding, LZWCoding])
+def test_dictionary_roundtrip_large_and_foreign_data(coder_class, dictionary):
+	rng = random.Random(5)
+	roundtrip(coder_class, b''.join(records(2, 3000)), dictionary)
+	roundtrip(coder_class, rng.randbytes(70_000), dictionary)
+	roundtrip(coder_class, b'', dictionary)
+
+
+@pytest.mark.parametrize('max_bits', [9, 10, 12])
+def test_lzw_primed_table_at_small_widths(max_bits, dictionary):
+	data = b'\n'.join(records(3, 400))
+	compressed = io.BytesIO()
+	LZWCoding('-', '.', max_bits=max_bits, dictionary=dictionary).compress_stream(io.BytesIO(data), compressed)
+	compressed.seek(0)
+	output = io.BytesIO()
+	LZWCoding('-', '.', dictionary=dictionary).decompress_stream(compressed, output)
+	assert output.getvalue() == data
+
+
+def test_lzw_primed_table_at_power_of_two():
+	# 255 phrases fill the table up to 512 codes, the first code is 9 bits and the next 10
+	phrases = [ord('a') << 8 | ord('b')] + [(FIRST_CODE + index) << 8 | ord('b') for index in range(254)]
+	dictionary = make_dictionary(bytes([8] * 256), phrases)
+	coder = LZWCoding('-', '.', max_bits=10, dictionary=dictionary)
+	assert coder.dict_size == 512
+	data = b'ab' * 300 + b'xyz' * 50
+	compressed = io.BytesIO()
+	coder.compress_stream(io.BytesIO(data), compressed)
+	compressed.seek(0)
+	output = io.BytesIO()
+	LZWCoding('-', '.', dictionary=dictionary).decompress_stream(compressed, output)
+	assert output.getvalue() == data
+
+
+def test_missing_or_wrong_dictionary(dictionary):
+	compressed = io.BytesIO()
+	LZWCoding('-', '.', dictionary=dictionary).compress_stream(io.BytesIO(b'{"user": "bob"}'), compressed)
+	other = make_dictionary(bytes([8] * 256), [])
+	for loaded in (None, other):
+		compressed.seek(0)
+		with pytest.raises(ValueError, match='dictionary'):
+			LZWCoding('-', '.', dictionary=loaded).decompress_stream(compressed, io.BytesIO())
+
+
+def test_failed_decompression_keeps_existing_output(tmp_path, dictionary):
+	source = tmp_path / 'a.txt'
+	source.write_bytes(b'\n'.join(records(5, 50)))
+	HuffmanCoding(directory=str(tmp_path), path=str(source), dictionary=dictionary).compress()
+	compressed = tmp_path / 'a.huff'
+	corrupted = tmp_path / 'corrupted.huff'
+	data = bytearray(compressed.read_bytes())
+	data[-5] ^= 1
+	corrupted.write_bytes(bytes(data))
+	output = tmp_path / 'out'
+	output.mkdir()
+	for name in ('a.txt', 'corrupted.txt'):
+		(output / name).write_bytes(b'keep me')
+	for path, loaded in ((compressed, None), (compressed, make_dictionary(bytes([8] * 256), [])),
+	                     (corrupted, dictionary)):
+		with pytest.raises(ValueError):
+			HuffmanCoding(directory=str(output), path=str(path), dictionary=loaded).decompress()
+	assert sorted(file.name for file in output.iterdir()) == ['a.txt', 'corrupted.txt']
+	assert (output / 'a.txt').read_bytes() == (output / 'corrupted.txt').read_bytes() == b'keep me'
+	HuffmanCoding(directory=str(output), path=str(compressed), dictionary=dictionary).decompress()
+	assert (output / 'a.txt').read_bytes() == source.read_bytes()
+
+
+def test_unsupported_algorithm_rejects_dictionary(dictionary):
+	with pytest.raises(ValueError):
+		RangeCoding('-', '.', dictionary=dictionary)
+
+
+def test_dictionary_archive(tmp_path, dictionary):
+	source = tmp_path / 'records'
+	source.mkdir()
+	for number, record in enumerate(records(4, 20)):
+		(source / f'{number}.json').write_bytes(record)
+	HuffmanCoding(directory=str(tmp_path), path=str(source), dictionary=dictionary).compress_archive()
+	output = tmp_path / 'out'
+	HuffmanCoding(directory=str(output), path=str(tmp_path / 'records.huff'), dictionary=dictionary).decompress_archive()
+	for file in source.iterdir():
+		assert (output / file.name).read_bytes() == file.read_bytes()
+	with pytest.raises(ValueError):
+		HuffmanCoding(directory=str(output), path=str(tmp_path / 'records.huff')).decompress_archive()
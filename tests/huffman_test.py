@@ -1,4 +1,6 @@
-from unittest.mock import patch, mock_open
+import io
+import zlib
+from collections import Counter
 
 import pytest
 
@@ -14,10 +16,9 @@ def huffman():
 
 def test_calculate_frequency(huffman):
 	data = b"aaabbcc"
-	with patch('builtins.open', mock_open(read_data=data)):
-		frequency = huffman._HuffmanCoding__calculate_frequency()
-		expected_frequency = {ord('a'): 3, ord('b'): 2, ord('c'): 2}
-		assert frequency == expected_frequency
+	frequency = huffman._HuffmanCoding__calculate_frequency(data)
+	expected_frequency = {ord('a'): 3, ord('b'): 2, ord('c'): 2}
+	assert frequency == expected_frequency
 
 
 def test_build_heap(huffman):
@@ -41,6 +42,7 @@ def test_build_codes(huffman):
 	huffman._HuffmanCoding__build_codes()
 	assert isinstance(huffman.codes, dict)
 	assert isinstance(huffman.reverse_mapping, dict)
+	assert huffman.codes == {ord('a'): (0b0, 1), ord('b'): (0b10, 2), ord('c'): (0b11, 2)}
 
 
 def test_get_encoded_text(huffman):
@@ -49,7 +51,88 @@ def test_get_encoded_text(huffman):
 	huffman._HuffmanCoding__merge_nodes()
 	huffman._HuffmanCoding__build_codes()
 	data = b"aaabbcc"
-	with patch('builtins.open', mock_open(read_data=data)):
-		encoded_text = huffman._HuffmanCoding__get_encoded_text(data)
-		expected_encoded_text = "00011111010"
-		assert encoded_text == expected_encoded_text
+	encoded_text = huffman._HuffmanCoding__get_encoded_text(data)
+	expected_encoded_text = bytes([5, 0b00010101, 0b11100000])
+	assert encoded_text == expected_encoded_text
+
+
+def test_get_encoded_text_pair_table(huffman):
+	frequency = {ord('a'): 3, ord('b'): 2, ord('c'): 1}
+	huffman._HuffmanCoding__build_heap(frequency)
+	huffman._HuffmanCoding__merge_nodes()
+	huffman._HuffmanCoding__build_codes()
+	data = b"aaabbcc" * 10000 + b"a"
+	encoded_text = huffman._HuffmanCoding__get_encoded_text(data)
+	bits = ''.join(bin(byte)[2:].rjust(8, '0') for byte in encoded_text[1:])
+	assert bits[:len(bits) - encoded_text[0]] == "00010101111" * 10000 + "0"
+
+
+@pytest.mark.parametrize('data', [
+	b'',
+	b'aaaa',
+	bytes(range(256)) * 3,
+	b'abracadabra' * 1000 + b'\x00',
+	bytes([0] * 5000 + [1] * 1000 + [2] * 200 + [3] * 40) + bytes(range(4, 256)),
+])
+def test_decode_text(huffman, data):
+	frequency = Counter(data)
+	huffman._HuffmanCoding__build_heap(frequency)
+	huffman._HuffmanCoding__merge_nodes()
+	huffman._HuffmanCoding__build_codes()
+	encoded_text = huffman._HuffmanCoding__get_encoded_text(data)
+
+	decoder = HuffmanCoding('test', 'test.huff')
+	decoder._HuffmanCoding__assign_canonical_codes(huffman.code_lengths)
+	assert decoder._HuffmanCoding__decode_text(encoded_text) == data
+
+
+def test_decode_text_long_codes(huffman):
+	# fibonacci frequencies produce codes far longer than the lookup width
+	fib = [1, 1]
+	while len(fib) < 30:
+		fib.append(fib[-1] + fib[-2])
+	data = b''.join(bytes([symbol]) * count for symbol, count in enumerate(fib))
+	huffman._HuffmanCoding__build_heap(Counter(data))
+	huffman._HuffmanCoding__merge_nodes()
+	huffman._HuffmanCoding__build_codes()
+	assert max(huffman.code_lengths) > 12
+
+	encoded_text = huffman._HuffmanCoding__get_encoded_text(data)
+	decoder = HuffmanCoding('test', 'test.huff')
+	decoder._HuffmanCoding__assign_canonical_codes(huffman.code_lengths)
+	assert decoder._HuffmanCoding__decode_text(encoded_text) == data
+
+
+def test_compress_roundtrip(tmp_path):
+	source = tmp_path / 'data.txt'
+	source.write_bytes(b'abracadabra' * 100 + bytes(range(256)))
+	HuffmanCoding(directory=str(tmp_path), path=str(source)).compress()
+	compressed = tmp_path / 'data.huff'
+	assert compressed.read_bytes()[:4] == b'ZIPR'
+
+	output = tmp_path / 'out'
+	HuffmanCoding(directory=str(output), path=str(compressed)).decompress()
+	assert (output / 'data.txt').read_bytes() == source.read_bytes()
+
+
+def test_compress_stream_blocks():
+	data = bytes(range(256)) * 40 + b'tail'
+	source = io.BytesIO(data)
+	compressed = io.BytesIO()
+	encoder = HuffmanCoding('test', '-', block_size=1000)
+	assert encoder.compress_stream(source, compressed, '.bin') == (len(data), zlib.crc32(data))
+
+	compressed.seek(0)
+	output = io.BytesIO()
+	header = HuffmanCoding('test', '-').decompress_stream(compressed, output)
+	assert header.extension == '.bin'
+	assert output.getvalue() == data
+
+
+def test_decompress_stream_detects_corruption():
+	compressed = io.BytesIO()
+	HuffmanCoding('test', '-').compress_stream(io.BytesIO(b'abracadabra' * 100), compressed)
+	blob = bytearray(compressed.getvalue())
+	blob[-1] ^= 0xff
+	with pytest.raises(ValueError):
+		HuffmanCoding('test', '-').decompress_stream(io.BytesIO(blob), io.BytesIO())
@@ -0,0 +1,74 @@
+import io
+import random
+
+import pytest
+
+from compresslib.algorithms.lz77 import LZ77Coding, PARAMETERS, read_varint, write_varint
+
+LOGS = b''.join(b'{"user": %d, "path": "/api/v1/items/%d", "status": 200}\n' % (i % 50, i % 13)
+                for i in range(2000))
+
+
+@pytest.mark.parametrize('value', [0, 1, 127, 128, 300, 1 << 20])
+def test_varint(value):
+	out = bytearray()
+	write_varint(out, value)
+	assert read_varint(bytes(out), 0) == (value, len(out))
+
+
+def test_parse_finds_overlapping_match():
+	commands, literals, distances = LZ77Coding('-', '.', huffman=False)._parse(b'abcabcabcabcx')
+	assert literals == b'abcx'
+	assert read_varint(bytes(distances), 0)[0] == 2  # distance 3
+
+
+@pytest.mark.parametrize('level', [1, 4, 6, 9])
+@pytest.mark.parametrize('huffman', [True, False])
+@pytest.mark.parametrize('data', [b'', b'a', b'a' * 1000, b'abcabcabcx', bytes(range(256)) * 20,
+                                  random.Random(4).randbytes(4000), LOGS])
+def test_roundtrip(level, huffman, data):
+	coder = LZ77Coding('-', '.', level=level, huffman=huffman, window_bits=12)
+	assert coder.decode_block(coder.encode_block(data), len(data)) == data
+
+
+def test_window_limits_distance():
+	data = random.Random(5).randbytes(3000) * 2
+	near = LZ77Coding('-', '.', window_bits=10, huffman=False).encode_block(data)
+	far = LZ77Coding('-', '.', window_bits=12, huffman=False).encode_block(data)
+	assert len(far) < len(data) * 0.6 < len(near)
+
+
+def test_levels_trade_speed_for_ratio():
+	sizes = [len(LZ77Coding('-', '.', level=level).encode_block(LOGS)) for level in (1, 9)]
+	assert sizes[1] <= sizes[0] < len(LOGS) // 4
+
+
+def test_huffman_back_end():
+	raw = LZ77Coding('-', '.', huffman=False).encode_block(LOGS)
+	coded = LZ77Coding('-', '.').encode_block(LOGS)
+	assert len(coded) < len(raw)
+	assert PARAMETERS.unpack_from(coded) == (6, 16, 1)
+
+
+def test_corrupted_distance():
+	payload = bytearray(LZ77Coding('-', '.', huffman=False).encode_block(b'abcabcabc'))
+	# the last stream holds the distances, point it far before the start
+	payload[-1] = 0x7F
+	with pytest.raises(ValueError):
+		LZ77Coding('-', '.').decode_block(bytes(payload), 9)
+
+
+@pytest.mark.parametrize('level, window_bits', [(0, 16), (10, 16), (6, 9), (6, 21)])
+def test_invalid_parameters(level, window_bits):
+	with pytest.raises(ValueError):
+		LZ77Coding('-', '.', level=level, window_bits=window_bits)
+
+
+def test_stream_roundtrip():
+	compressed = io.BytesIO()
+	LZ77Coding('-', '.', block_size=16384).compress_stream(io.BytesIO(LOGS), compressed)
+	compressed.seek(0)
+	output = io.BytesIO()
+	LZ77Coding('-', '.').decompress_stream(compressed, output)
+	assert output.getvalue() == LOGS
+	assert len(compressed.getvalue()) < len(LOGS) // 4
@@ -1,6 +1,17 @@
+import random
+
 import pytest
+from typer.testing import CliRunner
+
+from compresslib.algorithms.huffman import HuffmanCoding
+from compresslib.algorithms.lzw import LZWCoding, CLEAR_CODE
+from compresslib.main import app
+
 
-from compresslib.algorithms.lzw import LZWCoding
+def pack_codes(codes, width=9):
+	bits = ''.join(bin(code)[2:].rjust(width, '0') for code in codes)
+	bits += '0' * (-len(bits) % 8)
+	return bytes(int(bits[i:i + 8], 2) for i in range(0, len(bits), 8))
 
 
 @pytest.fixture()
@@ -10,14 +21,76 @@ def lzw():
 
 
 def test_compress(lzw):
-	case = 'TOBEORNOTTOBEORTOBEORNOT'
+	case = b'TOBEORNOTTOBEORTOBEORNOT'
 	res = lzw._compress(case)
-	expected_value = [84, 79, 66, 69, 79, 82, 78, 79, 84, 256, 258, 260, 265, 259, 261, 263]
+	expected_value = pack_codes([84, 79, 66, 69, 79, 82, 78, 79, 84, 257, 259, 261, 266, 260, 262, 264])
 	assert res == expected_value
 
 
 def test_decompress(lzw):
-	case = [84, 79, 66, 69, 79, 82, 78, 79, 84, 256, 258, 260, 265, 259, 261, 263]
-	res = lzw._decompress(case)
-	expected_value = 'TOBEORNOTTOBEORTOBEORNOT'
+	case = pack_codes([84, 79, 66, 69, 79, 82, 78, 79, 84, 257, 259, 261, 266, 260, 262, 264])
+	expected_value = b'TOBEORNOTTOBEORTOBEORNOT'
+	res = lzw._decompress(case, len(expected_value))
 	assert res == expected_value
+
+
+def test_decompress_clear_code(lzw):
+	case = pack_codes([84, 79, 257, CLEAR_CODE, 66, 69, 257])
+	assert lzw._decompress(case, 8) == b'TOTOBEBE'
+
+
+def test_decompress_size_mismatch(lzw):
+	case = pack_codes([84, 79, 66, 69])
+	with pytest.raises(ValueError):
+		lzw._decompress(case, 3)
+	with pytest.raises(ValueError):
+		lzw._decompress(case, 5)
+
+
+@pytest.mark.parametrize('max_bits', [9, 12, 16])
+def test_roundtrip_code_widths(max_bits):
+	rng = random.Random(max_bits)
+	words = ['alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta', 'eta', 'theta']
+	case = ' '.join(rng.choice(words) + str(rng.randint(0, 500)) for _ in range(20000)).encode()
+	encoder = LZWCoding('test.txt', 'test', max_bits=max_bits)
+	compressed = encoder._compress(case)
+	assert len(compressed) < len(case)
+	decoder = LZWCoding('test.lzw', 'test', max_bits=max_bits)
+	assert decoder._decompress(compressed, len(case)) == case
+
+
+@pytest.mark.parametrize('case', [b'', b'a', b'aaaaaaaaaa', bytes(range(256)) * 4, bytes(1000)])
+def test_roundtrip_binary(lzw, case):
+	compressed = lzw._compress(case)
+	assert lzw._decompress(compressed, len(case)) == case
+
+
+def test_invalid_max_bits():
+	with pytest.raises(ValueError):
+		LZWCoding('test.txt', 'test', max_bits=8)
+
+
+def test_compress_roundtrip(tmp_path):
+	source = tmp_path / 'data.txt'
+	source.write_bytes(b'TOBEORNOTTOBEORTOBEORNOT' * 50 + bytes(range(256)) + '\u00e9t\u00e9\r\n'.encode())
+	LZWCoding(str(source), str(tmp_path), max_bits=12).compress()
+	compressed = tmp_path / 'data.lzw'
+	assert compressed.read_bytes()[:4] == b'ZIPR'
+
+	output = tmp_path / 'out'
+	LZWCoding(str(compressed), str(output)).decompress()
+	assert (output / 'data.txt').read_bytes() == source.read_bytes()
+
+
+def test_cmp_compresses_containers_of_other_algorithms(tmp_path):
+	source = tmp_path / 'x.txt'
+	source.write_bytes(b'already compressed once ' * 200)
+	HuffmanCoding(path=str(source), directory=str(tmp_path)).compress()
+	result = CliRunner().invoke(app, ['-q', 'cmp', '-a', 'lzw', str(tmp_path / 'x.huff')])
+	assert result.exit_code == 0, result.output
+	assert source.read_bytes() == b'already compressed once ' * 200
+	output = tmp_path / 'out'
+	LZWCoding(str(tmp_path / 'x.lzw'), str(output)).decompress()
+	assert (output / 'x.huff').read_bytes() == (tmp_path / 'x.huff').read_bytes()
+	with pytest.raises(ValueError, match='Compressed with huff'):
+		LZWCoding(str(tmp_path / 'x.huff'), str(output)).decompress()
@@ -0,0 +1,52 @@
+import io
+import os
+
+from compresslib.algorithms.huffman import HuffmanCoding
+from compresslib.algorithms.lzw import LZWCoding
+from compresslib.utils.parallel import ordered_map, resolve_jobs
+
+
+def scale(factor, item):
+	return item * factor
+
+
+def test_ordered_map_serial():
+	assert list(ordered_map(scale, range(5), 3)) == [0, 3, 6, 9, 12]
+
+
+def test_ordered_map_keeps_order():
+	assert list(ordered_map(scale, range(50), 2, jobs=3, in_flight=4)) == [x * 2 for x in range(50)]
+
+
+def test_resolve_jobs():
+	assert resolve_jobs(4) == 4
+	assert resolve_jobs(0) == (os.cpu_count() or 1)
+
+
+def test_parallel_stream_matches_serial():
+	data = b''.join(b'line %d of the parallel test\n' % i for i in range(5000))
+	serial = io.BytesIO()
+	LZWCoding('-', '.', block_size=8192).compress_stream(io.BytesIO(data), serial)
+	parallel = io.BytesIO()
+	LZWCoding('-', '.', block_size=8192, jobs=2).compress_stream(io.BytesIO(data), parallel)
+	assert parallel.getvalue() == serial.getvalue()
+
+	output = io.BytesIO()
+	parallel.seek(0)
+	LZWCoding('-', '.', jobs=2).decompress_stream(parallel, output)
+	assert output.getvalue() == data
+
+
+def test_parallel_archive_roundtrip(tmp_path):
+	source = tmp_path / 'tree'
+	(source / 'nested').mkdir(parents=True)
+	for i in range(6):
+		(source / f'file{i}.txt').write_bytes(b'member %d ' % i * (i * 300 + 1))
+	(source / 'nested' / 'empty').write_bytes(b'')
+
+	HuffmanCoding(directory=str(tmp_path), path=str(source), jobs=2).compress_archive()
+	output = tmp_path / 'out'
+	HuffmanCoding(directory=str(output), path=str(tmp_path / 'tree.huff'), jobs=2).decompress_archive()
+	for file in source.rglob('*'):
+		if file.is_file():
+			assert (output / file.relative_to(source)).read_bytes() == file.read_bytes()
@@ -0,0 +1,108 @@
+import io
+import random
+import threading
+import time
+
+import pytest
+
+from compresslib.algorithms.huffman import HuffmanCoding
+from compresslib.algorithms.lzw import LZWCoding
+from compresslib.utils.pipeline import prefetch, write_behind
+from compresslib.utils.profiling import Profiler, profiling
+
+DATA = random.Random(9).randbytes(20_000) + b'pipeline ' * 20_000
+
+
+class SlowWriter(io.BytesIO):
+	def write(self, data):
+		time.sleep(0.001)
+		return super().write(data)
+
+
+class BrokenWriter(io.BytesIO):
+	def write(self, data):
+		raise OSError('disk full')
+
+
+def failing_items():
+	yield 1
+	yield 2
+	raise OSError('read failed')
+
+
+@pytest.mark.parametrize('buffers', [0, 1, 3])
+def test_prefetch_keeps_order(buffers):
+	with prefetch(range(100), buffers) as items:
+		assert list(items) == list(range(100))
+
+
+@pytest.mark.parametrize('buffers', [0, 2])
+def test_prefetch_raises_where_the_item_failed(buffers):
+	seen = []
+	with pytest.raises(OSError, match='read failed'):
+		with prefetch(failing_items(), buffers) as items:
+			for item in items:
+				seen.append(item)
+	assert seen == [1, 2]
+
+
+def test_prefetch_stops_reader_when_left_early():
+	before = threading.active_count()
+	with prefetch(iter(range(10 ** 9)), 2) as items:
+		assert next(items) == 0
+	assert threading.active_count() == before
+
+
+@pytest.mark.parametrize('buffers', [0, 2])
+def test_write_behind_writes_everything(buffers):
+	target = SlowWriter()
+	with write_behind(target, buffers) as writer:
+		for number in range(50):
+			assert writer.write(b'%d,' % number) == len(b'%d,' % number)
+	assert target.getvalue() == b''.join(b'%d,' % number for number in range(50))
+
+
+@pytest.mark.parametrize('buffers', [0, 2])
+def test_write_behind_raises_write_errors(buffers):
+	with pytest.raises(OSError, match='disk full'):
+		with write_behind(BrokenWriter(), buffers) as writer:
+			for _ in range(10):
+				writer.write(b'data')
+
+
+@pytest.mark.parametrize('coder_class', [HuffmanCoding, LZWCoding])
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_pipelined_stream_roundtrip(coder_class, jobs):
+	compressed = io.BytesIO()
+	coder_class('-', '.', block_size=30_000, jobs=jobs, buffers=2).compress_stream(io.BytesIO(DATA), compressed)
+	plain = io.BytesIO()
+	coder_class('-', '.', block_size=30_000).compress_stream(io.BytesIO(DATA), plain)
+	assert compressed.getvalue() == plain.getvalue()
+	compressed.seek(0)
+	output = io.BytesIO()
+	coder_class('-', '.', jobs=jobs, buffers=2).decompress_stream(compressed, output)
+	assert output.getvalue() == DATA
+
+
+def test_pipelined_file_and_archive(tmp_path):
+	source = tmp_path / 'tree'
+	source.mkdir()
+	(source / 'data.bin').write_bytes(DATA)
+	(source / 'small.txt').write_bytes(b'small')
+	LZWCoding(str(source / 'data.bin'), str(tmp_path), block_size=30_000, buffers=2).compress()
+	LZWCoding(str(source), str(tmp_path), block_size=30_000, buffers=2).compress_archive()
+	output = tmp_path / 'out'
+	LZWCoding(str(tmp_path / 'data.lzw'), str(output), buffers=2).decompress()
+	LZWCoding(str(tmp_path / 'tree.lzw'), str(output / 'tree'), buffers=2).decompress_archive()
+	assert (output / 'data.bin').read_bytes() == DATA
+	assert (output / 'tree' / 'data.bin').read_bytes() == DATA
+	assert (output / 'tree' / 'small.txt').read_bytes() == b'small'
+
+
+def test_io_threads_report_phases():
+	profiler = Profiler(trace_memory=True)
+	with profiling(profiler):
+		HuffmanCoding('-', '.', block_size=30_000, buffers=2).compress_stream(io.BytesIO(DATA), io.BytesIO())
+	assert profiler.phases['read'].size == len(DATA)
+	assert profiler.phases['write'].calls == len(DATA) // 30_000 + 3
+	assert profiler.phases['encode'].calls == len(DATA) // 30_000 + 1
@@ -0,0 +1,68 @@
+import io
+
+from compresslib.algorithms.huffman import HuffmanCoding
+from compresslib.build.huff_build import HuffBuild
+from compresslib.utils.profiling import Profiler, phase, profiled, profiled_iter, profiling
+
+
+@profiled('double')
+def double(value):
+	return value * 2
+
+
+def test_hooks_are_noops_without_profiler():
+	with phase('idle', 10):
+		pass
+	assert double(2) == 4
+	assert list(profiled_iter('idle', [b'a', b'bc'])) == [b'a', b'bc']
+
+
+def test_phases_accumulate():
+	profiler = Profiler()
+	with profiling(profiler):
+		for _ in range(3):
+			with phase('work', 5):
+				double(1)
+		assert list(profiled_iter('items', [b'a', b'bc'])) == [b'a', b'bc']
+	assert profiler.phases['work'].calls == 3
+	assert profiler.phases['work'].size == 15
+	assert profiler.phases['double'].calls == 3
+	assert profiler.phases['work'].elapsed >= profiler.phases['double'].elapsed
+	assert profiler.phases['items'].size == 3
+	assert profiler.phases['work'].peak_memory is None
+
+
+def test_nested_peak_memory():
+	profiler = Profiler(trace_memory=True)
+	with profiling(profiler):
+		with phase('outer'):
+			with phase('inner'):
+				data = bytearray(1 << 20)
+			del data
+			with phase('small'):
+				bytearray(1024)
+	assert profiler.phases['inner'].peak_memory >= 1 << 20
+	assert profiler.phases['outer'].peak_memory >= profiler.phases['inner'].peak_memory
+	assert profiler.phases['small'].peak_memory < 1 << 20
+
+
+def test_stream_phases():
+	profiler = Profiler()
+	data = b'profiled stream ' * 5000
+	with profiling(profiler):
+		HuffmanCoding('.', '-', block_size=16384).compress_stream(io.BytesIO(data), io.BytesIO())
+	assert profiler.phases['read'].size == len(data)
+	assert profiler.phases['encode'].calls == 5
+	assert {'frequency', 'tree', 'bit packing', 'write', 'checksum'} <= set(profiler.phases)
+
+
+def test_metrics_include_phases(tmp_path):
+	file = tmp_path / 'data.txt'
+	file.write_bytes(b'metrics ' * 1000)
+	build = HuffBuild(directory=tmp_path, file=file)
+	metric = build.execute(build.execute_compression)
+	assert 'encode' in [phase_metric.name for phase_metric in metric.phases]
+
+	build = HuffBuild(directory=tmp_path / 'out', file=tmp_path / 'data.huff')
+	metric = build.execute(build.execute_decompression)
+	assert 'decode' in [phase_metric.name for phase_metric in metric.phases]
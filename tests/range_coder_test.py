@@ -0,0 +1,61 @@
+import io
+import random
+
+import pytest
+
+from compresslib.algorithms.huffman import HuffmanCoding
+from compresslib.algorithms.range_coder import DEFAULT_MEMORY_BITS, DEFAULT_ORDER, MODEL, RangeCoding
+
+LOGS = b''.join(b'2024-05-01 12:%02d:%02d INFO request %d served in %dms\n' % (i // 60 % 60, i % 60, i, i % 17)
+                for i in range(3000))
+
+
+@pytest.mark.parametrize('order, memory_bits', [(0, 0), (1, 8), (1, 12), (2, 10), (2, 16)])
+@pytest.mark.parametrize('data', [b'', b'a', b'abracadabra', bytes(range(256)) * 8, random.Random(3).randbytes(5000)])
+def test_roundtrip(order, memory_bits, data):
+	coder = RangeCoding('-', '.', order=order, memory_bits=memory_bits)
+	payload = coder.encode_block(data)
+	assert MODEL.unpack_from(payload) == (order, memory_bits)
+	assert RangeCoding('-', '.').decode_block(payload, len(data)) == data
+
+
+def test_model_is_read_from_block():
+	payload = RangeCoding('-', '.', order=0, memory_bits=4).encode_block(LOGS)
+	decoder = RangeCoding('-', '.')
+	assert decoder.decode_block(payload, len(LOGS)) == LOGS
+	# the model is only used for that block
+	assert (decoder.order, decoder.memory_bits) == (DEFAULT_ORDER, DEFAULT_MEMORY_BITS)
+
+
+def test_higher_orders_compress_better():
+	sizes = [len(RangeCoding('-', '.', order=order).encode_block(LOGS)) for order in range(3)]
+	assert sizes[2] < sizes[1] < sizes[0]
+	assert sizes[0] <= len(HuffmanCoding(directory='.', path='-').encode_block(LOGS))
+
+
+@pytest.mark.parametrize('order, memory_bits', [(3, 12), (-1, 12), (1, 17)])
+def test_invalid_model(order, memory_bits):
+	with pytest.raises(ValueError):
+		RangeCoding('-', '.', order=order, memory_bits=memory_bits)
+
+
+def test_stream_roundtrip_and_corruption():
+	compressed = io.BytesIO()
+	RangeCoding('-', '.', block_size=8192).compress_stream(io.BytesIO(LOGS), compressed)
+	compressed.seek(0)
+	output = io.BytesIO()
+	RangeCoding('-', '.').decompress_stream(compressed, output)
+	assert output.getvalue() == LOGS
+
+	corrupted = bytearray(compressed.getvalue())
+	corrupted[40] ^= 0xFF
+	with pytest.raises(ValueError):
+		RangeCoding('-', '.').decompress_stream(io.BytesIO(bytes(corrupted)), io.BytesIO())
+
+
+def test_file_roundtrip(tmp_path):
+	file = tmp_path / 'telemetry.log'
+	file.write_bytes(LOGS)
+	RangeCoding(directory=str(tmp_path), path=str(file)).compress()
+	RangeCoding(directory=str(tmp_path / 'out'), path=str(tmp_path / 'telemetry.rc')).decompress()
+	assert (tmp_path / 'out' / 'telemetry.log').read_bytes() == LOGS
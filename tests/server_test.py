@@ -0,0 +1,145 @@
+import asyncio
+import io
+import json
+import socket
+import threading
+
+import pytest
+
+from compresslib.api import compress, decompress
+from compresslib.base.dictionary import make_dictionary, save_dictionary
+from compresslib.client import Client, connect, forward, parse_address
+from compresslib.server import Server, _is_loopback
+
+DATA = b''.join(b'job %d finished with status ok\n' % (number % 500) for number in range(3000))
+
+
+@pytest.fixture(scope='module')
+def address(tmp_path_factory):
+	path = str(tmp_path_factory.mktemp('server') / 'zipper.sock')
+	server = Server(path, workers=1)
+	thread = threading.Thread(target=asyncio.run, args=(server.run(),), daemon=True)
+	thread.start()
+	assert server.ready.wait(60)
+	yield path
+	server.stop()
+	thread.join(60)
+
+
+def test_parse_address():
+	assert parse_address('/run/user/1000/zipper.sock') == '/run/user/1000/zipper.sock'
+	assert parse_address('localhost:7070') == ('localhost', 7070)
+	assert parse_address(':7070') == ('127.0.0.1', 7070)
+	assert parse_address('./odd:name') == './odd:name'
+	assert _is_loopback('127.0.0.1') and _is_loopback('::1') and _is_loopback('localhost')
+	assert not _is_loopback('0.0.0.0') and not _is_loopback('example.com')
+
+
+def test_body_roundtrip(address):
+	with Client(address) as client:
+		metric, compressed = client.request('compress', DATA, algorithm='lzw', options={'max_bits': 12})
+		assert metric['file']['size'] == len(DATA)
+		assert metric['compressed_file']['size'] == len(compressed)
+		assert decompress(compressed) == DATA
+		metric, output = client.request('decompress', compress(DATA, 'lz77'))
+		assert output == DATA
+		assert metric['file']['size'] < len(DATA)
+
+
+def test_decoding_does_not_change_later_requests(address):
+	with Client(address) as client:
+		_, first = client.request('compress', DATA, algorithm='lzw')
+		_, narrow = client.request('compress', DATA, algorithm='lzw', options={'max_bits': 9})
+		assert client.request('decompress', narrow)[1] == DATA
+		assert client.request('compress', DATA, algorithm='lzw')[1] == first
+
+
+def test_path_requests(address, tmp_path):
+	(tmp_path / 'log.txt').write_bytes(DATA)
+	with Client(address) as client:
+		metric, output = client.request('compress', path=str(tmp_path / 'log.txt'), algorithm='huff')
+		assert output is None
+		assert metric['compressed_file']['filename'] == str(tmp_path / 'log.huff')
+		client.request('decompress', path=str(tmp_path / 'log.huff'), output=str(tmp_path / 'out'))
+	assert (tmp_path / 'out' / 'log.txt').read_bytes() == DATA
+
+
+def test_dictionary(address, tmp_path):
+	dictionary = make_dictionary(bytes([8] * 256), [ord('o') << 8 | ord('k')])
+	save_dictionary(dictionary, tmp_path / 'ok.zdict')
+	with Client(address) as client:
+		_, compressed = client.request('compress', b'ok ok', algorithm='lzw', dictionary=str(tmp_path / 'ok.zdict'))
+		assert decompress(compressed, dictionary=dictionary) == b'ok ok'
+		_, output = client.request('decompress', compressed, dictionary=str(tmp_path / 'ok.zdict'))
+		assert output == b'ok ok'
+
+
+def test_errors_keep_the_connection(address, tmp_path):
+	with Client(address) as client:
+		for command, fields in [('shrink', {'path': '/tmp/x'}), ('compress', {'path': 'relative.txt'}),
+		                        ('compress', {'path': str(tmp_path / 'missing')}),
+		                        ('compress', {'path': str(tmp_path), 'options': {'jobs': 4}})]:
+			with pytest.raises(ValueError):
+				client.request(command, **fields)
+		with pytest.raises(ValueError, match='Not a zipper container'):
+			client.request('decompress', b'plain text, not compressed')
+		assert client.request('compress', b'still here')[1]
+
+
+def test_malformed_request_closes_the_connection(address):
+	with connect(address) as sock:
+		sock.sendall(b'not json\n')
+		reader = sock.makefile('rb')
+		assert json.loads(reader.readline())['ok'] is False
+		assert reader.readline() == b''
+
+
+def test_forward_stream(address):
+	stdout = io.BytesIO()
+	forward('compress', '-', address, stdin=io.BytesIO(DATA), stdout=stdout, algorithm='store')
+	assert decompress(stdout.getvalue()) == DATA
+
+
+def test_refuses_to_replace_a_live_server_or_a_file(address, tmp_path):
+	with pytest.raises(ValueError, match='already listens'):
+		asyncio.run(Server(address, workers=1).run())
+	(tmp_path / 'file').write_bytes(b'')
+	with pytest.raises(ValueError, match='not a socket'):
+		asyncio.run(Server(str(tmp_path / 'file'), workers=1).run())
+	with pytest.raises(ValueError, match='loopback'):
+		asyncio.run(Server('0.0.0.0:0', workers=1).run())
+
+
+def test_tcp_refuses_paths(tmp_path):
+	with socket.socket() as probe:
+		probe.bind(('127.0.0.1', 0))
+		address = f'127.0.0.1:{probe.getsockname()[1]}'
+	server = Server(address, workers=1)
+	thread = threading.Thread(target=asyncio.run, args=(server.run(),), daemon=True)
+	thread.start()
+	assert server.ready.wait(60)
+	(tmp_path / 'log.txt').write_bytes(DATA)
+	with Client(address) as client:
+		with pytest.raises(ValueError, match='TCP'):
+			client.request('compress', path=str(tmp_path / 'log.txt'))
+		with pytest.raises(ValueError, match='TCP'):
+			client.request('decompress', compress(DATA), output=str(tmp_path / 'out'))
+		assert decompress(client.request('compress', DATA)[1]) == DATA
+	assert not (tmp_path / 'log.huff').exists()
+	server.stop()
+	thread.join(60)
+
+
+def test_stale_socket_is_replaced(tmp_path):
+	path = str(tmp_path / 'stale.sock')
+	stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	stale.bind(path)
+	stale.close()
+	server = Server(path, workers=1)
+	thread = threading.Thread(target=asyncio.run, args=(server.run(),), daemon=True)
+	thread.start()
+	assert server.ready.wait(60)
+	with Client(path) as client:
+		assert client.request('compress', b'fresh')[1]
+	server.stop()
+	thread.join(60)
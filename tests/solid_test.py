@@ -0,0 +1,111 @@
+import random
+from collections import defaultdict
+
+import pytest
+
+from compresslib.algorithms.huffman import HuffmanCoding
+from compresslib.algorithms.lz77 import LZ77Coding
+from compresslib.algorithms.lzw import LZWCoding
+from compresslib.base.archive import ArchiveReader
+from compresslib.base.container import BLOCK, read_block
+
+
+def record(number: int) -> bytes:
+	return b'{"id": %d, "user": "user%d", "status": "active", "tags": ["a", "b"]}\n' % (number, number % 40)
+
+
+@pytest.fixture
+def tree(tmp_path):
+	source = tmp_path / 'tree'
+	(source / 'records').mkdir(parents=True)
+	for number in range(200):
+		(source / 'records' / f'{number}.json').write_bytes(record(number) * (1 + number % 3))
+		(source / f'note{number % 20}.txt').write_bytes(b'note %d\n' % number)
+	(source / 'big.bin').write_bytes(random.Random(3).randbytes(20_000))
+	(source / 'empty').write_bytes(b'')
+	return source
+
+
+def assert_extracted(tree, output):
+	for file in tree.rglob('*'):
+		if file.is_file():
+			assert (output / file.relative_to(tree)).read_bytes() == file.read_bytes()
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_solid_archive_roundtrip(tmp_path, tree, jobs):
+	LZWCoding(str(tree), str(tmp_path), jobs=jobs, solid=True, solid_size=4096).compress_archive()
+	with ArchiveReader(tmp_path / 'tree.lzw') as reader:
+		assert reader.header.is_solid
+		entries = {entry.path: entry for entry in reader.entries}
+	assert entries['big.bin'].start is None and entries['empty'].start is None
+	solid = [entry for entry in entries.values() if entry.start is not None]
+	assert len(solid) == 220
+	# several blocks, every one holding files of a kind
+	blocks = {entry.offset for entry in solid}
+	assert len(blocks) > 1
+	assert all(len({entry.path[-4:] for entry in solid if entry.offset == block}) <= 2 for block in blocks)
+	output = tmp_path / 'out'
+	LZWCoding(str(tmp_path / 'tree.lzw'), str(output), jobs=jobs).decompress_archive()
+	assert_extracted(tree, output)
+
+
+def test_solid_member_extraction(tmp_path, tree):
+	HuffmanCoding(path=str(tree), directory=str(tmp_path), solid=True).compress_archive()
+	output = tmp_path / 'out'
+	HuffmanCoding(path=str(tmp_path / 'tree.huff'), directory=str(output)).decompress_archive('records/17.json')
+	assert [file.name for file in output.rglob('*') if file.is_file()] == ['17.json']
+	assert (output / 'records' / '17.json').read_bytes() == (tree / 'records' / '17.json').read_bytes()
+
+
+def test_solid_archive_is_smaller(tmp_path, tree):
+	(tmp_path / 'plain').mkdir()
+	(tmp_path / 'solid').mkdir()
+	LZ77Coding(str(tree), str(tmp_path / 'plain')).compress_archive()
+	LZ77Coding(str(tree), str(tmp_path / 'solid'), solid=True).compress_archive()
+	plain = (tmp_path / 'plain' / 'tree.lz77').stat().st_size
+	solid = (tmp_path / 'solid' / 'tree.lz77').stat().st_size
+	assert solid < plain * 0.6
+	with ArchiveReader(tmp_path / 'solid' / 'tree.lz77') as reader:
+		blocks = defaultdict(list)
+		for entry in reader.entries:
+			if entry.start is not None:
+				blocks[entry.offset].append(entry.compressed_size)
+		# every member is charged something, and a block is charged exactly its size
+		for offset, charges in blocks.items():
+			reader.file.seek(offset)
+			assert min(charges) >= 1
+			assert sum(charges) == BLOCK.size + len(read_block(reader.file)[1])
+
+
+def test_update_solid_archive(tmp_path, tree):
+	LZWCoding(str(tree), str(tmp_path), solid=True, solid_size=4096).compress_archive()
+	(tree / 'records' / '5.json').write_bytes(b'{"changed": true}\n')
+	(tree / 'note3.txt').unlink()
+	(tree / 'new.txt').write_bytes(b'new file\n')
+	LZWCoding(str(tree), str(tmp_path)).update_archive(str(tmp_path / 'tree.lzw'))
+	with ArchiveReader(tmp_path / 'tree.lzw') as reader:
+		assert reader.header.is_solid
+		assert reader.find('new.txt').start is not None
+	output = tmp_path / 'out'
+	LZWCoding(str(tmp_path / 'tree.lzw'), str(output)).decompress_archive()
+	assert_extracted(tree, output)
+	assert not (output / 'note3.txt').exists()
+
+
+def test_solid_block_corruption_is_detected(tmp_path, tree):
+	HuffmanCoding(path=str(tree), directory=str(tmp_path), solid=True).compress_archive()
+	archive = tmp_path / 'tree.huff'
+	with ArchiveReader(archive) as reader:
+		entry = reader.find('records/0.json')
+	data = bytearray(archive.read_bytes())
+	# the byte after the block length and the start of the Huffman header
+	data[entry.offset + 8 + entry.compressed_size // 2] ^= 0xff
+	archive.write_bytes(bytes(data))
+	with pytest.raises(ValueError):
+		HuffmanCoding(path=str(archive), directory=str(tmp_path / 'out')).decompress_archive()
+
+
+def test_solid_and_dedup_are_exclusive(tmp_path):
+	with pytest.raises(ValueError):
+		LZWCoding(str(tmp_path), str(tmp_path), solid=True, dedup=True)
@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+
+BUDGET_MS = float(os.environ.get('ZIPPER_STARTUP_BUDGET_MS', '250'))
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_python(*args: str) -> subprocess.CompletedProcess:
+	env = dict(os.environ, PYTHONPATH=ROOT)
+	return subprocess.run([sys.executable, *args], capture_output=True, text=True, env=env, cwd=ROOT)
+
+
+def import_time_us(module: str) -> int:
+	result = run_python('-X', 'importtime', '-c', f'import {module}')
+	for line in result.stderr.splitlines():
+		_, _, cumulative, name = (part.strip() for part in line.replace(':', '|', 1).split('|'))
+		if name == module:
+			return int(cumulative)
+	raise AssertionError(f'{module} missing from the import time report')
+
+
+def test_cold_start_within_budget():
+	best = min(import_time_us('compresslib.main') for _ in range(3))
+	assert best / 1000 <= BUDGET_MS
+
+
+def test_cli_import_skips_heavy_modules():
+	result = run_python('-c', 'import sys, compresslib.main; '
+	                          'print(sorted(name for name in sys.modules if name in ("rich", "pydantic", "mmap", '
+	                          '"compresslib.base.abstract") or name.startswith("compresslib.algorithms.")))')
+	assert result.stdout.strip() == '[]'
+
+
+def test_quiet_mode_never_imports_rich(tmp_path):
+	file = tmp_path / 'data.txt'
+	file.write_bytes(b'quiet mode ' * 100)
+	script = ('import sys\n'
+	          'from compresslib.main import app\n'
+	          'try:\n'
+	          '\tapp(sys.argv[1:])\n'
+	          'except SystemExit:\n'
+	          '\tpass\n'
+	          'print("rich" in sys.modules, "pydantic" in sys.modules)\n')
+	for args in (['cmp', '-a', 'lzw', str(file)], ['ucmp', str(tmp_path / 'data.lzw'), '-o', str(tmp_path / 'out')]):
+		result = run_python('-c', script, '-q', *args)
+		assert result.stdout.strip() == 'False False', result.stderr
+	assert (tmp_path / 'out' / 'data.txt').read_bytes() == file.read_bytes()